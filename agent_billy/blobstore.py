@@ -0,0 +1,294 @@
+from __future__ import annotations
+import difflib
+import hashlib
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+from .utils import WORKSPACE, STATE_DIR
+from . import metrics
+
+OBJECTS_DIR = STATE_DIR / "objects"
+MAX_CHAIN = 16  # longest delta chain before a full snapshot is stored again
+
+# Content-addressed version storage.
+#
+# Objects are keyed by the sha256 of the *raw* file content and stored
+# zlib-compressed at objects/<2 hex>/<62 hex>. The payload is either
+#   b"full 0\n"  + raw bytes
+#   b"delta <base-hash> <depth>\n" + JSON line ops against the base
+# where ops are [i1, i2] (copy base lines i1:i2) or "text" (insert).
+# Versions copied from a parent delta against the parent's blob, so
+# near-identical copies cost a few hundred bytes instead of a full file.
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _object_path(h: str) -> Path:
+    return OBJECTS_DIR / h[:2] / h[2:]
+
+
+def has(h: Optional[str]) -> bool:
+    return bool(h) and _object_path(h).exists()
+
+
+def _read_payload(h: str) -> Tuple[bytes, bytes]:
+    raw = zlib.decompress(_object_path(h).read_bytes())
+    header, _, body = raw.partition(b"\n")
+    return header, body
+
+
+def _depth(h: str) -> int:
+    header, _ = _read_payload(h)
+    return int(header.split()[-1])
+
+
+def _lines(data: bytes) -> List[str]:
+    # latin-1 maps bytes 1:1 so the round trip is lossless for any encoding
+    return data.decode("latin-1").splitlines(keepends=True)
+
+
+def _make_delta(base: bytes, data: bytes) -> List[Any]:
+    base_lines, lines = _lines(base), _lines(data)
+    ops: List[Any] = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(lines[j1:j2]))
+    return ops
+
+
+def _write_object(h: str, payload: bytes) -> int:
+    path = _object_path(h)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    blob = zlib.compress(payload, 9)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def put(data: bytes, base: Optional[str] = None) -> str:
+    """Store `data` (deduplicated), as a delta against `base` when that is smaller."""
+    h = content_hash(data)
+    if has(h):
+        return h
+    payload = b"full 0\n" + data
+    if has(base) and base != h:
+        depth = _depth(base) + 1
+        if depth <= MAX_CHAIN:
+            delta = json.dumps(_make_delta(get(base), data), separators=(",", ":")).encode("latin-1")
+            if len(delta) < len(data):
+                payload = f"delta {base} {depth}\n".encode() + delta
+    _write_object(h, payload)
+    return h
+
+
+def get(h: str) -> bytes:
+    """Reconstruct raw content, resolving delta chains iteratively."""
+    chain = []
+    header, body = _read_payload(h)
+    while header.startswith(b"delta"):
+        chain.append(body)
+        _, base, _ = header.split()
+        header, body = _read_payload(base.decode())
+    data = body
+    for delta in reversed(chain):
+        base_lines = _lines(data)
+        out = []
+        for op in json.loads(delta.decode("latin-1")):
+            out.append("".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op)
+        data = "".join(out).encode("latin-1")
+    return data
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Version integration
+
+def ingest(file_path: Path, base: Optional[str] = None) -> str:
+    """Store a version file's content; returns its blob hash."""
+    with metrics.span("blob"):
+        data = file_path.read_bytes()
+        metrics.add("bytes_read", len(data))
+        return put(data, base)
+
+
+def materialize(meta: Dict[str, Any]) -> Path:
+    """
+    Return the working path of a version, recreating the file from the blob
+    store first if it has been pruned. Missing files without a blob are
+    returned as-is for the caller to report.
+    """
+    path = WORKSPACE / meta["filename"]
+    if not path.exists() and has(meta.get("blob")):
+        with metrics.span("blob"):
+            data = get(meta["blob"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            os.chmod(path, 0o755)
+        metrics.add("bytes_written", len(data))
+    return path
+
+
+def referenced_objects(blobs: List[str]) -> set:
+    """All objects reachable from `blobs`, including delta bases."""
+    live = set()
+    for h in blobs:
+        while h and h not in live and has(h):
+            live.add(h)
+            header, _ = _read_payload(h)
+            h = header.split()[1].decode() if header.startswith(b"delta") else None
+    return live
+
+
+def all_objects() -> List[str]:
+    if not OBJECTS_DIR.exists():
+        return []
+    return [p.parent.name + p.name for p in OBJECTS_DIR.glob("??/*") if not p.name.endswith(".tmp")]
+
+
+def object_size(h: str) -> int:
+    return _object_path(h).stat().st_size
+
+
+def remove(h: str) -> None:
+    _object_path(h).unlink(missing_ok=True)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI commands
+
+def enable_blob_store(project: str) -> int:
+    """Turn on blob storage for a project and ingest its existing versions (parents first)."""
+    from .store import get_store
+    from .utils import version_key
+
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    versions = store.versions(project)
+    updates: Dict[str, Dict[str, Any]] = {}
+    blobs: Dict[str, str] = {v: m["blob"] for v, m in versions.items() if m.get("blob")}
+    missing = []
+    for v in sorted(versions, key=version_key):
+        meta = versions[v]
+        if v in blobs:
+            continue
+        path = WORKSPACE / meta["filename"]
+        if not path.exists():
+            missing.append(v)
+            continue
+        blobs[v] = ingest(path, base=blobs.get(meta.get("copied_from")))
+        updates[v] = {"blob": blobs[v]}
+    if updates:
+        store.update_versions(project, updates)
+    store.update_project(project, blob_store=True)
+    print(f"✅ Blob store enabled for '{project}': {len(updates)} versions ingested.")
+    if missing:
+        print(f"⚠️ Skipped versions with no file on disk: {', '.join(missing)}")
+    return 0
+
+
+def _committed_at_head(paths: List[str], root: Path) -> set:
+    """The workspace-relative `paths` whose working copy is byte-identical to HEAD in the repo at `root`."""
+    from .git_ops import run_git, repo_path
+
+    rel = {repo_path(p, root): p for p in paths}
+    listing = run_git(["ls-tree", "-z", "HEAD", "--", *rel], quiet=True, cwd=root)
+    head = {}
+    for item in (listing or "").split("\0"):
+        if "\t" in item:
+            info, path = item.split("\t", 1)
+            head[path] = info.split()[2]
+    if not head:
+        return set()
+    names = sorted(head)
+    hashes = (run_git(["hash-object", "--", *names], quiet=True, cwd=root) or "").splitlines()
+    return {rel[p] for p, h in zip(names, hashes) if head[p] == h}
+
+
+def gc(project: Optional[str] = None, prune_working: bool = False, dry_run: bool = False,
+       force: bool = False) -> int:
+    """
+    Drop unreferenced objects and report how much the store saves on disk.
+    With `prune_working`, working files whose content is safely in the store
+    are removed too; they are rematerialized on demand (run, diff, checkout).
+    Only files committed unchanged to the project's git repo are pruned, so
+    the blob store is never their only copy; `force` lifts that restriction.
+    """
+    from .store import get_store
+    from .git_ops import run_git, workspace_git_ready, repo_path
+
+    store = get_store()
+    names = store.project_names()
+    if project and project not in names:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+
+    # liveness is workspace-wide: objects can be shared between projects
+    all_versions = {n: store.versions(n) for n in names}
+    live = referenced_objects([m["blob"] for vs in all_versions.values() for m in vs.values() if m.get("blob")])
+    dead = [h for h in all_objects() if h not in live]
+    dead_bytes = sum(object_size(h) for h in dead)
+    if not dry_run:
+        for h in dead:
+            remove(h)
+
+    raw_bytes = store_bytes = pruned_bytes = 0
+    n_blobs = held = 0
+    for name in ([project] if project else names):
+        prune: Dict[str, int] = {}
+        for meta in all_versions[name].values():
+            h = meta.get("blob")
+            if not has(h):
+                continue
+            n_blobs += 1
+            path = WORKSPACE / meta["filename"]
+            if path.exists():
+                size = path.stat().st_size
+                if prune_working and content_hash(path.read_bytes()) == h:
+                    prune[meta["filename"]] = size
+            else:
+                size = len(get(h))
+            raw_bytes += size
+        store_bytes += sum(object_size(h) for h in referenced_objects(
+            [m["blob"] for m in all_versions[name].values() if m.get("blob")]))
+        if not prune:
+            continue
+        proj = store.get_project(name) or {}
+        root = store.git_root(name)
+        in_git = proj.get("git_enabled") and workspace_git_ready(root)
+        if not force:
+            safe = _committed_at_head(list(prune), root) if in_git else set()
+            held += len(prune) - len(safe)
+            prune = {rel: size for rel, size in prune.items() if rel in safe}
+        pruned_bytes += sum(prune.values())
+        if prune and not dry_run:
+            for rel in prune:
+                (WORKSPACE / rel).unlink()
+            if in_git:
+                # keep `git status` clean: pruned files are still tracked, just not materialized
+                tracked = run_git(["ls-files", "--", *(repo_path(p, root) for p in prune)], quiet=True, cwd=root)
+                if tracked:
+                    run_git(["update-index", "--skip-worktree", "--", *tracked.splitlines()], cwd=root)
+
+    verb = "would remove" if dry_run else "removed"
+    print(f"🧹 gc: {verb} {len(dead)} unreferenced objects ({dead_bytes / 1024:.1f} KiB).")
+    if n_blobs:
+        saved = 100 * (1 - store_bytes / raw_bytes) if raw_bytes else 0.0
+        print(f"📦 {n_blobs} versions: {raw_bytes / 1024:.1f} KiB raw → {store_bytes / 1024:.1f} KiB "
+              f"in the blob store ({saved:.0f}% smaller).")
+    if prune_working:
+        print(f"🗑️ Working files {'to prune' if dry_run else 'pruned'}: {pruned_bytes / 1024:.1f} KiB "
+              f"(rematerialized on demand).")
+        if held:
+            print(f"🔒 Kept {held} working files that are not committed unchanged to git; "
+                  f"the blob store would be their only copy (use --force to prune them anyway).")
+    return 0
@@ -0,0 +1,326 @@
+from __future__ import annotations
+import json
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from .utils import STATE_DIR, now_iso, version_key, _atomic_write_json
+from .store import get_store
+from . import metrics
+
+CACHE_DIR = STATE_DIR / "changelog"
+CACHE_KEEP = 20  # cached ranges kept per project
+
+# `changelog <project> [FROM] [TO]` writes release notes for the commits in
+# FROM..TO (FROM exclusive; whole history if omitted; TO defaults to HEAD).
+# FROM and TO may be versions, <project>_<version> tags or any git rev.
+#
+# The commits touching projects/<project>/ come from ONE streaming
+#   git log --format=<sep-delimited fields> --numstat FROM..TO -- <path>
+# pipe, parsed while git is still writing. Each version's section combines
+# its description and copied_from, the line stats of its own file in its
+# commit, the project log entries written since the previous version, and
+# any other commits in between (log commits, safepoints, ...).
+#
+# The parsed commits are cached per range under .billy/changelog/<project>/.
+# When TO moves forward (a new version was saved), the newest cached range
+# with the same FROM whose end is an ancestor of TO is reused and only
+# <cached end>..TO is read from git. Descriptions and log entries are
+# always taken fresh from the store.
+
+_REC, _UNIT, _END = "\x1e", "\x1f", "\x1d"
+_FORMAT = f"--format={_REC}%H{_UNIT}%P{_UNIT}%at{_UNIT}%an{_UNIT}%s{_UNIT}%b{_END}"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Git history
+
+def _pathspec(path: str) -> List[str]:
+    """The project directory, minus a sharded project's own metadata and logs."""
+    from .checkout import SKIP_TOP
+
+    prefix = "" if path == "." else f"{path}/"
+    return [path] + [f":(exclude){prefix}{name}" for name in sorted(SKIP_TOP)]
+
+
+def stream_commits(root: Path, revs: List[str], path: str) -> Iterator[Dict[str, Any]]:
+    """Commits selected by `revs` (e.g. ["^a", "b"]) touching `path`, newest first, with per-file numstat."""
+    with metrics.span("git"):
+        proc = subprocess.Popen(["git", "log", _FORMAT, "--numstat", "--no-renames", *revs, "--",
+                                 *_pathspec(path)],
+                                cwd=str(root), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        commit: Optional[Dict[str, Any]] = None
+        header: Optional[str] = None
+        try:
+            for raw in proc.stdout:
+                line = raw.decode("utf-8", "replace")
+                if line.startswith(_REC):
+                    if commit:
+                        yield commit
+                    commit, header = None, line[1:]
+                elif header is not None:
+                    header += line
+                if header is not None:
+                    if _END not in header:
+                        continue
+                    sha, parents, ts, author, subject, body = header.split(_END, 1)[0].split(_UNIT, 5)
+                    commit = {"sha": sha, "parents": parents.split(), "time": int(ts), "author": author,
+                              "subject": subject, "body": body.strip(), "files": {}}
+                    header = None
+                    continue
+                parts = line.rstrip("\n").split("\t", 2)
+                if commit is not None and len(parts) == 3:
+                    added, removed, name = parts
+                    commit["files"][name] = [int(added) if added.isdigit() else 0,
+                                             int(removed) if removed.isdigit() else 0]
+            if commit:
+                yield commit
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+
+def _is_ancestor(root: Path, older: str, newer: str) -> bool:
+    with metrics.span("git"):
+        return subprocess.run(["git", "merge-base", "--is-ancestor", older, newer], cwd=str(root),
+                              capture_output=True).returncode == 0
+
+
+def _cache_dir(project: str) -> Path:
+    return CACHE_DIR / project
+
+
+def range_commits(project: str, root: Path, path: str, start: Optional[str], end: str,
+                  use_cache: bool = True) -> Tuple[List[Dict[str, Any]], str]:
+    """Commits in start..end (newest first) and how they were obtained ("cached", "extended", "git")."""
+    cache_dir = _cache_dir(project)
+    base = start or "root"
+    target = cache_dir / f"{base}..{end}.json"
+    if use_cache and target.exists():
+        return json.loads(target.read_text(encoding="utf-8"))["commits"], "cached"
+
+    cached: List[Dict[str, Any]] = []
+    exclude = [start] if start else []
+    how = "git"
+    if use_cache and cache_dir.exists():
+        candidates = sorted(cache_dir.glob(f"{base}..*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for candidate in candidates[:3]:
+            prev_end = candidate.name[len(base) + 2:-len(".json")]
+            if _is_ancestor(root, prev_end, end):
+                cached = json.loads(candidate.read_text(encoding="utf-8"))["commits"]
+                # not prev_end..end: a merge can bring in history that start excludes but prev_end does not
+                exclude, how = exclude + [prev_end], "extended"
+                break
+    fresh = list(stream_commits(root, [f"^{rev}" for rev in exclude] + [end], path))
+    commits = fresh + cached
+
+    if use_cache:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write_json(target, {"from": start, "to": end, "path": path, "commits": commits})
+        for old in sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)[:-CACHE_KEEP]:
+            old.unlink(missing_ok=True)
+    return commits, how
+
+
+def _resolve(project: str, spec: str, versions: Dict[str, Dict[str, Any]], root: Path) -> Tuple[Optional[str], Optional[str]]:
+    """A version, <project>_<version> tag or git rev → (version name or None, commit sha or None)."""
+    from .git_ops import run_git
+
+    name = spec[len(project) + 1:] if spec.startswith(f"{project}_") and spec not in versions else spec
+    meta = versions.get(name)
+    if meta and meta.get("git_commit"):
+        return name, meta["git_commit"]
+    rev = f"refs/tags/{project}_{name}" if meta else spec
+    sha = run_git(["rev-parse", "--verify", "-q", f"{rev}^{{commit}}"], quiet=True, cwd=root)
+    return (name if meta else None), sha or None
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Release notes
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+
+
+def build(project: str, start: Optional[str] = None, end: Optional[str] = None,
+          use_cache: bool = True) -> Dict[str, Any]:
+    """The changelog of `project` between two points, as a JSON-ready dict. Raises ValueError on bad input."""
+    from .git_ops import run_git, repo_path, workspace_git_ready
+    from . import log
+
+    store = get_store()
+    proj = store.get_project(project)
+    if proj is None:
+        raise ValueError(f"Project '{project}' not found.")
+    root = store.git_root(project)
+    if not proj.get("git_enabled") or not workspace_git_ready(root):
+        raise ValueError(f"Project '{project}' has no git history (create it with --git).")
+    versions = store.versions(project)
+
+    start_name = start_sha = None
+    if start:
+        start_name, start_sha = _resolve(project, start, versions, root)
+        if start_sha is None:
+            raise ValueError(f"'{start}' is neither a committed version of '{project}' nor a git revision.")
+    end_name, end_sha = _resolve(project, end or "HEAD", versions, root)
+    if end_sha is None:
+        raise ValueError(f"'{end}' is neither a committed version of '{project}' nor a git revision."
+                         if end else "The repository has no commits yet.")
+
+    path = repo_path(f"projects/{project}", root)
+    commits, source = range_commits(project, root, path, start_sha, end_sha, use_cache)
+    commits = commits[::-1]  # oldest first from here on
+
+    by_commit: Dict[str, List[str]] = {}
+    for v, meta in versions.items():
+        if meta.get("git_commit"):
+            by_commit.setdefault(meta["git_commit"], []).append(v)
+    in_range = {c["sha"] for c in commits}
+    released = sorted((v for sha in in_range for v in by_commit.get(sha, ())), key=version_key)
+
+    # FROM's time bounds the log entries and the uncommitted versions that are included
+    since = None
+    if start_name:
+        since = versions[start_name]["created_at"]
+    elif start_sha:
+        ts = run_git(["show", "-s", "--format=%at", start_sha], quiet=True, cwd=root)
+        since = _iso(int(ts)) if ts else None
+    # without an explicit TO, versions whose commit has not landed yet (async queue) close the changelog
+    unreleased = []
+    if end is None:
+        unreleased = sorted((v for v, m in versions.items()
+                             if not m.get("git_commit") and (since is None or m["created_at"] > since)),
+                            key=version_key)
+
+    def section(v: Optional[str]) -> Dict[str, Any]:
+        meta = versions.get(v, {})
+        return {"version": v, "created_at": meta.get("created_at"), "description": meta.get("description", ""),
+                "copied_from": meta.get("copied_from"), "commit": meta.get("git_commit"),
+                "added": 0, "removed": 0, "log": [], "commits": []}
+
+    sections = {v: section(v) for v in released + unreleased}
+    pending = section(None)  # commits/log entries after the last version
+
+    # sweep commits oldest → newest: other commits join the next version's section
+    order = []
+    others: List[Dict[str, Any]] = []
+    totals = {"commits": len(commits), "added": 0, "removed": 0}
+    for commit in commits:
+        for added, removed in commit["files"].values():
+            totals["added"] += added
+            totals["removed"] += removed
+        own = [v for v in by_commit.get(commit["sha"], ()) if v in sections]
+        if not own:
+            others.append(commit)
+            continue
+        for v in sorted(own, key=version_key):
+            stat = commit["files"].get(repo_path(versions[v]["filename"], root), [0, 0])
+            sections[v]["added"], sections[v]["removed"] = stat
+            sections[v]["commit_time"] = _iso(commit["time"])
+            order.append(v)
+        sections[own[0]]["commits"] = [_commit_summary(c) for c in others]
+        others = []
+    order.extend(unreleased)
+    pending["commits"] = [_commit_summary(c) for c in others]
+
+    # log entries after FROM (up to TO); each goes to the first version saved after it
+    until = _iso(commits[-1]["time"]) if end and commits else None
+    boundaries = [(sections[v].get("commit_time") or sections[v]["created_at"] or "", v) for v in order]
+    i = 0
+    for entry in log.iter_entries(project, since=since, until=until):
+        if since and entry["ts"] <= since:
+            continue
+        while i < len(boundaries) and boundaries[i][0] <= entry["ts"]:
+            i += 1
+        (sections[boundaries[i][1]] if i < len(boundaries) else pending)["log"].append(entry)
+
+    notes = [sections[v] for v in order]
+    for note in notes:
+        note.pop("commit_time", None)
+        note["unreleased"] = note["version"] in unreleased
+    return {
+        "project": project,
+        "from": start_name or start,
+        "to": end_name or end or "HEAD",
+        "range": [start_sha, end_sha],
+        "generated_at": now_iso(),
+        "source": source,
+        "totals": {**totals, "versions": len(released)},
+        "versions": notes[::-1],  # newest first
+        "after_last_version": {"log": pending["log"], "commits": pending["commits"]},
+    }
+
+
+def _commit_summary(commit: Dict[str, Any]) -> Dict[str, Any]:
+    added = sum(a for a, _ in commit["files"].values())
+    removed = sum(r for _, r in commit["files"].values())
+    return {"sha": commit["sha"], "time": _iso(commit["time"]), "author": commit["author"],
+            "subject": commit["subject"], "added": added, "removed": removed}
+
+
+def render_markdown(notes: Dict[str, Any]) -> Iterator[str]:
+    span = f"{notes['from']} → {notes['to']}" if notes["from"] else f"up to {notes['to']}"
+    t = notes["totals"]
+    yield f"# {notes['project']} changelog ({span})"
+    yield ""
+    yield (f"_{t['versions']} version{'s' if t['versions'] != 1 else ''}, {t['commits']} commit"
+           f"{'s' if t['commits'] != 1 else ''}, +{t['added']} −{t['removed']} lines._")
+    yield ""
+
+    def extras(log_entries, commits):
+        for entry in log_entries:
+            yield f"- 📝 {entry['message']} _({entry['ts']})_"
+        for c in commits:
+            yield f"- {c['sha'][:8]} {c['subject']} (+{c['added']} −{c['removed']})"
+
+    after = notes["after_last_version"]
+    if after["log"] or after["commits"]:
+        yield "## Since the last version"
+        yield ""
+        yield from extras(after["log"], after["commits"])
+        yield ""
+    for note in notes["versions"]:
+        when = (note["created_at"] or "")[:10]
+        tag = " (unreleased)" if note["unreleased"] else (f" · {note['commit'][:8]}" if note["commit"] else "")
+        yield f"## {note['version']} — {when}{tag}"
+        yield ""
+        if note["description"]:
+            yield note["description"]
+            yield ""
+        facts = []
+        if note["copied_from"]:
+            facts.append(f"based on {note['copied_from']}")
+        if not note["unreleased"]:
+            facts.append(f"+{note['added']} −{note['removed']} lines")
+        if facts:
+            yield f"- {', '.join(facts)}"
+        yield from extras(note["log"], note["commits"])
+        yield ""
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `changelog`
+
+def changelog(project: str, start: Optional[str] = None, end: Optional[str] = None, as_json: bool = False,
+              output: Optional[str] = None, use_cache: bool = True) -> int:
+    try:
+        notes = build(project, start, end, use_cache)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if as_json:
+        text = json.dumps(notes, indent=2, ensure_ascii=False)
+    else:
+        text = "\n".join(render_markdown(notes))
+    if output:
+        path = Path(output)
+        path.write_text(text + "\n", encoding="utf-8")
+        t = notes["totals"]
+        how = {"git": "read from git", "cached": "from cache", "extended": "cache + new commits"}[notes["source"]]
+        print(f"📄 Changelog for {project} written to {path} ({t['versions']} versions, {t['commits']} commits, "
+              f"history {how}).")
+    else:
+        print(text)
+    return 0
+
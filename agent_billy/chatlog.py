@@ -1,34 +1,25 @@
 # agent_billy/chatlog.py
+import hashlib
+import json
 import sys
 from datetime import datetime
 from pathlib import Path
-import subprocess
-import json
 
 from .core import list_projects, run_version
-from .utils import WORKSPACE, MEMORY_FILE
+from .utils import WORKSPACE, STATE_DIR, latest_version
+from .git_ops import run_git, list_tags, workspace_git_ready, head_ref, CatFileSession, GIT_DIR
+from .store import get_store
+from .blobstore import materialize
+from .log import log_stats, render_markdown, log_index_path
 
 DOCS_DIR = WORKSPACE / "docs"
+CHATLOG_LOG_ENTRIES = 200  # log entries included in the chat log
 
 
 def now_iso():
     return datetime.now().isoformat(timespec="seconds")
 
 
-def run_git(args):
-    try:
-        result = subprocess.run(
-            ["git"] + args,
-            cwd=str(WORKSPACE),
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError:
-        return None
-
-
 # ────────────────────────────────────────────────────────────────────────────────
 # Test Cycle Helper
 def run_test_cycle(project: str) -> list[str]:
@@ -46,13 +37,9 @@ def run_test_cycle(project: str) -> list[str]:
 
     # Step 2: Run latest version
     results.append("### Step 2 — Run Latest Version")
-    memory = {}
-    if MEMORY_FILE.exists():
-        memory = json.loads(MEMORY_FILE.read_text(encoding="utf-8"))
-    proj_meta = memory.get("projects", {}).get(project, {})
-    versions = proj_meta.get("versions", {})
+    versions = get_store().versions(project)
     if versions:
-        latest = sorted(versions.keys())[-1]
+        latest = latest_version(versions)
         try:
             code = run_version(project, latest)
             if code == 0:
@@ -66,80 +53,119 @@ def run_test_cycle(project: str) -> list[str]:
 
     # Step 3: Git status
     results.append("### Step 3 — Git Status")
-    git_status = run_git(["status", "-sb"]) or "(git status failed)"
+    git_status = run_git(["status", "-sb"], quiet=True) or "(git status failed)"
     results.append(f"```\n{git_status}\n```\n")
 
     return results
 
 
 # ────────────────────────────────────────────────────────────────────────────────
-# Chat Log Generator
-def generate_chat_log(project, include_code=False, include_billy=False):
-    """Generate a full to_chat_log.md for sharing here."""
-    DOCS_DIR.mkdir(exist_ok=True)
-    out_file = WORKSPACE / "to_chat_log.md"
+# Section cache
+#
+# Each chat-log section is stored with the key it was rendered from
+# (file stats, git HEAD/refs, metadata revision, ...). On the next run only
+# sections whose key changed are rebuilt; everything else is replayed.
 
-    memory = {}
-    if MEMORY_FILE.exists():
-        memory = json.loads(MEMORY_FILE.read_text(encoding="utf-8"))
-
-    proj_meta = memory.get("projects", {}).get(project, {})
-    versions = proj_meta.get("versions", {})
-
-    lines = []
-    lines.append(f"# To Chat Log — {project}")
-    lines.append(f"Generated: {now_iso()}\n")
-    lines.append(f"**Description:** {proj_meta.get('description','')}\n")
-    lines.append(f"**Git enabled:** {proj_meta.get('git_enabled', False)}\n")
-    lines.append(f"**Workspace:** {WORKSPACE}")
-    lines.append(f"**Python:** {sys.version.split()[0]}\n")
-    lines.append("---\n")
-
-    # Repo status
-    status = run_git(["status", "-sb"]) or "(git status failed)"
-    commits = run_git(["log", "--oneline", "-5"]) or "(git log failed)"
-    tags = run_git(["tag"]) or "(no tags)"
-    lines.append("## Repo Status")
-    lines.append(status + "\n")
-    lines.append("## Recent Commits")
-    lines.append(commits + "\n")
-    lines.append("## Tags")
-    lines.append(tags + "\n")
-    lines.append("---\n")
-
-    # Versions
-    lines.append("## Versions")
-    for v, meta in versions.items():
-        lines.append(f"- {v}: {meta['description']} (created {meta['created_at']})")
-        lines.append(f"  - file: {meta['filename']}")
-        lines.append(f"  - copied_from: {meta.get('copied_from')}")
-        lines.append(f"  - git_commit: {meta.get('git_commit')}")
-        lines.append(f"  - last_run: {meta.get('last_run')}\n")
-
-        if include_code:
-            file_path = WORKSPACE / meta["filename"]
-            if file_path.exists():
-                try:
-                    code = file_path.read_text(encoding="utf-8")
-                    lines.append("```python")
-                    lines.append(code.strip())
-                    lines.append("```\n")
-                except Exception as e:
-                    lines.append(f"⚠️ Could not read {file_path}: {e}\n")
-
-    # Project log
-    log_file = DOCS_DIR / f"{project.upper()}_LOG.md"
-    if log_file.exists():
-        lines.append("## Project Log")
-        lines.append(log_file.read_text(encoding="utf-8"))
-    else:
-        lines.append("## Project Log")
-        lines.append("(no log yet)\n")
+CACHE_DIR = STATE_DIR / "chatlog"
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
 
-    lines.append("---\n")
 
-    # Health checks
-    lines.append("## Health Warnings")
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SectionCache:
+    def __init__(self, project: str):
+        self.path = CACHE_DIR / f"{project}.json"
+        self.hits = self.misses = 0
+        try:
+            self.data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.data = {}
+        self.fresh = {}
+
+    def get(self, name: str, key, build):
+        """Return cached lines for `name` if its key matches, else build() and remember them."""
+        key = _digest(key)
+        entry = self.data.get(name)
+        if entry and entry["key"] == key:
+            self.hits += 1
+            lines = entry["lines"]
+        else:
+            self.misses += 1
+            lines = build()
+        self.fresh[name] = {"key": key, "lines": lines}
+        return lines
+
+    def peek(self, name: str, key):
+        entry = self.data.get(name)
+        return entry["lines"] if entry and entry["key"] == _digest(key) else None
+
+    def save(self) -> None:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.fresh, ensure_ascii=False), encoding="utf-8")
+
+
+class _LineWriter:
+    """Streams lines to a file with the same separators as "\\n".join(lines)."""
+
+    def __init__(self, f):
+        self.f = f
+        self.first = True
+
+    def write(self, lines) -> None:
+        for line in lines:
+            if not self.first:
+                self.f.write("\n")
+            self.f.write(line)
+            self.first = False
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Sections
+
+def _code_block(path: Path) -> list[str]:
+    try:
+        code = path.read_text(encoding="utf-8")
+    except Exception as e:
+        return [f"⚠️ Could not read {path}: {e}\n"]
+    return ["```python", code.strip(), "```\n"]
+
+
+def _repo_section() -> list[str]:
+    commits = "(git log failed)"
+    tags = "(no tags)"
+    if workspace_git_ready():
+        with CatFileSession() as git:
+            commits = "\n".join(git.log("HEAD", 5)) or commits
+        tags = "\n".join(list_tags()) or tags
+    return ["## Recent Commits", commits + "\n", "## Tags", tags + "\n"]
+
+
+def _version_section(v: str, meta, include_code: bool) -> list[str]:
+    lines = [
+        f"- {v}: {meta['description']} (created {meta['created_at']})",
+        f"  - file: {meta['filename']}",
+        f"  - copied_from: {meta.get('copied_from')}",
+        f"  - git_commit: {meta.get('git_commit')}",
+        f"  - last_run: {meta.get('last_run')}\n",
+    ]
+    if include_code:
+        file_path = materialize(meta)
+        if file_path.exists():
+            lines.extend(_code_block(file_path))
+    return lines
+
+
+def _health_section(versions, log_present: bool) -> list[str]:
+    lines = ["## Health Warnings"]
     if not versions:
         lines.append("⚠️ No versions found.")
     else:
@@ -148,39 +174,111 @@ def generate_chat_log(project, include_code=False, include_billy=False):
             lines.append(f"⚠️ Versions missing commits: {', '.join(missing)}")
         else:
             lines.append("All versions have git commits ✅")
-        latest = sorted(versions.keys())[-1]
+        latest = latest_version(versions)
         if versions[latest].get("last_run"):
             lines.append(f"- Latest version ({latest}) was run ✅")
         else:
             lines.append(f"- Latest version ({latest}) has not been run ⚠️")
-    if log_file.exists():
+    if log_present:
         lines.append("- Project log present ✅")
     else:
         lines.append("- Project log missing ⚠️")
+    return lines
+
+
+def _log_section(project, info):
+    if not info["entries"]:
+        return ["## Project Log", "(no log yet)\n"]
+    lines = ["## Project Log"]
+    if info["entries"] > CHATLOG_LOG_ENTRIES:
+        lines.append(f"_Last {CHATLOG_LOG_ENTRIES} of {info['entries']} entries "
+                     f"(`billy.py log {project} --since …` for older ones)._\n")
+    lines.extend(list(render_markdown(project, tail=CHATLOG_LOG_ENTRIES))[2:])
+    return lines + [""]
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Chat Log Generator
+def generate_chat_log(project, include_code=False, include_billy=False, test_cycle="run"):
+    """
+    Generate a full to_chat_log.md for sharing here.
+
+    Sections are cached in .billy/chatlog/ and only rebuilt when their inputs
+    change. `test_cycle` is "run" (always), "reuse" (replay the cached cycle
+    while the latest version is unchanged) or "skip".
+    """
+    DOCS_DIR.mkdir(exist_ok=True)
+    out_file = WORKSPACE / "to_chat_log.md"
+
+    store = get_store()
+    proj_meta = store.get_project(project) or {}
+    versions = store.versions(project)
+    cache = SectionCache(project)
+    head = head_ref()[1] if workspace_git_ready() else None
+    refs = [_stat_key(GIT_DIR / "packed-refs"), _stat_key(GIT_DIR / "refs" / "tags")]
+    log_index = log_index_path(project)
+
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
+    with tmp_file.open("w", encoding="utf-8") as f:
+        out = _LineWriter(f)
+        out.write([
+            f"# To Chat Log — {project}",
+            f"Generated: {now_iso()}\n",
+            f"**Description:** {proj_meta.get('description','')}\n",
+            f"**Git enabled:** {proj_meta.get('git_enabled', False)}\n",
+            f"**Workspace:** {WORKSPACE}",
+            f"**Python:** {sys.version.split()[0]}\n",
+            "---\n",
+        ])
+
+        # Repo status (working-tree status is always live; log/tags follow HEAD and refs)
+        status = run_git(["status", "-sb"], quiet=True) or "(git status failed)"
+        out.write(["## Repo Status", status + "\n"])
+        out.write(cache.get("repo", [head, refs], _repo_section))
+        out.write(["---\n"])
+
+        # Versions, one cache entry per version
+        out.write(["## Versions"])
+        for v, meta in versions.items():
+            key = [meta, include_code, _stat_key(WORKSPACE / meta["filename"]) if include_code else None]
+            out.write(cache.get(f"version:{v}", key, lambda: _version_section(v, meta, include_code)))
+
+        # Project log (rendered from the log segments, most recent entries only)
+        log_info = log_stats(project)
+        out.write(cache.get("log", [_stat_key(log_index), CHATLOG_LOG_ENTRIES], lambda: _log_section(project, log_info)))
+        out.write(["---\n"])
+
+        # Health checks
+        out.write(_health_section(versions, log_info["entries"] > 0))
+
+        # ────────────────────────────────────────────────
+        # Test cycle results
+        if test_cycle != "skip":
+            out.write(["\n---\n"])
+            latest = latest_version(versions)
+            latest_meta = versions.get(latest, {})
+            key = [latest, latest_meta.get("filename"), latest_meta.get("blob"),
+                   _stat_key(WORKSPACE / latest_meta["filename"]) if latest_meta else None]
+            cached = cache.peek("test_cycle", key) if test_cycle == "reuse" else None
+            if cached is not None:
+                out.write(cache.get("test_cycle", key, lambda: cached))
+            else:
+                out.write(cache.get("test_cycle", [None], lambda: run_test_cycle(project)))
+                cache.fresh["test_cycle"]["key"] = _digest(key)
+
+        # ────────────────────────────────────────────────
+        # Billy’s own source snapshot
+        if include_billy:
+            out.write(["\n---\n", "## Billy Source Snapshot"])
+            billy_root = Path(__file__).resolve().parent.parent  # may differ from WORKSPACE
+            billy_files = [billy_root / "billy.py"] + sorted((billy_root / "agent_billy").glob("*.py"))
+            for bf in billy_files:
+                if bf.exists():
+                    rel = bf.relative_to(billy_root)
+                    out.write(cache.get(f"billy:{rel}", _stat_key(bf), lambda: [f"### {rel}", *_code_block(bf)]))
 
-    # ────────────────────────────────────────────────
-    # Test cycle results
-    lines.append("\n---\n")
-    lines.extend(run_test_cycle(project))
-
-    # ────────────────────────────────────────────────
-    # Billy’s own source snapshot
-    if include_billy:
-        lines.append("\n---\n")
-        lines.append("## Billy Source Snapshot")
-        billy_files = [WORKSPACE / "billy.py"] + sorted((WORKSPACE / "agent_billy").glob("*.py"))
-        for bf in billy_files:
-            if bf.exists():
-                rel = bf.relative_to(WORKSPACE)
-                lines.append(f"### {rel}")
-                try:
-                    code = bf.read_text(encoding="utf-8")
-                    lines.append("```python")
-                    lines.append(code.strip())
-                    lines.append("```\n")
-                except Exception as e:
-                    lines.append(f"⚠️ Could not read {bf}: {e}\n")
-
-    out_file.write_text("\n".join(lines), encoding="utf-8")
-    print(f"📄 To Chat Log generated at {out_file}")
+    tmp_file.replace(out_file)
+    cache.save()
+    print(f"📄 To Chat Log generated at {out_file} "
+          f"({cache.hits} cached / {cache.misses} rebuilt sections)")
     return 0
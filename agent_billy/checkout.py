@@ -0,0 +1,247 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from .utils import WORKSPACE, PROJECTS_DIR
+from .store import get_store
+from . import blobstore, metrics
+
+# `checkout` restores or exports versions without touching git's index,
+# HEAD or the rest of the worktree.
+#
+# A version's file comes from the content store when it has a blob, else
+# from its commit (or its <project>_<version> tag) through a persistent
+# `git cat-file --batch` reader, one per worker thread. With --all, the
+# whole projects/<project>/ tree as of that commit is read the same way by
+# walking tree objects, so no checkout/ls-tree processes are spawned.
+# In-place restores replace files atomically; `git status` then simply
+# shows them as modified. Exports of several versions run in parallel.
+
+# Project-level metadata of sharded projects is never restored from history
+SKIP_TOP = {"memory.json", "memory.db", "memory.db-wal", "memory.db-shm", "logs", ".gitignore"}
+
+File = Tuple[str, str, bytes]  # (path relative to projects/<project>/, git mode, content)
+
+
+def _tree_entries(data: bytes) -> Iterator[Tuple[str, str, str]]:
+    """(mode, name, sha) for each entry of a raw git tree object."""
+    pos = 0
+    while pos < len(data):
+        space = data.index(b" ", pos)
+        nul = data.index(b"\0", space)
+        yield data[pos:space].decode(), os.fsdecode(data[space + 1:nul]), data[nul + 1:nul + 21].hex()
+        pos = nul + 21
+
+
+class _Reader:
+    """Version contents for one project; safe to share between threads."""
+
+    def __init__(self, project: str, root: Path):
+        from .git_ops import workspace_git_ready
+        self.project, self.root = project, root
+        self.git_ready = workspace_git_ready(root)
+        self._local = threading.local()
+        self._sessions: list = []
+        self._guard = threading.Lock()
+
+    def _git(self):
+        session = getattr(self._local, "git", None)
+        if session is None:
+            from .git_ops import CatFileSession
+            session = self._local.git = CatFileSession(self.root)
+            with self._guard:
+                self._sessions.append(session)
+        return session
+
+    def _repo_dir(self) -> str:
+        from .git_ops import repo_path
+        return repo_path((PROJECTS_DIR / self.project).relative_to(WORKSPACE).as_posix(), self.root)
+
+    def version_file(self, meta: Dict[str, Any], rev: Optional[str]) -> Tuple[Optional[bytes], str]:
+        """(content, source) of a version's own file."""
+        if blobstore.has(meta.get("blob")):
+            with metrics.span("blob"):
+                return blobstore.get(meta["blob"]), "blob store"
+        if rev and self.git_ready:
+            from .git_ops import repo_path
+            obj = self._git().read(f"{rev}:{repo_path(meta['filename'], self.root)}")
+            if obj and obj[1] == "blob":
+                return obj[2], rev
+        return None, ""
+
+    def tree(self, rev: str) -> Optional[List[File]]:
+        """Every file under projects/<project>/ as of `rev` (None if it has no such tree)."""
+        if not self.git_ready:
+            return None
+        git = self._git()
+        top = self._repo_dir()
+        obj = git.read(f"{rev}:{top}" if top != "." else f"{rev}^{{tree}}")
+        if not obj or obj[1] != "tree":
+            return None
+        files: List[File] = []
+        stack = [("", obj[2])]
+        while stack:
+            prefix, data = stack.pop()
+            for mode, name, sha in _tree_entries(data):
+                if not prefix and name in SKIP_TOP:
+                    continue
+                if mode == "40000":
+                    sub = git.read(sha)
+                    if sub:
+                        stack.append((f"{prefix}{name}/", sub[2]))
+                elif mode != "160000":  # submodules have no content here
+                    blob = git.read(sha)
+                    if blob:
+                        files.append((prefix + name, mode, blob[2]))
+        return files
+
+    def close(self) -> None:
+        for session in self._sessions:
+            session.close()
+
+
+def _resolve(project: str, spec: str, versions: Dict[str, Dict[str, Any]]):
+    """A version name, its <project>_<version> tag, or any git rev → (label, meta or None, rev)."""
+    name = spec[len(project) + 1:] if spec.startswith(f"{project}_") and spec not in versions else spec
+    meta = versions.get(name)
+    if meta is None:
+        return spec, None, spec
+    return name, meta, meta.get("git_commit") or f"refs/tags/{project}_{name}"
+
+
+def _collect(reader: _Reader, label: str, meta: Optional[Dict[str, Any]], rev: str,
+             whole: bool) -> Tuple[Optional[List[File]], str]:
+    """The files making up one version, and where they came from."""
+    if whole or meta is None:
+        files = reader.tree(rev)
+        return files, (rev[:8] if meta and rev == meta.get("git_commit") else rev)
+    data, source = reader.version_file(meta, rev)
+    if data is None:
+        working = WORKSPACE / meta["filename"]
+        if not working.exists():
+            return None, ""
+        data, source = working.read_bytes(), "working file"
+    elif source == meta.get("git_commit"):
+        source = source[:8]
+    name = Path(meta["filename"]).relative_to(Path("projects") / reader.project).as_posix()
+    return [(name, "100755", data)], source
+
+
+def _write(path: Path, mode: str, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if mode == "120000":
+        path.unlink(missing_ok=True)
+        os.symlink(os.fsdecode(data), path)
+        return
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.chmod(tmp, 0o755 if mode == "100755" else 0o644)
+    os.replace(tmp, path)
+    metrics.add("bytes_written", len(data))
+
+
+def _size(n: float) -> str:
+    if n < 1024:
+        return f"{n:.0f}B"
+    return f"{n / 1024:.1f}KiB" if n < 1024 * 1024 else f"{n / 1024 / 1024:.1f}MiB"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `checkout`
+
+def restore(project: str, spec: str, whole: bool = False, force: bool = False) -> int:
+    """Put one version's file (or, with `whole`, the project's files at that commit) back in place."""
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    label, meta, rev = _resolve(project, spec, store.versions(project))
+    reader = _Reader(project, store.git_root(project))
+    try:
+        files, source = _collect(reader, label, meta, rev, whole)
+    finally:
+        reader.close()
+    if files is None and meta is None:
+        print(f"❌ '{spec}' is neither a version of '{project}' nor a git revision containing it.")
+        return 1
+    if files is None or source == "working file":
+        print(f"❌ Nothing to restore {label} from: no blob, commit or tag holds its content.")
+        return 1
+
+    base = PROJECTS_DIR / project
+    changed = [(rel, mode, data) for rel, mode, data in files
+               if not (base / rel).exists() or (base / rel).is_symlink() or (base / rel).read_bytes() != data]
+    dirty = [rel for rel, _, _ in changed if (base / rel).exists()]
+    if dirty and not force:
+        print(f"❌ {len(dirty)} file(s) differ from {label} and would be overwritten (use --force):")
+        for rel in dirty[:20]:
+            print(f"   - projects/{project}/{rel}")
+        return 1
+    for rel, mode, data in changed:
+        _write(base / rel, mode, data)
+    what = f"{len(files)} file{'s' if len(files) != 1 else ''}"
+    print(f"✅ Restored {label} ({what}, {len(changed)} changed) from {source}.")
+    return 0
+
+
+def export(project: str, specs: List[str], dest: str, whole: bool = False, force: bool = False,
+           jobs: Optional[int] = None) -> int:
+    """Materialize several versions side by side under dest/<version>/, in parallel."""
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    versions = store.versions(project)
+    targets = [_resolve(project, spec, versions) for spec in specs]
+    out = Path(dest).expanduser().resolve()
+    taken = [label for label, _, _ in targets if (out / label).exists() and any((out / label).iterdir())]
+    if taken and not force:
+        print(f"❌ Not empty: {', '.join(str(out / t) for t in taken)} (use --force to overwrite).")
+        return 1
+
+    reader = _Reader(project, store.git_root(project))
+
+    def one(target):
+        label, meta, rev = target
+        files, source = _collect(reader, label, meta, rev, whole)
+        if files is None:
+            return label, None, source
+        for rel, mode, data in files:
+            _write(out / label / rel, mode, data)
+        return label, files, source
+
+    start = time.perf_counter()
+    failed = total_files = total_bytes = 0
+    try:
+        with ThreadPoolExecutor(max_workers=jobs or min(8, len(targets))) as pool:
+            for label, files, source in pool.map(one, targets):
+                if files is None:
+                    failed += 1
+                    print(f"❌ {label}: content not available")
+                    continue
+                size = sum(len(d) for _, _, d in files)
+                total_files += len(files)
+                total_bytes += size
+                print(f"📦 {label} → {out / label} ({len(files)} file{'s' if len(files) != 1 else ''}, "
+                      f"{_size(size)}, from {source})")
+    finally:
+        reader.close()
+    elapsed = time.perf_counter() - start
+    rate = total_bytes / elapsed if elapsed else 0.0
+    print(f"✅ Exported {len(targets) - failed}/{len(targets)} versions ({total_files} files, {_size(total_bytes)}) "
+          f"in {elapsed:.2f}s — {total_files / elapsed if elapsed else 0:.0f} files/s, {_size(rate)}/s.")
+    return 1 if failed else 0
+
+
+def checkout(project: str, specs: List[str], dest: Optional[str] = None, whole: bool = False,
+             force: bool = False, jobs: Optional[int] = None) -> int:
+    if dest is None:
+        if len(specs) != 1:
+            print("❌ Restoring in place takes one version; use --to DIR to export several side by side.")
+            return 1
+        return restore(project, specs[0], whole, force)
+    return export(project, specs, dest, whole, force, jobs)
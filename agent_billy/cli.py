@@ -1,84 +1,677 @@
 # agent_billy/cli.py
 import argparse
-from . import core, git_ops, log, chatlog
+import os
+import sys
 
+# Subcommands are declared as (help, add_arguments, handler). Only the
+# requested command's arguments are built, and each handler imports its
+# module at dispatch time, so `billy.py list` never loads the run, chat-log
+# or matrix machinery.
 
-def main():
+GIT_BACKENDS = ("fast-import", "subprocess")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Project ops
+
+def _args_create(p):
+    p.add_argument("project")
+    p.add_argument("-d", "--description", default="", help="Project description")
+    p.add_argument("--git", action="store_true", help="Enable Git commits for this project")
+    p.add_argument("--blob-store", action="store_true", help="Keep version contents in the deduplicated blob store")
+    p.add_argument("--shard", action="store_true",
+                   help="Give the project its own memory.json and git repo under projects/<project>/")
+
+def _run_create(args):
+    from . import core
+    return core.create_project(args.project, args.description, args.git, blob_store=args.blob_store,
+                               shard=args.shard)
+
+
+def _args_list(p):
+    p.add_argument("project", nargs="?", help="Project name (optional)")
+    p.add_argument("--all-workspaces", action="store_true",
+                   help="List every registered workspace (in parallel); filters and paging apply in each")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Parallel workspaces for --all-workspaces")
+    out = p.add_mutually_exclusive_group()
+    out.add_argument("--json", action="store_const", dest="fmt", const="json", help="One JSON document (with a `next` cursor)")
+    out.add_argument("--jsonl", action="store_const", dest="fmt", const="jsonl", help="One JSON object per line")
+    p.set_defaults(fmt="text")
+    p.add_argument("--limit", type=int, default=None, help="Rows per page")
+    p.add_argument("--offset", type=int, default=0, help="Rows to skip")
+    p.add_argument("--after", default=None, help="Cursor: continue after this version (or project/version)")
+    p.add_argument("--since", default=None, help="Created at or after (ISO date/time prefix)")
+    p.add_argument("--until", default=None, help="Created at or before (ISO prefix, e.g. 2025-06 = whole month)")
+    p.add_argument("--copied-from", default=None, metavar="VERSION", help="Only copies of VERSION ('' = roots)")
+    ran = p.add_mutually_exclusive_group()
+    ran.add_argument("--ran", action="store_const", dest="ran", const=True, help="Only versions that were run")
+    ran.add_argument("--never-run", action="store_const", dest="ran", const=False, help="Only versions never run")
+    git = p.add_mutually_exclusive_group()
+    git.add_argument("--committed", action="store_const", dest="committed", const=True, help="Only committed versions")
+    git.add_argument("--uncommitted", action="store_const", dest="committed", const=False,
+                     help="Only versions without a git commit")
+
+def _list_argv(args):
+    """The filter/paging/format options of a parsed `list`, as argv to replay in another workspace."""
+    argv = [args.project] if args.project else []
+    if args.fmt != "text":
+        argv.append(f"--{args.fmt}")
+    for flag, value in (("--limit", args.limit), ("--after", args.after), ("--since", args.since),
+                        ("--until", args.until), ("--copied-from", args.copied_from)):
+        if value is not None:
+            argv += [flag, str(value)]
+    if args.offset:
+        argv += ["--offset", str(args.offset)]
+    if args.ran is not None:
+        argv.append("--ran" if args.ran else "--never-run")
+    if args.committed is not None:
+        argv.append("--committed" if args.committed else "--uncommitted")
+    return argv
+
+def _run_list(args):
+    if args.all_workspaces:
+        from . import workspaces
+        return workspaces.list_all(args.jobs, _list_argv(args), args.fmt)
+    from . import core
+    return core.list_projects(args.project, fmt=args.fmt, limit=args.limit, offset=args.offset, after=args.after,
+                              since=args.since, until=args.until, copied_from=args.copied_from,
+                              ran=args.ran, committed=args.committed)
+
+
+def _args_save(p):
+    p.add_argument("project")
+    p.add_argument("version")
+    p.add_argument("-m", "--message", default="", help="Description/commit message")
+    p.add_argument("--from-version", default=None, help="Copy content from existing version")
+    p.add_argument("--content", default=None,
+                   help="Inline content (with --from-version: replaces the copied text, keeps the lineage)")
+    p.add_argument("--deps", nargs="*", default=None, metavar="SPEC",
+                   help="Requirement specs / workspace files this version needs (default: inherit from the copied version)")
+
+def _run_save(args):
+    from . import core
+    return core.add_version(args.project, args.version, args.message,
+                            from_version=args.from_version, inline_content=args.content, dependencies=args.deps)
+
+
+def _args_deps(p):
+    p.add_argument("project")
+    p.add_argument("version")
+    p.add_argument("add", nargs="*", metavar="SPEC", help="Requirement specs or workspace files to add")
+    p.add_argument("--clear", action="store_true", help="Drop the current dependencies first")
+
+def _run_deps(args):
+    from . import envs
+    return envs.set_dependencies(args.project, args.version, args.add, clear=args.clear)
+
+
+def _args_bulk(p):
+    p.add_argument("project")
+    p.add_argument("manifest", help="Path to a .jsonl/.csv manifest or a directory of .py files")
+    p.add_argument("-m", "--message", default="", help="Default description / commit message suffix")
+
+def _run_bulk(args):
+    from . import core
+    try:
+        entries = core.read_manifest(args.manifest)
+    except core.ManifestError as e:
+        print(f"❌ Manifest {args.manifest}: {e}")
+        return 1
+    return core.add_versions(args.project, entries, args.message)
+
+
+def _sandbox_args(p, timeout_default=None):
+    default = f"{timeout_default:g}" if timeout_default else "$BILLY_RUN_TIMEOUT, else none"
+    p.add_argument("--timeout", type=float, default=timeout_default,
+                   help=f"Wall-clock limit in seconds, 0 = none (default: {default})")
+    p.add_argument("--cpu", type=int, default=None, help="CPU seconds limit, 0 = none (default: $BILLY_RUN_CPU, else none)")
+    p.add_argument("--memory", type=int, default=None,
+                   help="Address-space limit in MiB, 0 = none (default: $BILLY_RUN_MEMORY_MB, else none)")
+    p.add_argument("--warm", action="store_true",
+                   help="Fork runs from a pre-started warm interpreter (pays off when the pool is reused: "
+                        "test-matrix, watch --run; a single run also pays for starting it)")
+    p.add_argument("--no-cache", action="store_true", help="Execute even if the run cache has a result")
+
+
+def _args_run(p):
+    p.add_argument("project")
+    p.add_argument("version")
+    _sandbox_args(p)
+
+def _run_run(args):
+    from . import core
+    return core.run_version(args.project, args.version, timeout=args.timeout, cpu_s=args.cpu,
+                            memory_mb=args.memory, warm=args.warm, no_cache=args.no_cache)
+
+
+def _args_watch(p):
+    p.add_argument("project")
+    p.add_argument("version", nargs="?", help="Version to follow (default: latest)")
+    p.add_argument("--run", action="store_true", help="Rerun the version after each settled change")
+    p.add_argument("--no-safepoint", dest="safepoint", action="store_false",
+                   help="Don't save each change as a safepoint (<project>_sp<N>.py)")
+    p.add_argument("--debounce", type=float, default=None,
+                   help="Quiet seconds that end a burst of edits (default: $BILLY_WATCH_DEBOUNCE or 0.5)")
+    p.add_argument("--poll", action="store_true", help="stat() polling instead of inotify")
+    p.add_argument("-m", "--message", default="", help="Safepoint description (default: Watch safepoint)")
+    _sandbox_args(p)
+
+def _run_watch(args):
+    from . import watch
+    run_kwargs = {"timeout": args.timeout, "cpu_s": args.cpu, "memory_mb": args.memory,
+                  "warm": args.warm, "no_cache": args.no_cache}
+    return watch.watch(args.project, args.version, safepoint=args.safepoint, run=args.run,
+                       debounce=args.debounce if args.debounce is not None else watch.DEBOUNCE_S,
+                       poll=args.poll, message=args.message, run_kwargs=run_kwargs)
+
+
+def _args_runcache(p):
+    p.add_argument("project", nargs="?", help="Project to configure/report (default: all)")
+    toggle = p.add_mutually_exclusive_group()
+    toggle.add_argument("--enable", action="store_const", const=True, dest="enable",
+                        help="Replay unchanged runs of this project from the cache")
+    toggle.add_argument("--disable", action="store_const", const=False, dest="enable")
+    p.add_argument("--clear", action="store_true", help="Drop every cached result")
+
+def _run_runcache(args):
+    from . import runcache
+    return runcache.manage(args.project, enable=args.enable, clear=args.clear)
+
+
+def _args_runs(p):
+    p.add_argument("project", nargs="?", help="Project name (optional)")
+    p.add_argument("--version", default=None, help="Only runs of this version")
+    p.add_argument("-n", "--limit", type=int, default=10, help="How many recent runs to consider")
+    p.add_argument("--tail", type=int, nargs="?", const=20, default=None,
+                   help="Print the last N lines of the most recent run log")
+    p.add_argument("--grep", default=None, help="Regex to search for in recent run logs")
+
+def _run_runs(args):
+    from . import runlog
+    return runlog.show_runs(args.project, args.version, args.limit, tail=args.tail, grep=args.grep)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Git passthrough & diff
+
+def _args_git(p):
+    p.add_argument("git_args", nargs=argparse.REMAINDER)
+
+def _run_git(args):
+    from . import git_ops
+    return git_ops.git_passthrough(args.git_args)
+
+
+def _diff_format_args(p):
+    fmt = p.add_mutually_exclusive_group()
+    fmt.add_argument("--side-by-side", action="store_const", dest="fmt", const="side",
+                     help="Two-column output")
+    fmt.add_argument("--stat", action="store_const", dest="fmt", const="stat",
+                     help="Only count added/removed lines")
+    p.set_defaults(fmt="unified")
+    p.add_argument("-U", "--context", type=int, default=3, help="Context lines around each change")
+    p.add_argument("--width", type=int, default=None, help="Side-by-side width (default: terminal width)")
+
+
+def _args_diff(p):
+    p.add_argument("project")
+    p.add_argument("version1")
+    p.add_argument("version2")
+    _diff_format_args(p)
+    p.add_argument("--git", action="store_true", help="Let git diff the two committed files instead")
+
+def _run_diff(args):
+    from . import core
+    return core.diff_versions(args.project, args.version1, args.version2, fmt=args.fmt,
+                              context=args.context, width=args.width, use_git=args.git)
+
+
+def _args_diff_chain(p):
+    p.add_argument("project")
+    p.add_argument("version", help="Walk copied_from back from this version")
+    _diff_format_args(p)
+
+def _run_diff_chain(args):
+    from . import diffing
+    return diffing.diff_chain(args.project, args.version, fmt=args.fmt,
+                              context=args.context, width=args.width)
+
+
+def _args_checkout(p):
+    p.add_argument("project")
+    p.add_argument("versions", nargs="+", metavar="version",
+                   help="Version, its <project>_<version> tag, or any git revision")
+    p.add_argument("--to", dest="dest", default=None,
+                   help="Export into DIR/<version>/ instead of restoring in place (several versions in parallel)")
+    p.add_argument("--all", dest="whole", action="store_true",
+                   help="All of the project's files as of that commit, not just the version's own file")
+    p.add_argument("--force", action="store_true", help="Overwrite modified files / non-empty export dirs")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Parallel exports (default: up to 8)")
+
+def _run_checkout(args):
+    from . import checkout
+    return checkout.checkout(args.project, args.versions, dest=args.dest, whole=args.whole,
+                             force=args.force, jobs=args.jobs)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Search
+
+def _args_search(p):
+    p.add_argument("query", help="Text to find (substring), or a symbol name with --defines")
+    p.add_argument("-p", "--project", default=None, help="Only this project")
+    p.add_argument("--defines", action="store_true",
+                   help="Versions defining a function/class/module-level name (bare or Class.method)")
+    p.add_argument("--first", action="store_true", help="Only the earliest matching version per project")
+    p.add_argument("-i", "--ignore-case", action="store_true")
+    p.add_argument("-n", "--limit", type=int, default=20, help="Rows to print")
+
+def _run_search(args):
+    from . import search
+    return search.search(args.query, args.project, defines=args.defines, first=args.first,
+                         ignore_case=args.ignore_case, limit=args.limit)
+
+
+def _args_reindex(p):
+    p.add_argument("project", nargs="?", help="Only this project (default: all)")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+
+def _run_reindex(args):
+    from . import search
+    return search.reindex(args.project, jobs=args.jobs)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Lineage
+
+def _args_tree(p):
+    p.add_argument("project")
+    p.add_argument("version", nargs="?", help="Only the subtree under this version")
+    p.add_argument("--max-depth", type=int, default=None, help="Collapse branches below this many levels")
+
+def _run_tree(args):
+    from . import lineage
+    return lineage.show_tree(args.project, args.version, max_depth=args.max_depth)
+
+
+def _args_lineage(p):
+    p.add_argument("project")
+    p.add_argument("version")
+    query = p.add_mutually_exclusive_group()
+    query.add_argument("--descendants", action="store_true", help="List descendants instead of ancestors")
+    query.add_argument("--lca", metavar="OTHER", default=None, help="Lowest common ancestor with OTHER")
+
+def _run_lineage(args):
+    from . import lineage
+    return lineage.show_lineage(args.project, args.version, descendants=args.descendants, lca_with=args.lca)
+
+
+def _args_merge(p):
+    p.add_argument("project")
+    p.add_argument("ours")
+    p.add_argument("theirs")
+    p.add_argument("--save", metavar="VERSION", default=None, help="Save the result as a new version")
+    p.add_argument("-m", "--message", default="", help="Description/commit message for --save")
+
+def _run_merge(args):
+    from . import lineage
+    return lineage.merge_versions(args.project, args.ours, args.theirs, save_as=args.save,
+                                  description=args.message)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Log, chat-log & test features
+
+def _args_log(p):
+    p.add_argument("project")
+    p.add_argument("message", nargs="?", help="Log message (wrap in quotes); omit to query the log")
+    p.add_argument("--commit", action="store_true",
+                   help="Also commit the log to Git (batched: every $BILLY_LOG_COMMIT_EVERY entries "
+                        "or $BILLY_LOG_COMMIT_SECONDS)")
+    p.add_argument("--flush", action="store_true", help="Commit pending batched log entries now")
+    p.add_argument("--since", default=None, help="Entries at/after this time (ISO date/time or 30m, 2h, 7d)")
+    p.add_argument("--until", default=None,
+                   help="Entries at/before this time (ISO prefix, e.g. 2025-06-01 = whole day)")
+    p.add_argument("--grep", default=None, help="Regex to match messages against")
+    p.add_argument("--markdown", action="store_true", help="Render the markdown log view")
+    p.add_argument("-o", "--output", default=None, help="Write the markdown view to this file")
+
+def _run_log(args):
+    from . import log
+    if args.message is not None:
+        code = log.append_log(args.project, args.message, args.commit)
+        return code or (log.flush_commits(args.project) if args.flush else 0)
+    if args.flush:
+        return log.flush_commits(args.project)
+    return log.query_log(args.project, since=args.since, until=args.until, grep=args.grep,
+                         markdown=args.markdown, output=args.output)
+
+
+def _args_chatlog(p):
+    p.add_argument("project")
+    p.add_argument("--include-code", action="store_true", help="Include all project version source code")
+    p.add_argument("--include-billy", action="store_true", help="Include Billy's own source code")
+    cycle = p.add_mutually_exclusive_group()
+    cycle.add_argument("--skip-test-cycle", action="store_const", dest="test_cycle", const="skip",
+                       help="Leave the test cycle out of the log")
+    cycle.add_argument("--reuse-test-cycle", action="store_const", dest="test_cycle", const="reuse",
+                       help="Reuse the cached test cycle if the latest version is unchanged")
+    p.set_defaults(test_cycle="run")
+
+def _run_chatlog(args):
+    from . import chatlog
+    return chatlog.generate_chat_log(args.project,
+                                     include_code=args.include_code,
+                                     include_billy=args.include_billy,
+                                     test_cycle=args.test_cycle)
+
+
+def _args_changelog(p):
+    p.add_argument("project")
+    p.add_argument("start", nargs="?", metavar="FROM",
+                   help="Version, <project>_<version> tag or git rev to start after (default: the beginning)")
+    p.add_argument("end", nargs="?", metavar="TO", help="Version, tag or git rev to end at (default: HEAD)")
+    p.add_argument("--json", action="store_true", help="Emit JSON instead of Markdown")
+    p.add_argument("-o", "--output", default=None, help="Write the changelog to this file")
+    p.add_argument("--no-cache", action="store_true", help="Re-read the whole range from git")
+
+def _run_changelog(args):
+    from . import changelog
+    return changelog.changelog(args.project, args.start, args.end, as_json=args.json, output=args.output,
+                               use_cache=not args.no_cache)
+
+
+def _args_test(p):
+    p.add_argument("project")
+
+def _run_test(args):
+    from . import chatlog
+    print("\n".join(chatlog.run_test_cycle(args.project)))
+    return 0
+
+
+def _args_matrix(p):
+    p.add_argument("projects", nargs="*", help="Projects to include (default: all)")
+    p.add_argument("--versions", default=None, help="Comma-separated versions to run (default: all)")
+    p.add_argument("--latest", action="store_true", help="Only run each project's latest version")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Concurrent runs (default: CPU count)")
+    _sandbox_args(p, timeout_default=60.0)
+    p.add_argument("--report", default=None, help="JSON report path (default: .billy/test_matrix.json)")
+
+def _run_matrix(args):
+    from . import matrix
+    return matrix.run_matrix(args.projects or None,
+                             versions=args.versions.split(",") if args.versions else None,
+                             latest_only=args.latest, jobs=args.jobs,
+                             timeout=args.timeout, report=args.report,
+                             cpu_s=args.cpu, memory_mb=args.memory, warm=args.warm,
+                             no_cache=args.no_cache)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Blob store
+
+def _args_blobs(p):
+    p.add_argument("project")
+
+def _run_blobs(args):
+    from . import blobstore
+    return blobstore.enable_blob_store(args.project)
+
+
+def _args_gc(p):
+    p.add_argument("project", nargs="?", help="Limit the report/pruning to one project")
+    p.add_argument("--prune-working", action="store_true",
+                   help="Remove working files that can be rematerialized from the blob store")
+    p.add_argument("--force", action="store_true",
+                   help="With --prune-working, also prune files that are not committed to git")
+    p.add_argument("--dry-run", action="store_true", help="Report only, change nothing")
+
+def _run_gc(args):
+    from . import blobstore
+    return blobstore.gc(args.project, prune_working=args.prune_working, dry_run=args.dry_run, force=args.force)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Dependency envs
+
+def _args_envs(p):
+    p.add_argument("action", nargs="?", default="list", choices=("list", "build", "gc"))
+    p.add_argument("project", nargs="?", help="build: the version's project")
+    p.add_argument("version", nargs="?", help="build: the version whose env to prepare")
+    p.add_argument("--keep", type=int, default=None, help="gc: envs to keep (default: $BILLY_ENV_MAX)")
+
+def _run_envs(args):
+    from . import envs
+    return envs.manage(args.action, args.project, args.version, keep=args.keep)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Health
+
+def _args_doctor(p):
+    p.add_argument("project", nargs="?", help="Only check this project")
+    p.add_argument("--fix", action="store_true",
+                   help="Repair what the metadata determines (files, tags, headers, git_commit, copied_from)")
+    p.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Checker threads")
+
+def _run_doctor(args):
+    from . import doctor
+    return doctor.doctor(args.project, fix=args.fix, as_json=args.json, jobs=args.jobs)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Metrics
+
+def _args_stats(p):
+    p.add_argument("command", nargs="?", help="Only this command")
+    p.add_argument("-n", "--last", type=int, default=500, help="How many recent invocations to include")
+    p.add_argument("--phases", action="store_true", help="Break each command down by phase")
+
+def _run_stats(args):
+    from . import metrics
+    return metrics.show_stats(args.command, last=args.last, phases=args.phases)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Git queue
+
+def _args_flush(p):
+    p.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for a running worker")
+
+def _run_flush(args):
+    from . import commitq
+    return commitq.flush(timeout=args.timeout)
+
+
+def _args_commitq(p):
+    pass
+
+def _run_commitq(args):
+    from . import commitq
+    return commitq.show_queue()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Metadata store
+
+def _args_migrate(p):
+    p.add_argument("--force", action="store_true", help="Rebuild memory.db even if it already exists")
+
+def _run_migrate(args):
+    from . import store
+    return store.migrate_store(force=args.force)
+
+
+def _args_export(p):
+    p.add_argument("-o", "--output", default=None, help="Output path (default: memory.json)")
+
+def _run_export(args):
+    from . import store
+    return store.export_store(args.output)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Workspaces
+
+def _args_workspace(p):
+    p.add_argument("action", nargs="?", default="list", choices=("list", "add", "remove", "use"),
+                   help="use NAME sets the default workspace (use - to reset)")
+    p.add_argument("name", nargs="?")
+    p.add_argument("path", nargs="?", help="Directory for `add` (created if missing; default: cwd)")
+
+def _run_workspace(args):
+    from . import workspaces
+    return workspaces.manage(args.action, args.name, args.path)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Daemon
+
+def _args_daemon(p):
+    p.add_argument("action", choices=("start", "stop", "status", "serve"),
+                   help="serve runs in the foreground; start detaches")
+
+def _run_daemon(args):
+    from . import daemon
+    return daemon.control(args.action)
+
+
+COMMANDS = {
+    "create": ("Create a new project", _args_create, _run_create),
+    "list": ("List projects or versions of a project", _args_list, _run_list),
+    "save-version": ("Save a new version", _args_save, _run_save),
+    "save-versions": ("Bulk-import versions from a manifest (JSONL/CSV) or a directory", _args_bulk, _run_bulk),
+    "deps": ("Show or set a version's dependencies (run uses a cached env built from them)", _args_deps, _run_deps),
+    "envs": ("List, prebuild or evict the cached dependency environments", _args_envs, _run_envs),
+    "run": ("Run a specific version", _args_run, _run_run),
+    "watch": ("Safepoint and/or rerun a version whenever its file is saved", _args_watch, _run_watch),
+    "run-cache": ("Enable/inspect the run result cache (hit rate, time saved)", _args_runcache, _run_runcache),
+    "runs": ("Show recent runs, tail or grep their captured output", _args_runs, _run_runs),
+    "git": ("Run raw git commands inside workspace", _args_git, _run_git),
+    "diff": ("Show diff between two versions", _args_diff, _run_diff),
+    "diff-chain": ("Stream diffs along a version's copied_from lineage", _args_diff_chain, _run_diff_chain),
+    "checkout": ("Restore a version's files in place, or export versions side by side", _args_checkout, _run_checkout),
+    "search": ("Find versions containing text or defining a symbol (indexed)", _args_search, _run_search),
+    "reindex": ("Rebuild the search index in parallel", _args_reindex, _run_reindex),
+    "tree": ("Render the copied_from lineage of a project as a tree", _args_tree, _run_tree),
+    "lineage": ("Ancestors, descendants or common ancestor of a version", _args_lineage, _run_lineage),
+    "merge": ("Three-way merge two versions using their common ancestor", _args_merge, _run_merge),
+    "log": ("Append to or query the project log (Recorder or Commit mode)", _args_log, _run_log),
+    "chat-log": ("Generate to_chat_log.md for sharing here", _args_chatlog, _run_chatlog),
+    "changelog": ("Release notes between two versions or tags, streamed from git history", _args_changelog,
+                  _run_changelog),
+    "test-cycle": ("Run automated sanity checks and log results", _args_test, _run_test),
+    "test-matrix": ("Run versions across projects in a parallel worker pool", _args_matrix, _run_matrix),
+    "blob-store": ("Enable the content-addressed blob store for a project", _args_blobs, _run_blobs),
+    "gc": ("Garbage-collect the blob store and report disk savings", _args_gc, _run_gc),
+    "doctor": ("Check metadata against files, tags and lineage in parallel (--fix repairs)", _args_doctor, _run_doctor),
+    "stats": ("Latency percentiles and phase breakdown per command (.billy/metrics.jsonl; .billy/metrics.prom for Prometheus)", _args_stats, _run_stats),
+    "flush": ("Land all queued git commits now (async mode, see --async-git)", _args_flush, _run_flush),
+    "commit-queue": ("Show pending and failed queued git commits", _args_commitq, _run_commitq),
+    "migrate-store": ("Migrate memory.json into the indexed SQLite store (memory.db)", _args_migrate, _run_migrate),
+    "export-store": ("Export the active metadata store back to memory.json", _args_export, _run_export),
+    "workspace": ("Register, list and select workspaces", _args_workspace, _run_workspace),
+    "daemon": ("Keep Billy warm and serve commands over a local Unix socket", _args_daemon, _run_daemon),
+}
+
+# Commands that need the caller's terminal (or manage the daemon itself)
+LOCAL_ONLY = {"git", "daemon", "watch"}
+
+
+# Global options that come before the subcommand, and whether each takes a value
+GLOBAL_OPTIONS = {"--workspace": True, "--git-backend": True, "--async-git": False}
+
+
+def _command_index(argv):
+    """Position of the subcommand in argv (skipping global options and their values), or None."""
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in ("-h", "--help"):
+            return None
+        name, has_value = arg.split("=", 1)[0], "=" in arg
+        matches = [o for o in GLOBAL_OPTIONS if o.startswith(name)] if name.startswith("--") else []
+        if len(matches) == 1:  # argparse also accepts unambiguous prefixes
+            i += 2 if GLOBAL_OPTIONS[matches[0]] and not has_value else 1
+            continue
+        return i if arg in COMMANDS else None
+    return None
+
+
+def _requested_command(argv):
+    """The subcommand named in argv, or None when top-level help is wanted."""
+    i = _command_index(argv)
+    return None if i is None else argv[i]
+
+
+def build_parser(only=None):
     parser = argparse.ArgumentParser(
         prog="Agent Billy",
         description="Local Python-based project/version manager with Git integration."
     )
+    parser.add_argument("--workspace", default=None,
+                        help="Workspace name (see `workspace`) or path (default: $BILLY_WORKSPACE or registry default)")
+    parser.add_argument("--git-backend", choices=GIT_BACKENDS, default=None,
+                        help="How versions are committed (default: $BILLY_GIT_BACKEND or subprocess)")
+    parser.add_argument("--async-git", action="store_true",
+                        help="Queue commits for a background worker instead of waiting on git ($BILLY_GIT_ASYNC=1)")
     sub = parser.add_subparsers(dest="cmd", required=True)
+    for name, (help_text, add_arguments, _) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text)
+        if only is None or name == only:
+            add_arguments(p)
+    return parser
 
-    # Project ops
-    p_create = sub.add_parser("create", help="Create a new project")
-    p_create.add_argument("project")
-    p_create.add_argument("-d", "--description", default="", help="Project description")
-    p_create.add_argument("--git", action="store_true", help="Enable Git commits for this project")
-
-    p_list = sub.add_parser("list", help="List projects or versions of a project")
-    p_list.add_argument("project", nargs="?", help="Project name (optional)")
-
-    p_save = sub.add_parser("save-version", help="Save a new version")
-    p_save.add_argument("project")
-    p_save.add_argument("version")
-    p_save.add_argument("-m", "--message", default="", help="Description/commit message")
-    p_save.add_argument("--from-version", default=None, help="Copy content from existing version")
-    p_save.add_argument("--content", default=None, help="Inline content")
-
-    p_run = sub.add_parser("run", help="Run a specific version")
-    p_run.add_argument("project")
-    p_run.add_argument("version")
-
-    # Git passthrough
-    p_git = sub.add_parser("git", help="Run raw git commands inside workspace")
-    p_git.add_argument("git_args", nargs=argparse.REMAINDER)
-
-    # Diff
-    p_diff = sub.add_parser("diff", help="Show diff between two versions")
-    p_diff.add_argument("project")
-    p_diff.add_argument("version1")
-    p_diff.add_argument("version2")
-
-    # Log feature
-    p_log = sub.add_parser("log", help="Append to project log (Recorder or Commit mode)")
-    p_log.add_argument("project")
-    p_log.add_argument("message", help="Log message (wrap in quotes)")
-    p_log.add_argument("--commit", action="store_true", help="Also commit the log to Git")
-
-    # Chat-log feature
-    p_chatlog = sub.add_parser("chat-log", help="Generate to_chat_log.md for sharing here")
-    p_chatlog.add_argument("project")
-    p_chatlog.add_argument("--include-code", action="store_true", help="Include all project version source code")
-    p_chatlog.add_argument("--include-billy", action="store_true", help="Include Billy's own source code")
-
-    # Test-cycle feature
-    p_test = sub.add_parser("test-cycle", help="Run automated sanity checks and log results")
-    p_test.add_argument("project")
-
-    args = parser.parse_args()
-
-    # Dispatch
-    if args.cmd == "create":
-        return core.create_project(args.project, args.description, args.git)
-    if args.cmd == "list":
-        return core.list_projects(args.project)
-    if args.cmd == "save-version":
-        return core.add_version(args.project, args.version, args.message,
-                                from_version=args.from_version, inline_content=args.content)
-    if args.cmd == "run":
-        return core.run_version(args.project, args.version)
-    if args.cmd == "git":
-        return git_ops.git_passthrough(args.git_args)
-    if args.cmd == "diff":
-        return core.diff_versions(args.project, args.version1, args.version2)
-    if args.cmd == "log":
-        return log.append_log(args.project, args.message, args.commit)
-    if args.cmd == "chat-log":
-        return chatlog.generate_chat_log(args.project,
-                                         include_code=args.include_code,
-                                         include_billy=args.include_billy)
-    if args.cmd == "test-cycle":
-        return chatlog.run_test_cycle(args.project)
 
-    return 0
+def _select_workspace(argv):
+    """Apply a global --workspace before any module resolves WORKSPACE."""
+    i = _command_index(argv)
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--workspace", default=None)
+    spec = pre.parse_known_args(argv[:i] if i is not None else argv)[0].workspace
+    if spec:
+        from .workspaces import resolve
+        os.environ["BILLY_WORKSPACE"] = str(resolve(spec))
+
+
+def dispatch(argv):
+    """Parse argv and run the command in this process; returns its exit code."""
+    _select_workspace(argv)
+    if "agent_billy.utils" in sys.modules and os.environ.get("BILLY_WORKSPACE"):
+        from .utils import WORKSPACE
+        from .workspaces import resolve
+        if resolve(os.environ["BILLY_WORKSPACE"]) != WORKSPACE:  # already bound to another workspace
+            print(f"❌ This process serves {WORKSPACE}; run the command without the daemon.")
+            return 1
+    args = build_parser(_requested_command(argv)).parse_args(argv)
+    if args.git_backend:
+        os.environ["BILLY_GIT_BACKEND"] = args.git_backend
+    if args.async_git:
+        os.environ["BILLY_GIT_ASYNC"] = "1"
+    handler = COMMANDS[args.cmd][2]
+    if args.cmd == "daemon":  # `serve` dispatches (and times) every request itself
+        return handler(args)
+    from . import metrics
+    metrics.begin()
+    code = 1
+    try:
+        if metrics.profile_wanted(args.cmd):
+            code = metrics.run_profiled(args.cmd, handler, args)
+        else:
+            code = handler(args)
+    finally:
+        metrics.finish(args.cmd, code if isinstance(code, int) else 0)
+    return code
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    _select_workspace(argv)
+    if os.environ.get("BILLY_DAEMON") and _requested_command(argv) not in LOCAL_ONLY | {None}:
+        from .daemon import request
+        code = request(argv)
+        if code is not None:
+            return code
+    return dispatch(argv)
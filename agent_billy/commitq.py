@@ -0,0 +1,266 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+
+from .utils import WORKSPACE, STATE_DIR
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: async mode degrades to synchronous commits
+    fcntl = None
+
+QUEUE_DIR = STATE_DIR / "commitq"
+COALESCE_S = float(os.environ.get("BILLY_GIT_QUEUE_DELAY", 0.5))  # wait for more intents before committing
+IDLE_S = float(os.environ.get("BILLY_GIT_QUEUE_IDLE", 10))        # worker exits after this long without work
+
+# Asynchronous commits (BILLY_GIT_ASYNC=1 or the global --async-git flag).
+#
+# Instead of running git, a save writes a commit *intent* to
+#   .billy/commitq/<ns>-<pid>.json   {root, paths, message, tags, fill}
+# (atomically, so a crash never loses or half-writes one) and returns. A
+# detached worker, started on demand and holding commitq/worker.lock,
+# waits COALESCE_S for more intents, then lands everything queued for the
+# same repo as ONE commit carrying all the tags, and writes the sha back
+# into each intent's `fill` targets (version git_commit, safepoints).
+# Intents whose commit fails are kept as *.failed; `flush` retries them.
+
+
+def async_enabled() -> bool:
+    return os.environ.get("BILLY_GIT_ASYNC", "") not in ("", "0") and fcntl is not None
+
+
+def _root_key(root: Optional[Path]) -> str:
+    return "" if root is None or root == WORKSPACE else root.relative_to(WORKSPACE).as_posix()
+
+
+def submit(root: Optional[Path], paths: List[str], message: str, tags: Iterable[str] = (),
+           fill: Optional[List[Dict[str, str]]] = None) -> Tuple[Optional[str], bool]:
+    """
+    Commit `paths` to the repo at `root` now, or queue the commit in async mode.
+    Returns (sha, queued); the caller records the sha itself when not queued.
+    """
+    if not async_enabled():
+        from .git_ops import get_backend
+        return get_backend(root).commit(paths, message, tags=list(tags)), False
+    QUEUE_DIR.mkdir(parents=True, exist_ok=True)
+    intent = {"root": _root_key(root), "paths": paths, "message": message, "tags": list(tags),
+              "fill": fill or [], "queued_at": time.time()}
+    name = f"{time.time_ns()}-{os.getpid()}"
+    tmp = QUEUE_DIR / f".{name}.tmp"
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(intent, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, QUEUE_DIR / f"{name}.json")
+    ensure_worker()
+    return None, True
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Worker
+
+def _try_lock():
+    """The worker lock if nobody holds it (caller keeps the file open), else None."""
+    QUEUE_DIR.mkdir(parents=True, exist_ok=True)
+    f = (QUEUE_DIR / "worker.lock").open("a+")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def worker_pid() -> Optional[int]:
+    """
+    Pid of the running worker, None if nobody holds the queue lock, or -1 if
+    the holder has no pid file (a worker just starting, or a `flush`).
+    """
+    lock = _try_lock()
+    if lock is not None:
+        lock.close()
+        return None
+    try:
+        return int((QUEUE_DIR / "worker.pid").read_text())
+    except (FileNotFoundError, ValueError):
+        return -1
+
+
+def ensure_worker() -> None:
+    if worker_pid() is not None:
+        return
+    env = {**os.environ, "BILLY_WORKSPACE": str(WORKSPACE)}
+    env.pop("BILLY_DAEMON", None)
+    with (QUEUE_DIR / "worker.log").open("a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "agent_billy.commitq"],
+            cwd=str(Path(__file__).resolve().parent.parent), env=env,
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True,
+        )
+
+
+def _pending() -> List[Path]:
+    return sorted(QUEUE_DIR.glob("*.json"))
+
+
+def _fill(sha: str, targets: List[Dict[str, str]]) -> None:
+    from .store import get_store
+
+    store = get_store()
+    versions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for t in targets:
+        if t.get("version"):
+            versions.setdefault(t["project"], {})[t["version"]] = {"git_commit": sha}
+        elif t.get("safepoint") and store.get_project(t["project"]) is not None:
+            def mutate(proj, name=t["safepoint"]):
+                entry = (proj.get("safepoints") or {}).get(name)
+                if entry is not None:
+                    entry["git_commit"] = sha
+            store.modify_project(t["project"], mutate)
+    for project, updates in versions.items():
+        store.update_versions(project, updates)
+
+
+def process(files: Optional[List[Path]] = None) -> Tuple[int, int]:
+    """Land queued intents, one commit per repo. Caller holds the worker lock. Returns (commits, failed)."""
+    from .git_ops import get_backend
+    from .store import get_store
+
+    get_store().commit_paths()  # checkpoints memory.db's WAL so the committed file is current
+    groups: Dict[str, List[Tuple[Path, Dict[str, Any]]]] = {}
+    for f in files if files is not None else _pending():
+        try:
+            intent = json.loads(f.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            continue
+        groups.setdefault(intent["root"], []).append((f, intent))
+
+    commits = failed = 0
+    for root_key, batch in groups.items():
+        root = WORKSPACE / root_key if root_key else None
+        paths = list(dict.fromkeys(p for _, i in batch for p in i["paths"]))
+        tags = list(dict.fromkeys(t for _, i in batch for t in i["tags"]))
+        if len(batch) == 1:
+            message = batch[0][1]["message"]
+        else:
+            message = f"{len(batch)} queued changes\n\n" + "\n".join(f"- {i['message']}" for _, i in batch)
+        sha = get_backend(root).commit(paths, message, tags=tags)
+        if sha is None:
+            failed += len(batch)
+            for f, _ in batch:
+                f.rename(f.with_suffix(".failed"))
+            continue
+        _fill(sha, [t for _, i in batch for t in i["fill"]])
+        for f, _ in batch:
+            f.unlink(missing_ok=True)
+        commits += 1
+        print(f"{time.strftime('%H:%M:%S')} {sha[:8]} ← {len(batch)} intent(s){f' in {root_key}' if root_key else ''}",
+              flush=True)
+    return commits, failed
+
+
+def _drain() -> None:
+    """Commit intents as they arrive until the queue has been empty for IDLE_S. Caller holds the lock."""
+    idle_since = time.monotonic()
+    while True:
+        pending = _pending()
+        if not pending:
+            if time.monotonic() - idle_since > IDLE_S:
+                return
+            time.sleep(0.1)
+            continue
+        # coalesce: let a burst of saves finish queueing before committing
+        oldest = pending[0].stat().st_mtime
+        if time.time() - oldest < COALESCE_S:
+            time.sleep(COALESCE_S - (time.time() - oldest))
+            continue
+        process()
+        idle_since = time.monotonic()
+
+
+def worker() -> int:
+    while True:
+        lock = _try_lock()
+        if lock is None:
+            return 0  # another worker (or a flush) holds the queue and will see what is pending
+        (QUEUE_DIR / "worker.pid").write_text(str(os.getpid()))
+        try:
+            _drain()
+        finally:
+            (QUEUE_DIR / "worker.pid").unlink(missing_ok=True)
+            lock.close()
+        # A submit that landed while we were giving up found the lock still held
+        # and started no worker; its intent is already on disk, so look once more
+        # now that the lock is free (later submits will start a worker themselves).
+        if not _pending():
+            return 0
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `flush` and `commit-queue`
+
+def flush(timeout: float = 120.0) -> int:
+    """Commit everything queued now (retrying failed intents) and wait for it to land."""
+    if fcntl is None or not QUEUE_DIR.exists():
+        print("ℹ️ Commit queue is empty.")
+        return 0
+    for f in QUEUE_DIR.glob("*.failed"):
+        f.rename(f.with_suffix(".json"))
+    start = time.monotonic()
+    lock = _try_lock()
+    if lock is None:  # a worker is running: let it drain the queue
+        if not _pending():
+            print("ℹ️ Commit queue is empty.")
+            return 0
+        while _pending() and time.monotonic() - start < timeout:
+            time.sleep(0.05)
+        if _pending():
+            print(f"⚠️ Worker still busy after {timeout:g}s ({len(_pending())} intents pending).")
+            return 1
+        failed = list(QUEUE_DIR.glob("*.failed"))
+        if failed:
+            print(f"⚠️ {len(failed)} intent(s) failed to commit and were kept (see `commit-queue`).")
+            return 1
+        print("✅ Commit queue drained by the worker.")
+        return 0
+    try:
+        pending = _pending()
+        if not pending:
+            print("ℹ️ Commit queue is empty.")
+            return 0
+        commits, failed = process(pending)
+    finally:
+        lock.close()
+    if failed:
+        print(f"⚠️ {failed} intent(s) failed to commit and were kept (see `commit-queue`).")
+        return 1
+    print(f"✅ Flushed {len(pending)} intent(s) in {commits} commit(s) ({time.monotonic() - start:.2f}s).")
+    return 0
+
+
+def show_queue() -> int:
+    files = _pending() if QUEUE_DIR.exists() else []
+    failed = sorted(QUEUE_DIR.glob("*.failed")) if QUEUE_DIR.exists() else []
+    pid = worker_pid() if fcntl is not None else None
+    mode = "async" if async_enabled() else "sync (set BILLY_GIT_ASYNC=1 or --async-git)"
+    worker_state = "idle" if pid is None else (f"running (pid {pid})" if pid > 0 else "busy (starting up or flushing)")
+    print(f"📮 Commit queue: {len(files)} pending, {len(failed)} failed; mode {mode}; worker {worker_state}")
+    now = time.time()
+    for f, state in [(f, "pending") for f in files] + [(f, "failed") for f in failed]:
+        try:
+            intent = json.loads(f.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            continue
+        where = f" [{intent['root']}]" if intent["root"] else ""
+        tags = f" tags: {', '.join(intent['tags'])}" if intent["tags"] else ""
+        print(f" - {state} {now - intent['queued_at']:6.1f}s ago{where}: {intent['message']}{tags}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(worker())
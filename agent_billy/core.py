@@ -1,16 +1,22 @@
 from __future__ import annotations
+import csv
+import itertools
+import json
 import os
 import shutil
-import subprocess
 import sys
+import time
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Iterable
 
-from .utils import (
-    WORKSPACE, PROJECTS_DIR, MEMORY_FILE,
-    now_iso, load_memory, save_memory
-)
-from .git_ops import run_git, ensure_workspace_git
+from .utils import WORKSPACE, PROJECTS_DIR, now_iso, latest_version
+from .git_ops import run_git, ensure_workspace_git, repo_path
+from .store import get_store
+from . import metrics
+
+# The run, blob, lineage, search, env and commit-queue modules are imported
+# by the functions that need them, so read-only commands such as `list`
+# only load the store.
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -60,155 +66,372 @@ def _rewrite_header_for_copy(text: str, project: str, version: str) -> str:
     return "\n".join(lines)
 
 
-def _seed_from_previous(project_meta: Dict[str, Any], project: str, from_version: str, dest: Path) -> str:
+def _write_inline(project: str, version: str, file_path: Path, content: str) -> str:
+    """Write inline content, rewriting its Billy header if it has one instead of stacking a second."""
+    if not any(line.startswith("# Version:") for line in content.splitlines()[:6]):
+        return _write_new_file(project, version, file_path, content)
+    file_path.write_text(_rewrite_header_for_copy(content, project, version) + "\n", encoding="utf-8")
+    os.chmod(file_path, 0o755)
+    return "inline content"
+
+
+def _seed_from_previous(prev_meta: Dict[str, Any], project: str, from_version: str, dest: Path) -> str:
     """Copy content from an existing version in the same project and refresh the header."""
-    prev_meta = project_meta["versions"][from_version]
-    prev_file = WORKSPACE / prev_meta["filename"]
+    from . import blobstore
+
+    prev_file = blobstore.materialize(prev_meta)
     if not prev_file.exists():
         raise FileNotFoundError(f"Previous version file missing: {prev_file}")
 
-    text = prev_file.read_text(encoding="utf-8")
-    text = _rewrite_header_for_copy(text, project, dest.stem.split("_")[-1])  # update Version/Created
-    dest.write_text(text, encoding="utf-8")
+    with metrics.span("copy"):
+        text = prev_file.read_text(encoding="utf-8")
+        text = _rewrite_header_for_copy(text, project, dest.stem.split("_")[-1])  # update Version/Created
+        dest.write_text(text, encoding="utf-8")
+    metrics.add("bytes_read", len(text))
+    metrics.add("bytes_written", len(text))
     # preserve executable bit if present on source
     src_mode = prev_file.stat().st_mode
     os.chmod(dest, src_mode)
     return f"auto-copied from {from_version}"
 
 
+def _seed_version(
+    project: str,
+    version: str,
+    file_path: Path,
+    versions: Dict[str, Dict[str, Any]],
+    from_version: Optional[str],
+    inline_content: Optional[str],
+) -> Tuple[str, Optional[str]]:
+    """
+    Write a version file: copied from `from_version`, from inline content, or
+    (by default) from the latest existing version. Returns (seed_info, copied_from).
+    Inline content together with `from_version` replaces the copied text but
+    still records the lineage (used for merges and edited copies).
+    """
+    if from_version and inline_content is not None:
+        _write_inline(project, version, file_path, inline_content)
+        return f"inline content based on {from_version}", from_version
+    if from_version:
+        return _seed_from_previous(versions[from_version], project, from_version, file_path), from_version
+    if inline_content is not None:
+        return _write_inline(project, version, file_path, inline_content), None
+    if versions:
+        last_v = latest_version(versions)
+        return _seed_from_previous(versions[last_v], project, last_v, file_path), last_v
+    return _write_new_file(project, version, file_path, None), None
+
+
+def _version_record(project: str, filename: str, description: str, copied_from: Optional[str]) -> Dict[str, Any]:
+    return {
+        "filename": f"projects/{project}/{filename}",
+        "created_at": now_iso(),
+        "description": description,
+        "copied_from": copied_from,
+        "dependencies": [],
+        "last_run": None,
+        "notes": "",
+        "git_commit": None,
+    }
+
+
+class ManifestError(Exception):
+    pass
+
+
+def read_manifest(source: str) -> List[Dict[str, Any]]:
+    """
+    Parse a bulk-import manifest into entries of
+    {version, description, from_version, content}.
+
+    - *.jsonl: one object per line with `version` and optionally `file`,
+      `content`, `from_version`, `description`
+    - *.csv:   header row with the same column names
+    - directory: every *.py file; the version is the stem (minus a
+      `<project>_` prefix, handled by the caller)
+    Relative `file` paths resolve against the manifest's directory.
+    Raises ManifestError for an unreadable or malformed manifest.
+    """
+    src = Path(source)
+    if src.is_dir():
+        return [
+            {"version": f.stem, "content": f.read_text(encoding="utf-8"), "from_version": None, "description": ""}
+            for f in sorted(src.glob("*.py"))
+        ]
+
+    try:
+        with src.open("r", encoding="utf-8", newline="") as f:
+            if src.suffix.lower() == ".csv":
+                rows = list(csv.DictReader(f))
+            else:
+                rows = []
+                for n, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        raise ManifestError(f"line {n}: invalid JSON ({e.msg})") from None
+    except OSError as e:
+        raise ManifestError(f"cannot read {src}: {e.strerror or e}") from None
+
+    entries = []
+    for n, row in enumerate(rows, 1):
+        if not isinstance(row, dict) or not row.get("version"):
+            raise ManifestError(f"entry {n} has no 'version'")
+        content = row.get("content") or None
+        if row.get("file"):
+            try:
+                content = (src.parent / row["file"]).read_text(encoding="utf-8")
+            except OSError as e:
+                raise ManifestError(f"entry {n} ({row['version']}): cannot read file "
+                                    f"'{row['file']}': {e.strerror or e}") from None
+        entries.append({
+            "version": str(row["version"]),
+            "content": content,
+            "from_version": row.get("from_version") or None,
+            "description": row.get("description") or "",
+        })
+    return entries
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Public API called from CLI
 
-def create_project(name: str, description: str = "", git_enabled: bool = False) -> int:
-    memory = load_memory()
-    if name in memory["projects"]:
+def create_project(name: str, description: str = "", git_enabled: bool = False, blob_store: bool = False,
+                   shard: bool = False) -> int:
+    """
+    Register a new project. With `shard`, the project gets its own metadata
+    file and git repo under projects/<name>/ instead of sharing the workspace's.
+    """
+    store = get_store()
+    if store.get_project(name) is not None:
         print(f"❌ Project '{name}' already exists.")
         return 1
 
     PROJECTS_DIR.mkdir(exist_ok=True)
     project_path = PROJECTS_DIR / name
     project_path.mkdir(parents=True, exist_ok=True)
+    if shard:  # the shard's own repo ignores what the workspace .gitignore would
+        (project_path / ".gitignore").write_text("memory.json.lock\n.memory.json.*.tmp\n", encoding="utf-8")
 
-    memory["projects"][name] = {
+    store.put_project(name, {
         "created_at": now_iso(),
         "description": description,
-        "versions": {},
         "tags": [],
         "git_enabled": bool(git_enabled),
-    }
-    save_memory(memory)
+        **({"blob_store": True} if blob_store else {}),
+        **({"shard": f"projects/{name}"} if shard else {}),
+    })
 
-    print(f"✅ Project '{name}' created at {project_path} (git_enabled={git_enabled}).")
+    print(f"✅ Project '{name}' created at {project_path} (git_enabled={git_enabled}"
+          f"{', sharded' if shard else ''}).")
 
     if git_enabled:
-        if ensure_workspace_git():
-            run_git(["add", "memory.json", f"projects/{name}/"])
-            run_git(["commit", "-m", f"Create project {name}"])
+        from . import commitq
+
+        root = store.git_root(name)
+        if ensure_workspace_git(root=root):
+            commitq.submit(root, [*store.commit_paths(name), f"projects/{name}/"], f"Create project {name}")
         else:
             print("⚠️ Git not initialized at workspace root; run `git init` then commit.")
     return 0
 
 
-def list_projects(target: Optional[str] = None) -> int:
-    memory = load_memory()
-    projects = memory.get("projects", {})
-    if not projects:
-        print("ℹ️ No projects yet.")
+def _version_rows(store, projects: List[str], after: Optional[str], page: Optional[int],
+                  filters: Dict[str, Any]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """(project, version, meta) across `projects` in order, resuming after a "project/version" cursor."""
+    if after and len(projects) > 1 and "/" in after:
+        start_p, start_v = after.rsplit("/", 1)
+    else:
+        start_p, start_v = (projects[0] if projects else None), after
+    skipping = start_p in projects
+    for name in projects:
+        if skipping and name != start_p:
+            continue
+        resume, skipping = (start_v if skipping else None), False
+        for v, meta in store.iter_versions(name, after=resume, limit=page, **filters):
+            yield name, v, meta
+
+
+def _project_summary(store, name: str) -> Dict[str, Any]:
+    p = store.get_project(name) or {}
+    return {"project": name, "versions": store.version_count(name), "created_at": p.get("created_at"),
+            "description": p.get("description", ""), "git_enabled": p.get("git_enabled", False),
+            **({"shard": p["shard"]} if p.get("shard") else {})}
+
+
+def list_projects(target: Optional[str] = None, fmt: str = "text", limit: Optional[int] = None,
+                  offset: int = 0, after: Optional[str] = None, **filters: Any) -> int:
+    """
+    List projects, or the versions of `target` in natural order. Rows are
+    streamed from the store's (project, natural order) index, so the first
+    line appears without loading the whole project; --limit/--offset or the
+    --after cursor page through, filters narrow versions (see store.VERSION_FILTERS).
+    fmt is text, json or jsonl. Filters without a project list matching
+    versions of every project (cursor: "project/version").
+    """
+    store = get_store()
+    names = store.project_names()
+    filters = {k: v for k, v in filters.items() if v is not None}
+
+    if target is None and not filters:
+        if after in names:
+            names = names[names.index(after) + 1:]
+        page = names[offset:offset + limit + 1] if limit is not None else names[offset:]
+        more = limit is not None and len(page) > limit
+        page = page[:limit] if more else page
+        if fmt == "text":
+            if not page:
+                print("ℹ️ No projects yet." if not names else "ℹ️ No more projects.")
+                return 0
+            print("📚 Projects:")
+            for name in page:
+                p = store.get_project(name)
+                shard = ", sharded" if p.get("shard") else ""
+                print(f" - {name} (versions: {store.version_count(name)}{shard}, created {p['created_at']})")
+            if more:
+                print(f"   … more: --after {page[-1]}")
+        else:
+            _stream_json((_project_summary(store, n) for n in page), fmt, "projects", page[-1] if more else None)
         return 0
 
-    if target:
-        if target not in projects:
+    if target is not None:
+        p = store.get_project(target)
+        if p is None:
             print(f"❌ Project '{target}' not found.")
             return 1
-        p = projects[target]
-        print(f"📦 {target} — created {p['created_at']}")
-        print(f"   description: {p.get('description','')}")
-        print(f"   git_enabled: {p.get('git_enabled', False)}")
-        vers = p.get("versions", {})
-        if not vers:
-            print("   versions: (none)")
-        else:
-            print("   versions:")
-            for v, meta in sorted(vers.items()):
-                print(f"    - {v} → {meta['filename']} (created {meta['created_at']})")
+        projects = [target]
+        if fmt == "text":
+            print(f"📦 {target} — created {p['created_at']}")
+            print(f"   description: {p.get('description','')}")
+            print(f"   git_enabled: {p.get('git_enabled', False)}")
+            if p.get("shard"):
+                print(f"   shard: {p['shard']}/ (own memory.json and git repo)")
+            if p.get("run_cache"):
+                print("   run_cache: True")
     else:
-        print("📚 Projects:")
-        for name, p in projects.items():
-            n_versions = len(p.get("versions", {}))
-            print(f" - {name} (versions: {n_versions}, created {p['created_at']})")
+        projects = names
+
+    # one row past the page tells whether there is more
+    page = None if limit is None else offset + limit + 1
+    rows = itertools.islice(_version_rows(store, projects, after, page, filters), offset,
+                            None if page is None else page)
+    last, shown, more = None, 0, False
+    if fmt == "text":
+        for name, v, meta in rows:
+            if limit is not None and shown == limit:
+                more = True
+                break
+            if shown == 0:
+                print("   versions:" if target else "🔖 Versions:")
+            cache = ""
+            if meta.get("run_cache"):
+                from .runcache import hit_rate
+                cache = f", {hit_rate(meta['run_cache'])}"
+            label = f"    - {v}" if target else f" - {name}/{v}"
+            print(f"{label} → {meta['filename']} (created {meta['created_at']}{cache})")
+            last, shown = (v if target else f"{name}/{v}"), shown + 1
+        if shown == 0:
+            print("   versions: (none)" if target and not (filters or offset or after) else "ℹ️ No matching versions.")
+        elif more:
+            print(f"   … more: --after {last}")
+        return 0
+
+    def records():
+        nonlocal last, more
+        for n, (name, v, meta) in enumerate(rows):
+            if limit is not None and n == limit:
+                more = True
+                return
+            last = v if target else f"{name}/{v}"
+            yield {"project": name, "version": v, **meta}
+
+    _stream_json(records(), fmt, "versions", lambda: last if more else None)
     return 0
 
 
+def _stream_json(items: Iterable[Dict[str, Any]], fmt: str, key: str, next_cursor) -> None:
+    """Write items as JSON Lines, or as {key: [...], "next": cursor} without building the list first."""
+    write = sys.stdout.write
+    if fmt == "jsonl":
+        for item in items:
+            write(json.dumps(item, ensure_ascii=False) + "\n")
+        return
+    write(f'{{"{key}": [')
+    for n, item in enumerate(items):
+        write((",\n  " if n else "\n  ") + json.dumps(item, ensure_ascii=False))
+    cursor = next_cursor() if callable(next_cursor) else next_cursor
+    write(f'\n], "next": {json.dumps(cursor)}}}\n')
+
+
 def add_version(
     project: str,
     version: str,
     description: str = "",
     from_version: Optional[str] = None,
     inline_content: Optional[str] = None,
+    merged_from: Optional[str] = None,
+    dependencies: Optional[List[str]] = None,
 ) -> int:
     """
     Creates a file named <project>_<version>.py inside projects/<project>/,
-    records it in memory.json, and if git is enabled commits + tags the change.
+    records it in the metadata store, and if git is enabled commits + tags the change.
+    Dependencies are inherited from the version it was copied from unless given.
     """
-    memory = load_memory()
-    if project not in memory["projects"]:
+    from . import blobstore, lineage, search, commitq
+
+    store = get_store()
+    proj_meta = store.get_project(project)
+    if proj_meta is None:
         print(f"❌ Project '{project}' not found.")
         return 1
 
-    proj_meta = memory["projects"][project]
+    versions = store.versions(project)
     project_path = PROJECTS_DIR / project
     project_path.mkdir(parents=True, exist_ok=True)
 
     filename = f"{project}_{version}.py"
     file_path = project_path / filename
 
-    # Decide how to seed the file
-    if from_version:
-        if from_version not in proj_meta.get("versions", {}):
-            print(f"❌ Version '{from_version}' not found in project '{project}'.")
-            return 1
-        seed_info = _seed_from_previous(proj_meta, project, from_version, file_path)
-        copied_from = from_version
-    elif inline_content is not None:
-        seed_info = _write_new_file(project, version, file_path, inline_content)
-        copied_from = None
-    else:
-        versions = proj_meta.get("versions", {})
-        if versions:
-            last_v = sorted(versions.keys())[-1]
-            seed_info = _seed_from_previous(proj_meta, project, last_v, file_path)
-            copied_from = last_v
-        else:
-            seed_info = _write_new_file(project, version, file_path, None)
-            copied_from = None
-
-    # Update memory.json
-    proj_meta["versions"][version] = {
-        "filename": f"projects/{project}/{filename}",
-        "created_at": now_iso(),
-        "description": description,
-        "copied_from": copied_from,
-        "dependencies": [],
-        "last_run": None,
-        "notes": "",
-        "git_commit": None,
-    }
-    save_memory(memory)
+    if from_version and from_version not in versions:
+        print(f"❌ Version '{from_version}' not found in project '{project}'.")
+        return 1
+    seed_info, copied_from = _seed_version(project, version, file_path, versions, from_version, inline_content)
+
+    # Record the version
+    record = _version_record(project, filename, description, copied_from)
+    if merged_from:
+        record["merged_from"] = merged_from
+    if dependencies is not None:
+        record["dependencies"] = list(dependencies)
+    elif copied_from:
+        record["dependencies"] = list(versions[copied_from].get("dependencies") or [])
+    if proj_meta.get("blob_store"):
+        record["blob"] = blobstore.ingest(file_path, base=versions.get(copied_from, {}).get("blob"))
+    store.put_version(project, version, record)
+    lineage.record(project, {version: copied_from})
+    search.record(project, {version: (record["created_at"], file_path.read_bytes())})
 
     # Git commit & tag
     if proj_meta.get("git_enabled"):
-        if ensure_workspace_git(verbose=False):
-            run_git(["add", f"projects/{project}/{filename}", "memory.json"])
+        root = store.git_root(project)
+        if ensure_workspace_git(verbose=False, root=root):
             msg = f"{project} {version}: {description or 'New version'} ({seed_info})"
-            run_git(["commit", "-m", msg])
-            commit = run_git(["rev-parse", "HEAD"])
-            # Tag with project_version
-            run_git(["tag", f"{project}_{version}", commit])
+            # Commit + tag with project_version in one backend call (or queue it, see commitq.py)
+            commit, queued = commitq.submit(
+                root, [f"projects/{project}/{filename}", *store.commit_paths(project)], msg,
+                tags=[f"{project}_{version}"], fill=[{"project": project, "version": version}],
+            )
+            if queued:
+                print(f"✅ Version '{version}' added ({seed_info}); commit + tag {project}_{version} queued.")
+                return 0
+            if not commit:
+                print(f"⚠️ Version '{version}' added ({seed_info}) but the git commit failed.")
+                return 1
 
             # persist commit hash
-            memory = load_memory()
-            memory["projects"][project]["versions"][version]["git_commit"] = commit
-            save_memory(memory)
+            store.update_version(project, version, git_commit=commit)
             print(
                 f"✅ Version '{version}' added, committed, and tagged as {project}_{version}. "
                 f"{seed_info}, commit={commit[:8]}"
@@ -221,43 +444,209 @@ def add_version(
     return 0
 
 
-def run_version(project: str, version: str) -> int:
-    memory = load_memory()
-    try:
-        meta = memory["projects"][project]["versions"][version]
-    except KeyError:
+def add_versions(project: str, entries: List[Dict[str, Any]], description: str = "") -> int:
+    """
+    Bulk counterpart of add_version: write every version file, record all of
+    them in one metadata write, and (if git is enabled) land them in a single
+    commit carrying one tag per version.
+    """
+    from . import blobstore, lineage, search, commitq
+
+    start = time.perf_counter()
+    store = get_store()
+    proj_meta = store.get_project(project)
+    if proj_meta is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    if not entries:
+        print("ℹ️ Manifest is empty, nothing to import.")
+        return 0
+
+    versions = store.versions(project)
+    prefix = f"{project}_"
+    seen = set()
+    for entry in entries:
+        if entry["version"].startswith(prefix):
+            entry["version"] = entry["version"][len(prefix):]
+        v = entry["version"]
+        if v in seen:
+            print(f"❌ Version '{v}' appears twice in the manifest.")
+            return 1
+        if v in versions:
+            print(f"❌ Version '{v}' already exists in project '{project}'.")
+            return 1
+        # a source must already exist or come earlier in the manifest
+        src = entry.get("from_version")
+        if src == v:
+            print(f"❌ Version '{v}' copies from itself.")
+            return 1
+        if src and src not in versions and src not in seen:
+            later = any(e["version"] in (src, prefix + src) for e in entries)
+            print(f"❌ Version '{v}' copies from "
+                  + (f"'{src}', which comes later in the manifest." if later else f"unknown version '{src}'."))
+            return 1
+        seen.add(v)
+
+    project_path = PROJECTS_DIR / project
+    project_path.mkdir(parents=True, exist_ok=True)
+
+    records: Dict[str, Dict[str, Any]] = {}
+    paths = []
+    for entry in entries:
+        version = entry["version"]
+        filename = f"{project}_{version}.py"
+        _, copied_from = _seed_version(
+            project, version, project_path / filename, versions, entry.get("from_version"), entry.get("content")
+        )
+        record = _version_record(project, filename, entry.get("description") or description, copied_from)
+        if proj_meta.get("blob_store"):
+            record["blob"] = blobstore.ingest(project_path / filename,
+                                              base=versions.get(copied_from, {}).get("blob"))
+        records[version] = record
+        versions[version] = record  # later entries may copy from earlier ones
+        paths.append(record["filename"])
+
+    store.put_versions(project, records)
+    lineage.record(project, {v: r["copied_from"] for v, r in records.items()})
+    search.record(project, {v: (r["created_at"], (WORKSPACE / r["filename"]).read_bytes()) for v, r in records.items()})
+
+    committed = ""
+    if proj_meta.get("git_enabled"):
+        root = store.git_root(project)
+        if ensure_workspace_git(verbose=False, root=root):
+            first, last = entries[0]["version"], entries[-1]["version"]
+            msg = f"{project}: import {len(entries)} versions ({first}..{last}){': ' + description if description else ''}"
+            commit, queued = commitq.submit(
+                root, [*paths, *store.commit_paths(project)], msg, tags=[f"{project}_{v}" for v in records],
+                fill=[{"project": project, "version": v} for v in records],
+            )
+            if queued:
+                committed = ", commit queued"
+            elif not commit:
+                print(f"⚠️ {len(records)} versions written but the git commit failed.")
+                return 1
+            else:
+                store.update_versions(project, {v: {"git_commit": commit} for v in records})
+                committed = f", committed and tagged in {commit[:8]}"
+        else:
+            print("⚠️ Git repo not initialized at workspace; skipping commit.")
+
+    elapsed = time.perf_counter() - start
+    rate = len(records) / elapsed if elapsed > 0 else float("inf")
+    print(f"✅ Imported {len(records)} versions into '{project}'{committed} "
+          f"in {elapsed:.2f}s ({rate:.1f} versions/s).")
+    return 0
+
+
+def run_version(project: str, version: str, timeout: Optional[float] = None, cpu_s: Optional[int] = None,
+                memory_mb: Optional[int] = None, warm: bool = False, no_cache: bool = False,
+                pool=None) -> int:
+    """
+    Run a version in the sandbox: own process group, plus CPU/memory rlimits
+    and a wall-clock timeout when given or set in BILLY_RUN_* (none by default).
+    With `warm`, the run is forked from a pre-started interpreter (the
+    caller's `pool` when it reuses one across runs, else a pool started for
+    this run alone). Projects with the run cache enabled replay unchanged runs
+    unless `no_cache`.
+    """
+    from . import blobstore, sandbox, runcache, envs
+    from .runlog import run_logged, log_replay, RUNS_DIR
+
+    store = get_store()
+    meta = store.get_version(project, version)
+    if meta is None:
         print(f"❌ Cannot find project='{project}' version='{version}'")
         return 1
 
     file_rel = meta["filename"]
-    file_abs = WORKSPACE / file_rel
+    file_abs = blobstore.materialize(meta)
     if not file_abs.exists():
         print(f"❌ File missing on disk: {file_abs}")
         return 1
 
-    print(f"▶️  Running: {file_rel}")
-    code = subprocess.run([sys.executable, str(file_abs)]).returncode
-
-    memory["projects"][project]["versions"][version]["last_run"] = now_iso()
-    save_memory(memory)
+    try:
+        python = envs.interpreter(meta)
+    except envs.EnvError as e:
+        print(f"❌ Dependencies of {project}/{version}: {e}")
+        return 1
 
-    if code == 0:
-        print("✅ Run finished OK.")
+    limits = sandbox.resolve_limits(timeout, cpu_s, memory_mb)
+    cache_key = (runcache.cache_key(meta, file_abs, limits, python)
+                 if runcache.enabled(store.get_project(project), no_cache) else None)
+    cached = runcache.lookup(cache_key) if cache_key else None
+    if cached:
+        start = time.perf_counter()
+        print(f"▶️  Running: {file_rel} (cached result from {cached['cached_at']})")
+        runcache.replay(cached)
+        record = log_replay(project, version, cached)
+        saved_s = runcache.saved(cached, time.perf_counter() - start)
+        stats: Dict[str, Any] = {}
+
+        def stamp(m):  # runs inside the store write, on the current counters
+            stats.update(runcache.record_outcome(m, record["started_at"], hit=True, saved_s=saved_s))
+        store.modify_versions(project, {version: stamp})
+        code = cached["exit_code"]
+        icon, outcome = ("✅", "OK") if code == 0 else ("⚠️", f"with code {code}")
+        print(f"{icon} Replayed from the run cache: originally finished {outcome} in {cached['duration_s']:.3f}s "
+              f"({runcache.hit_rate(stats)}).")
+        return code
+
+    # the zygote is Billy's interpreter, so versions with a dependency env always start cold
+    own_pool = None
+    if python != sys.executable:
+        pool = None
+    elif pool is None and warm and sandbox.warm_pool_available():
+        pool = own_pool = sandbox.WarmPool()
+    launcher = pool.launcher(limits) if pool else sandbox.cold_launcher(limits)
+    print(f"▶️  Running: {file_rel}" + (f" (env {Path(python).parent.parent.name})" if python != sys.executable else ""))
+    try:
+        record = run_logged(project, version, [python, str(file_abs)],
+                            timeout=limits["timeout"], launcher=launcher)
+    finally:
+        if own_pool:
+            own_pool.close()
+    code = record["exit_code"]
+
+    if cache_key:
+        runcache.save(cache_key, record, RUNS_DIR / project / record["log"])
+        store.modify_versions(project, {version: lambda m: runcache.record_outcome(m, record["started_at"],
+                                                                                    hit=False)})
+    else:
+        store.update_version(project, version, last_run=record["started_at"])
+
+    stats = (f"{record['duration_s']:.3f}s wall, {record['cpu_s']:.3f}s cpu, "
+             f"peak {record['peak_rss_kb'] / 1024:.1f} MiB")
+    if record["timed_out"]:
+        print(f"⏱️ Run killed after the {limits['timeout']:g}s timeout ({stats})")
+        code = code or 1
+    elif code == 0:
+        print(f"✅ Run finished OK ({stats}).")
     else:
-        print(f"⚠️ Run exited with code {code}")
-    return code
+        reason = sandbox.describe_exit(code)
+        print(f"⚠️ Run exited with code {code}{f' ({reason})' if reason else ''} ({stats})")
+    if own_pool:  # a shared pool is summarized by its owner
+        print(own_pool.summary())
+    return code if code >= 0 else 1
 
 
-def diff_versions(project: str, version1: str, version2: str) -> int:
-    """Show git diff between two versions of a project."""
-    memory = load_memory()
-    proj = memory["projects"].get(project)
-    if not proj:
+def diff_versions(project: str, version1: str, version2: str, fmt: str = "unified",
+                  context: int = 3, width: Optional[int] = None, use_git: bool = False) -> int:
+    """
+    Show the diff between two versions of a project. Uses the native diff
+    engine (works for any pair, git or not); with `use_git`, asks git to
+    diff the two committed version files instead.
+    """
+    if not use_git:
+        from .diffing import diff_pair
+        return diff_pair(project, version1, version2, fmt, context, width)
+
+    store = get_store()
+    if store.get_project(project) is None:
         print(f"❌ Project '{project}' not found.")
         return 1
 
-    v1 = proj["versions"].get(version1)
-    v2 = proj["versions"].get(version2)
+    v1 = store.get_version(project, version1)
+    v2 = store.get_version(project, version2)
     if not v1 or not v2:
         print(f"❌ One of the versions not found ({version1}, {version2}).")
         return 1
@@ -265,11 +654,14 @@ def diff_versions(project: str, version1: str, version2: str) -> int:
     commit1 = v1.get("git_commit")
     commit2 = v2.get("git_commit")
     if not commit1 or not commit2:
-        print("⚠️ Missing commit hashes, cannot diff.")
+        print("⚠️ Missing commit hashes, cannot diff with git (drop --git for a native diff).")
         return 1
 
     print(f"🔍 Diff between {version1} ({commit1[:8]}) and {version2} ({commit2[:8]}):\n")
-    diff = run_git(["diff", f"{commit1}", f"{commit2}"])
+    args = ["diff", "--stat" if fmt == "stat" else f"-U{context}"]
+    root = store.git_root(project)
+    diff = run_git(args + [f"{commit1}:{repo_path(v1['filename'], root)}",
+                           f"{commit2}:{repo_path(v2['filename'], root)}"], cwd=root)
     if diff:
         print(diff)
     else:
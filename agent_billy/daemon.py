@@ -0,0 +1,258 @@
+from __future__ import annotations
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+from typing import Optional, List
+
+from .utils import STATE_DIR
+
+SOCKET_PATH = STATE_DIR / "billy.sock"
+LOG_FILE = STATE_DIR / "daemon.log"
+
+# Protocol: the client sends one JSON line {"argv", "cwd", "env"} (or {"op"}
+# for ping/shutdown); the daemon streams back {"out": text} / {"err": text}
+# lines while the command runs and finishes with {"exit": code}, or with
+# {"stale": [names]} when the request must run outside the daemon.
+# Each command runs in a forked child, so a long `run` never blocks `list`;
+# store writes are transactional, so concurrent commands are safe.
+
+# BILLY_* settings read on every call. All others are baked into module
+# constants at import (metrics.ENABLED, sandbox.DEFAULT_LIMITS, envs.MAX_ENVS,
+# log.COMMIT_EVERY, ...), so a request that changes one runs locally instead.
+PER_CALL_ENV = {"BILLY_DAEMON", "BILLY_GIT_BACKEND", "BILLY_GIT_ASYNC", "BILLY_PROFILE"}
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Client
+
+def _baked_env(env) -> dict:
+    return {k: v for k, v in env.items() if k.startswith("BILLY_") and k not in PER_CALL_ENV}
+
+
+def _connect() -> Optional[socket.socket]:
+    if not SOCKET_PATH.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(SOCKET_PATH))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _send(sock: socket.socket, payload: dict):
+    sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+    return sock.makefile("r", encoding="utf-8")
+
+
+def request(argv: List[str]) -> Optional[int]:
+    """Run argv through the daemon; returns the exit code, or None if no daemon is reachable."""
+    sock = _connect()
+    if sock is None:
+        return None
+    env = {k: v for k, v in os.environ.items() if k.startswith(("BILLY_", "GIT_"))}
+    with sock, _send(sock, {"argv": argv, "cwd": os.getcwd(), "env": env}) as replies:
+        for line in replies:
+            msg = json.loads(line)
+            if "out" in msg:
+                sys.stdout.write(msg["out"])
+                sys.stdout.flush()
+            elif "err" in msg:
+                sys.stderr.write(msg["err"])
+                sys.stderr.flush()
+            elif "exit" in msg:
+                return msg["exit"]
+            elif "stale" in msg:  # our settings differ from the daemon's; run in-process
+                return None
+    print("⚠️ Billy daemon closed the connection mid-command.", file=sys.stderr)
+    return 1
+
+
+def _ping() -> Optional[dict]:
+    sock = _connect()
+    if sock is None:
+        return None
+    with sock, _send(sock, {"op": "ping"}) as replies:
+        line = replies.readline()
+    return json.loads(line) if line else None
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Server
+
+class _FrameWriter(io.TextIOBase):
+    """File-like stdout/stderr replacement that forwards writes as protocol frames."""
+
+    def __init__(self, wire, key: str):
+        self.wire = wire
+        self.key = key
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self.wire.write(json.dumps({self.key: text}) + "\n")
+            self.wire.flush()  # stream output as it is produced
+        return len(text)
+
+    def flush(self) -> None:
+        self.wire.flush()
+
+
+def _run_request(req: dict, wire) -> int:
+    """Run one command in this (forked) process with the client's cwd and env."""
+    from . import store
+    from .cli import dispatch
+
+    store._STORE = None  # reopen: the backend may have changed since warm-up (migrate-store)
+    out, err = _FrameWriter(wire, "out"), _FrameWriter(wire, "err")
+    os.chdir(req.get("cwd") or os.getcwd())
+    os.environ.update(req.get("env") or {})
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            code = dispatch(req["argv"])
+        except SystemExit as e:  # argparse errors / --help
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    return code if isinstance(code, int) else 0
+
+
+def _serve_child(conn: socket.socket, req: dict) -> None:
+    """Forked child: run the request, write its exit frame and leave without unwinding the server."""
+    code = 1
+    try:
+        with conn.makefile("w", encoding="utf-8") as wire:
+            code = _run_request(req, wire)
+            wire.write(json.dumps({"exit": code}) + "\n")
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        os._exit(code)
+
+
+def _reap(children: set, block: bool = False) -> None:
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, 0 if block else os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            children.discard(pid)
+
+
+def serve() -> int:
+    """Serve commands on SOCKET_PATH until a shutdown request arrives."""
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    SOCKET_PATH.unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(SOCKET_PATH))
+    os.chmod(SOCKET_PATH, 0o600)
+    server.listen(16)
+
+    # warm up: import the command modules and open the metadata store once
+    from . import cli, core, chatlog, matrix, runlog  # noqa: F401
+    from .store import get_store
+    get_store()
+
+    baked = _baked_env(os.environ)
+    started, served, children = time.time(), 0, set()
+    try:
+        while True:
+            conn, _ = server.accept()
+            _reap(children)
+            with conn, conn.makefile("r", encoding="utf-8") as rfile, \
+                    conn.makefile("w", encoding="utf-8") as wire:
+                line = rfile.readline()
+                if not line:
+                    continue
+                req = json.loads(line)
+                op = req.get("op")
+                if op == "ping":
+                    wire.write(json.dumps({"pid": os.getpid(), "served": served, "running": len(children),
+                                           "uptime_s": round(time.time() - started, 1)}) + "\n")
+                    continue
+                if op == "shutdown":
+                    _reap(children, block=True)  # let running commands finish
+                    wire.write(json.dumps({"exit": 0}) + "\n")
+                    break
+                env = _baked_env(req.get("env") or {})
+                if env != baked:
+                    stale = sorted(k for k in env.keys() | baked.keys() if env.get(k) != baked.get(k))
+                    wire.write(json.dumps({"stale": stale}) + "\n")
+                    continue
+                wire.flush()
+                pid = os.fork()
+                if pid == 0:
+                    server.close()
+                    _serve_child(conn, req)
+                children.add(pid)
+                served += 1
+    finally:
+        server.close()
+        SOCKET_PATH.unlink(missing_ok=True)
+    return 0
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `daemon` command
+
+def control(action: str) -> int:
+    info = _ping()
+    if action == "status":
+        if info:
+            print(f"🟢 Billy daemon running (pid {info['pid']}, {info['served']} commands served, "
+                  f"{info['running']} running, up {info['uptime_s']}s) on {SOCKET_PATH}")
+        else:
+            print("⚪ Billy daemon not running.")
+        return 0
+
+    if action == "stop":
+        sock = _connect()
+        if sock is None:
+            print("ℹ️ Billy daemon not running.")
+            return 0
+        with sock, _send(sock, {"op": "shutdown"}) as replies:
+            replies.readline()
+        print("🛑 Billy daemon stopped.")
+        return 0
+
+    if info:
+        print(f"ℹ️ Billy daemon already running (pid {info['pid']}).")
+        return 0
+    if action == "serve":
+        return serve()
+
+    # start: double-fork so the daemon is re-parented and outlives this shell
+    pid = os.fork()
+    if pid == 0:
+        os.setsid()
+        if os.fork() > 0:
+            os._exit(0)
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        log = os.open(str(LOG_FILE), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        try:
+            serve()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    for _ in range(100):
+        info = _ping()
+        if info:
+            print(f"🟢 Billy daemon started (pid {info['pid']}). Use BILLY_DAEMON=1 to route commands through it.")
+            return 0
+        time.sleep(0.05)
+    print(f"❌ Billy daemon did not come up; see {LOG_FILE}")
+    return 1
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import difflib
+import gzip
+import hashlib
+import shutil
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from .utils import STATE_DIR
+from .blobstore import content_hash, materialize
+
+CACHE_DIR = STATE_DIR / "diffcache"
+FORMATS = ("unified", "side", "stat")
+
+# Native version-file diffs (difflib), independent of git.
+#
+# The rendered hunks are cached under .billy/diffcache keyed on the two
+# content hashes plus the rendering options, so the same pair of contents
+# is only ever diffed once, whichever versions (or projects) it belongs to.
+# Headers carry version names and are added outside the cache.
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Content
+
+class VersionReader:
+    """
+    Reads version contents: the working file (rematerialized from the blob
+    store if pruned), else the file as committed in git (the repo at `root`,
+    the workspace's by default). The git reader is only started the first
+    time a file is missing.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root
+        self._git = None
+
+    def read(self, meta: Dict[str, Any]) -> Optional[bytes]:
+        path = materialize(meta)
+        if path.exists():
+            return path.read_bytes()
+        if meta.get("git_commit"):
+            if self._git is None:
+                from .git_ops import CatFileSession, workspace_git_ready
+                if not workspace_git_ready(self.root):
+                    return None
+                self._git = CatFileSession(self.root)
+            from .git_ops import repo_path
+            obj = self._git.read(f"{meta['git_commit']}:{repo_path(meta['filename'], self.root)}")
+            if obj and obj[1] == "blob":
+                return obj[2]
+        return None
+
+    def close(self) -> None:
+        if self._git is not None:
+            self._git.close()
+            self._git = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _lines(data: bytes) -> List[str]:
+    return data.decode("utf-8", errors="replace").splitlines()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Rendering
+
+def _unified(a: List[str], b: List[str], context: int) -> List[str]:
+    # header lines (---/+++) are added by the caller with version labels
+    return list(difflib.unified_diff(a, b, n=context, lineterm=""))[2:]
+
+
+def _side_by_side(a: List[str], b: List[str], context: int, width: int) -> List[str]:
+    col = max(10, (width - 3) // 2)
+
+    def cell(text: str) -> str:
+        text = text.expandtabs(4)
+        return text[:col - 1] + "…" if len(text) > col else text.ljust(col)
+
+    out = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for group in matcher.get_grouped_opcodes(context):
+        i1, j1 = group[0][1], group[0][3]
+        out.append(f"@@ {i1 + 1} | {j1 + 1} @@")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out.extend(f"{cell(x)}   {y}" for x, y in zip(a[i1:i2], b[j1:j2]))
+                continue
+            left, right = a[i1:i2], b[j1:j2]
+            for k in range(max(len(left), len(right))):
+                x = left[k] if k < len(left) else None
+                y = right[k] if k < len(right) else None
+                mark = "|" if x is not None and y is not None else ("<" if y is None else ">")
+                out.append(f"{cell(x or '')} {mark} {y or ''}".rstrip())
+    return out
+
+
+def _stat(a: List[str], b: List[str]) -> Tuple[int, int]:
+    added = removed = 0
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return added, removed
+
+
+def _cache_path(ha: str, hb: str, fmt: str, context: int, width: int) -> Path:
+    key = hashlib.sha256(f"{ha}:{hb}:{fmt}:{context}:{width}".encode()).hexdigest()
+    return CACHE_DIR / key[:2] / f"{key[2:]}.gz"
+
+
+def render(old: bytes, new: bytes, fmt: str = "unified", context: int = 3, width: int = 0) -> List[str]:
+    """
+    Diff body for two contents in `fmt` (no file header). For "stat" the
+    single line is "<added> <removed>". Cached by content hash.
+    """
+    ha, hb = content_hash(old), content_hash(new)
+    if ha == hb:
+        return ["0 0"] if fmt == "stat" else []
+    path = _cache_path(ha, hb, fmt, context, width if fmt == "side" else 0)
+    if path.exists():
+        return gzip.decompress(path.read_bytes()).decode("utf-8").split("\n") if path.stat().st_size else []
+
+    a, b = _lines(old), _lines(new)
+    if fmt == "stat":
+        body = ["%d %d" % _stat(a, b)]
+    elif fmt == "side":
+        body = _side_by_side(a, b, context, width)
+    else:
+        body = _unified(a, b, context)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(gzip.compress("\n".join(body).encode("utf-8")) if body else b"")
+    tmp.replace(path)
+    return body
+
+
+def _stat_line(label: str, added: int, removed: int, bar: int = 40) -> str:
+    total = added + removed
+    scale = min(1.0, bar / total) if total else 0
+    plus, minus = round(added * scale), round(removed * scale)
+    return f" {label} | {total:>5} {'+' * plus}{'-' * minus}"
+
+
+def format_diff(old: bytes, new: bytes, label_a: str, label_b: str,
+                fmt: str = "unified", context: int = 3, width: int = 0) -> Iterator[str]:
+    """Yield printable lines for one diff, with headers."""
+    body = render(old, new, fmt, context, width)
+    if fmt == "stat":
+        added, removed = map(int, body[0].split())
+        yield _stat_line(f"{label_a} → {label_b}", added, removed)
+        return
+    if not body:
+        return
+    if fmt == "unified":
+        yield f"--- {label_a}"
+        yield f"+++ {label_b}"
+    else:
+        col = max(10, (width - 3) // 2)
+        yield f"{label_a:<{col}}   {label_b}"
+    yield from body
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI commands
+
+def _terminal_width(width: Optional[int]) -> int:
+    return width or shutil.get_terminal_size((160, 24)).columns
+
+
+def diff_pair(project: str, version1: str, version2: str, fmt: str = "unified",
+              context: int = 3, width: Optional[int] = None) -> int:
+    """Diff any two versions of a project, git-tracked or not."""
+    from .store import get_store
+
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    m1, m2 = store.get_version(project, version1), store.get_version(project, version2)
+    if not m1 or not m2:
+        print(f"❌ One of the versions not found ({version1}, {version2}).")
+        return 1
+
+    with VersionReader(store.git_root(project)) as reader:
+        old, new = reader.read(m1), reader.read(m2)
+    missing = [v for v, data in ((version1, old), (version2, new)) if data is None]
+    if missing:
+        print(f"❌ Content not available for: {', '.join(missing)}")
+        return 1
+
+    print(f"🔍 Diff between {version1} and {version2}:\n")
+    labels = (version1, version2) if fmt == "stat" else (m1["filename"], m2["filename"])
+    lines = list(format_diff(old, new, *labels, fmt, context, _terminal_width(width)))
+    if lines:
+        print("\n".join(lines))
+    else:
+        print("ℹ️ No differences found.")
+    return 0
+
+
+def lineage(versions: Dict[str, Dict[str, Any]], version: str) -> List[str]:
+    """`version` and its copied_from ancestors, root first."""
+    chain, seen = [], set()
+    v: Optional[str] = version
+    while v in versions and v not in seen:
+        seen.add(v)
+        chain.append(v)
+        v = versions[v].get("copied_from")
+    return chain[::-1]
+
+
+def diff_chain(project: str, version: str, fmt: str = "unified", context: int = 3,
+               width: Optional[int] = None) -> int:
+    """
+    Stream the diffs along a version's copied_from lineage (root → version).
+    Only the previous file is held in memory; each step prints as soon as
+    it is computed.
+    """
+    from .store import get_store
+
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    versions = store.versions(project)
+    if version not in versions:
+        print(f"❌ Version '{version}' not found in '{project}'.")
+        return 1
+
+    chain = lineage(versions, version)
+    width = _terminal_width(width)
+    print(f"🧬 Lineage of {project}/{version}: {' → '.join(chain)}\n", flush=True)
+    with VersionReader(store.git_root(project)) as reader:
+        prev_v, prev = chain[0], reader.read(versions[chain[0]])
+        for v in chain[1:]:
+            data = reader.read(versions[v])
+            if prev is None or data is None:
+                print(f"⚠️ {prev_v} → {v}: content not available, skipping.", flush=True)
+            else:
+                labels = (prev_v, v) if fmt == "stat" else (versions[prev_v]["filename"], versions[v]["filename"])
+                lines = list(format_diff(prev, data, *labels, fmt, context, width))
+                if fmt != "stat":
+                    print(f"── {prev_v} → {v}" + ("" if lines else " (identical)"))
+                if lines:
+                    print("\n".join(lines))
+                if fmt != "stat":
+                    print()
+                print(end="", flush=True)
+            prev_v, prev = v, data
+    if len(chain) == 1:
+        print(f"ℹ️ {version} was not copied from another version.")
+    return 0
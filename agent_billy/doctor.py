@@ -0,0 +1,393 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+from .utils import WORKSPACE, PROJECTS_DIR, STATE_DIR, now_iso, _atomic_write_json
+from .store import get_store
+from . import blobstore, metrics
+
+DOCTOR_DIR = STATE_DIR / "doctor"
+CACHE_FILE = DOCTOR_DIR / "cache.json"
+REPORT_FILE = DOCTOR_DIR / "report.json"
+CHUNK = 256  # versions per file-check task
+
+# `doctor` checks every project (or one) for metadata that no longer
+# matches the files and the git repo:
+#
+#   missing_file     version file gone and no blob holds its content   (error)
+#   missing_commit   git_commit is not an object in the repo           (error)
+#   tag_mismatch     <project>_<version> tag missing or elsewhere      (error)
+#   broken_lineage   copied_from names a version that does not exist   (error)
+#   uncommitted      no git_commit recorded                            (warning)
+#   header_mismatch  '# Project:' / '# Version:' lines disagree        (warning)
+#   orphan_file      file under projects/<project>/ nobody references  (warning)
+#
+# File checks run in a thread pool over chunks of versions; each repo's
+# tags come from one for-each-ref and its commits from one batched
+# cat-file --batch-check. Every recorded commit is re-checked on each run
+# (one process per repo, whatever the count), so commits lost to a rebase,
+# reset or gc are reported. .billy/doctor/cache.json keeps, per file, its
+# stat token with the content hash and header it had, so a rerun only
+# reads files that changed. The full report is written to
+# .billy/doctor/report.json.
+
+ERRORS = ("missing_file", "missing_commit", "tag_mismatch", "broken_lineage")
+
+Issue = Dict[str, Any]
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    cache.setdefault("files", {})
+    cache.pop("commits", None)  # older caches remembered commits once seen; they are re-checked now
+    return cache
+
+
+def _issue(check: str, project: str, detail: str, version: Optional[str] = None,
+           path: Optional[str] = None, fix: Optional[Dict[str, Any]] = None) -> Issue:
+    return {"check": check, "severity": "error" if check in ERRORS else "warning", "project": project,
+            "version": version, "path": path, "detail": detail, "fixable": fix is not None,
+            "fixed": False, "_fix": fix}
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Checks
+
+def _read_header(path: Path) -> Tuple[str, Optional[str], Optional[str]]:
+    """(sha256, '# Project:' value, '# Version:' value) of a file."""
+    data = path.read_bytes()
+    metrics.add("bytes_read", len(data))
+    project = version = None
+    for line in data[:1024].decode("utf-8", "replace").splitlines()[:6]:
+        if line.startswith("# Project:"):
+            project = line.split(":", 1)[1].strip()
+        elif line.startswith("# Version:"):
+            version = line.split(":", 1)[1].strip()
+    return blobstore.content_hash(data), project, version
+
+
+def _check_files(project: str, items: List[Tuple[str, Dict[str, Any]]],
+                 files_cache: Dict[str, Any]) -> Tuple[List[Issue], Dict[str, Any], int, int]:
+    """missing_file and header_mismatch for a chunk of versions. Returns (issues, cache updates, read, cached)."""
+    issues: List[Issue] = []
+    updates: Dict[str, Any] = {}
+    read = cached_hits = 0
+    for version, meta in items:
+        rel = meta["filename"]
+        path = WORKSPACE / rel
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            if not blobstore.has(meta.get("blob")):
+                rev = meta.get("git_commit") or f"refs/tags/{project}_{version}"
+                issues.append(_issue("missing_file", project, f"{rel} is missing and has no blob",
+                                     version, rel, fix={"restore": rev}))
+            continue
+        token = [st.st_ino, st.st_mtime_ns, st.st_size]
+        cached = files_cache.get(rel)
+        if cached and cached[:3] == token:
+            _, head_project, head_version = cached[3:]
+            cached_hits += 1
+        else:
+            try:
+                digest, head_project, head_version = _read_header(path)
+            except OSError:
+                continue
+            read += 1
+            updates[rel] = token + [digest, head_project, head_version]
+        wrong = [f"{key} {got!r} (expected {want!r})" for key, got, want in
+                 (("Project", head_project, project), ("Version", head_version, version))
+                 if got is not None and got != want]
+        if wrong:
+            issues.append(_issue("header_mismatch", project, f"header says {', '.join(wrong)}", version, rel,
+                                 fix=None if meta.get("blob") else {"header": True}))
+    return issues, updates, read, cached_hits
+
+
+def _check_lineage(project: str, versions: Dict[str, Dict[str, Any]]) -> List[Issue]:
+    return [_issue("broken_lineage", project, f"copied_from {meta['copied_from']!r} does not exist", version,
+                   fix={"copied_from": None})
+            for version, meta in versions.items() if meta.get("copied_from") and meta["copied_from"] not in versions]
+
+
+def _check_orphans(project: str, proj_meta: Dict[str, Any], versions: Dict[str, Dict[str, Any]]) -> List[Issue]:
+    """Files under projects/<project>/ that neither a version nor a safepoint points to."""
+    from .checkout import SKIP_TOP
+
+    base = PROJECTS_DIR / project
+    if not base.is_dir():
+        return []
+    known = {m["filename"] for m in versions.values()}
+    known.update(sp.get("filename") for sp in (proj_meta.get("safepoints") or {}).values())
+    issues = []
+    for dirpath, dirnames, filenames in os.walk(base):
+        top = Path(dirpath) == base
+        dirnames[:] = [d for d in dirnames if not d.startswith(".") and not (top and d in SKIP_TOP)]
+        for name in filenames:
+            if name.startswith(".") or (top and (name in SKIP_TOP or name.endswith(".lock"))):
+                continue
+            rel = (Path(dirpath) / name).relative_to(WORKSPACE).as_posix()
+            if rel not in known:
+                issues.append(_issue("orphan_file", project, "not referenced by any version or safepoint",
+                                     path=rel))
+    return issues
+
+
+def _repo_tags(root: Path) -> Dict[str, str]:
+    """tag name → commit it points to (annotated tags peeled), in one git call."""
+    with metrics.span("git"):
+        result = subprocess.run(["git", "for-each-ref", "refs/tags",
+                                 "--format=%(refname:lstrip=2) %(objectname) %(*objectname)"],
+                                cwd=str(root), capture_output=True, text=True)
+    tags = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) >= 2:
+            tags[parts[0]] = parts[-1]
+    return tags
+
+
+def _existing_commits(root: Path, shas: List[str]) -> set:
+    """The subset of `shas` that are commits in the repo at `root` (one cat-file process)."""
+    if not shas:
+        return set()
+    with metrics.span("git"):
+        result = subprocess.run(["git", "cat-file", "--batch-check"], cwd=str(root),
+                                input="".join(f"{s}\n" for s in shas), capture_output=True, text=True)
+    found = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == "commit":
+            found.add(parts[0])
+    return found
+
+
+def _check_git(project: str, versions: Dict[str, Dict[str, Any]], tags: Dict[str, str],
+               existing: set) -> List[Issue]:
+    issues = []
+    for version, meta in versions.items():
+        tag, sha = f"{project}_{version}", meta.get("git_commit")
+        tagged = tags.get(tag)
+        if not sha:
+            if tagged:
+                issues.append(_issue("uncommitted", project, f"no git_commit recorded, but tag {tag} → {tagged[:8]}",
+                                     version, fix={"git_commit": tagged}))
+            else:
+                issues.append(_issue("uncommitted", project, "no git_commit recorded", version))
+        elif sha not in existing:
+            fix = {"git_commit": tagged} if tagged and tagged in existing else None
+            issues.append(_issue("missing_commit", project, f"git_commit {sha[:8]} is not in the repo"
+                                 + (f" (tag {tag} → {tagged[:8]})" if tagged else ""), version, fix=fix))
+        elif tagged != sha:
+            issues.append(_issue("tag_mismatch", project, f"tag {tag} " +
+                                 (f"points to {tagged[:8]}, git_commit is {sha[:8]}" if tagged else "is missing"),
+                                 version, fix={"tag": sha}))
+    return issues
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Repairs
+
+def _fix_header(path: Path, project: str, version: str) -> None:
+    lines = path.read_text(encoding="utf-8").split("\n")
+    for i, line in enumerate(lines[:6]):
+        if line.startswith("# Project:"):
+            lines[i] = f"# Project: {project}"
+        elif line.startswith("# Version:"):
+            lines[i] = f"# Version: {version}"
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text("\n".join(lines), encoding="utf-8")
+    os.chmod(tmp, path.stat().st_mode)
+    os.replace(tmp, path)
+
+
+def _apply_fixes(store, issues: List[Issue]) -> None:
+    """Repair what can be repaired from the metadata (or, for git_commit, from the tag); marks issues fixed."""
+    from .checkout import _Reader, _write
+
+    by_project: Dict[str, List[Issue]] = {}
+    for issue in issues:
+        if issue["_fix"] is not None:
+            by_project.setdefault(issue["project"], []).append(issue)
+
+    for project, todo in by_project.items():
+        root = store.git_root(project)
+        versions = store.versions(project)
+        meta_updates: Dict[str, Dict[str, Any]] = {}
+        ref_updates: List[Tuple[Issue, str]] = []
+        reader = None
+        try:
+            for issue in todo:
+                fix, version = issue["_fix"], issue["version"]
+                if "restore" in fix:
+                    reader = reader or _Reader(project, root)
+                    data, _ = reader.version_file(versions[version], fix["restore"])
+                    if data is not None:
+                        _write(WORKSPACE / issue["path"], "100755", data)
+                        issue["fixed"] = True
+                elif "header" in fix:
+                    _fix_header(WORKSPACE / issue["path"], project, version)
+                    issue["fixed"] = True
+                elif "tag" in fix:
+                    ref_updates.append((issue, f"update refs/tags/{project}_{version} {fix['tag']}\n"))
+                else:  # metadata fields: git_commit, copied_from
+                    meta_updates.setdefault(version, {}).update(fix)
+                    issue["fixed"] = True
+        finally:
+            if reader:
+                reader.close()
+        if ref_updates:
+            with metrics.span("git"):
+                result = subprocess.run(["git", "update-ref", "--stdin"], cwd=str(root),
+                                        input="".join(line for _, line in ref_updates), capture_output=True, text=True)
+            if result.returncode == 0:
+                for issue, _ in ref_updates:
+                    issue["fixed"] = True
+            else:
+                print(f"⚠️ git update-ref failed:\n{result.stderr}")
+        if meta_updates:
+            store.update_versions(project, meta_updates)
+            if any("copied_from" in u for u in meta_updates.values()):
+                from .lineage import LineageIndex
+                index = LineageIndex()
+                try:
+                    index.rebuild(project, store.versions(project))
+                finally:
+                    index.close()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `doctor`
+
+def diagnose(project: Optional[str] = None, jobs: Optional[int] = None) -> Dict[str, Any]:
+    """Run every check (in parallel) and return the report dict; issues keep their private `_fix`."""
+    from .git_ops import workspace_git_ready
+
+    start = time.perf_counter()
+    store = get_store()
+    names = [project] if project else store.project_names()
+    cache = _load_cache()
+    files_cache: Dict[str, Any] = cache["files"]
+    issues: List[Issue] = []
+    files_read = files_cached = versions_total = 0
+
+    with ThreadPoolExecutor(max_workers=jobs or min(16, (os.cpu_count() or 1) * 4)) as pool:
+        projects = dict(zip(names, pool.map(lambda n: (store.get_project(n) or {}, store.versions(n)), names)))
+
+        # one tags listing per repo, run alongside the file checks
+        roots: Dict[Path, List[str]] = {}
+        for name, (proj_meta, _) in projects.items():
+            root = store.git_root(name)
+            if proj_meta.get("git_enabled") and workspace_git_ready(root):
+                roots.setdefault(root, []).append(name)
+        tag_jobs = {root: pool.submit(_repo_tags, root) for root in roots}
+
+        file_jobs = []
+        for name, (proj_meta, versions) in projects.items():
+            versions_total += len(versions)
+            items = list(versions.items())
+            for i in range(0, len(items), CHUNK):
+                file_jobs.append(pool.submit(_check_files, name, items[i:i + CHUNK], files_cache))
+        orphan_jobs = [pool.submit(_check_orphans, name, proj_meta, versions)
+                       for name, (proj_meta, versions) in projects.items()]
+
+        for name, (_, versions) in projects.items():
+            issues.extend(_check_lineage(name, versions))
+
+        commit_jobs = {}
+        for root, members in roots.items():
+            wanted = {m.get("git_commit") for n in members for m in projects[n][1].values()} - {None}
+            commit_jobs[root] = pool.submit(_existing_commits, root, sorted(wanted))
+
+        for job in file_jobs:
+            found, updates, read, hits = job.result()
+            issues.extend(found)
+            files_cache.update(updates)
+            files_read += read
+            files_cached += hits
+        for job in orphan_jobs:
+            issues.extend(job.result())
+        for root, members in roots.items():
+            existing = commit_jobs[root].result()
+            tags = tag_jobs[root].result()
+            for name in members:
+                issues.extend(_check_git(name, projects[name][1], tags, existing))
+
+    # forget files that are no longer version files
+    live = {m["filename"] for _, versions in projects.values() for m in versions.values()}
+    prefix = f"projects/{project}/" if project else ""
+    stale = [rel for rel in files_cache if rel not in live and rel.startswith(prefix)]
+    for rel in stale:
+        del files_cache[rel]
+    if files_read or stale:
+        DOCTOR_DIR.mkdir(parents=True, exist_ok=True)
+        _atomic_write_json(CACHE_FILE, cache)
+
+    counts: Dict[str, int] = {}
+    for issue in issues:
+        counts[issue["check"]] = counts.get(issue["check"], 0) + 1
+    return {
+        "generated_at": now_iso(),
+        "workspace": str(WORKSPACE),
+        "projects": len(projects),
+        "versions": versions_total,
+        "files_read": files_read,
+        "files_cached": files_cached,
+        "elapsed_s": round(time.perf_counter() - start, 4),
+        "counts": counts,
+        "issues": issues,
+    }
+
+
+def doctor(project: Optional[str] = None, fix: bool = False, as_json: bool = False,
+           jobs: Optional[int] = None) -> int:
+    store = get_store()
+    if project and store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    report = diagnose(project, jobs)
+    issues = report["issues"]
+    if fix:
+        _apply_fixes(store, issues)
+    for issue in issues:
+        del issue["_fix"]
+    report["fixed"] = sum(1 for i in issues if i["fixed"])
+    DOCTOR_DIR.mkdir(parents=True, exist_ok=True)
+    _atomic_write_json(REPORT_FILE, report)
+    remaining = [i for i in issues if not i["fixed"]]
+    errors = sum(1 for i in remaining if i["severity"] == "error")
+
+    if as_json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return 1 if errors else 0
+
+    print(f"🩺 Checked {report['projects']} project(s), {report['versions']} version(s) in {report['elapsed_s']:.2f}s "
+          f"({report['files_read']} file(s) read, {report['files_cached']} unchanged since last run)")
+    if not issues:
+        print("✅ No problems found.")
+        return 0
+    for check in ERRORS + ("uncommitted", "header_mismatch", "orphan_file"):
+        group = [i for i in issues if i["check"] == check]
+        if not group:
+            continue
+        icon = "❌" if check in ERRORS else "⚠️"
+        print(f"{icon} {check} ({len(group)})")
+        for issue in group[:20]:
+            where = f"{issue['project']}/{issue['version']}" if issue["version"] else issue["path"]
+            state = " — fixed" if issue["fixed"] else (" — fixable with --fix" if issue["fixable"] and not fix else "")
+            print(f"   - {where}: {issue['detail']}{state}")
+        if len(group) > 20:
+            print(f"   … {len(group) - 20} more (see {REPORT_FILE.relative_to(WORKSPACE)})")
+    if fix:
+        print(f"🔧 Fixed {report['fixed']} of {len(issues)} issue(s).")
+    print(f"{'❌' if errors else '✅'} {errors} error(s), {len(remaining) - errors} warning(s) remaining. "
+          f"Report: {REPORT_FILE.relative_to(WORKSPACE)}")
+    return 1 if errors else 0
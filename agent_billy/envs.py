@@ -0,0 +1,322 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from urllib.parse import urlparse, unquote
+
+from .utils import WORKSPACE, STATE_DIR, now_iso
+
+WHEELHOUSE = Path(os.environ.get("BILLY_WHEELHOUSE") or WORKSPACE / "wheelhouse")
+ENVS_DIR = STATE_DIR / "envs"
+WHEELS_DIR = ENVS_DIR / "wheels"      # each wheel unpacked once, keyed by its sha256
+RESOLVED_DIR = ENVS_DIR / "resolved"  # requirement set → pinned wheels
+MAX_ENVS = int(os.environ.get("BILLY_ENV_MAX", 8))
+MANIFEST = "billy-env.json"
+
+# Per-version dependency environments.
+#
+# A version's `dependencies` that are not workspace files are requirement
+# specs ("requests", "numpy>=1.26"). `run` resolves them offline against
+# the wheelhouse (BILLY_WHEELHOUSE, default <workspace>/wheelhouse) with
+# `pip install --dry-run --report`, and runs the version under
+#   .billy/envs/<key>/bin/python
+# where <key> hashes the interpreter and the sha256 of every pinned wheel,
+# so identical dependency sets share one environment. Each wheel is
+# unpacked once into envs/wheels/<sha>/ and hardlinked into the envs that
+# use it (copied where hardlinks are not possible), so an extra env costs
+# directory entries, not disk. Resolutions are cached until the wheelhouse
+# changes; envs are evicted least-recently-used beyond BILLY_ENV_MAX.
+
+
+class EnvError(Exception):
+    pass
+
+
+def requirements(meta: Dict[str, Any]) -> List[str]:
+    """Declared dependencies that are distributions (workspace files only feed the run cache key)."""
+    return sorted({d.strip() for d in meta.get("dependencies") or [] if d.strip() and not (WORKSPACE / d).is_file()})
+
+
+def _python_tag() -> str:
+    return f"{sys.implementation.name}-{sys.version_info.major}.{sys.version_info.minor}-{sys.platform}"
+
+
+def _bin_dir(env: Path) -> Path:
+    return env / ("Scripts" if os.name == "nt" else "bin")
+
+
+def _site_packages(env: Path) -> Path:
+    if os.name == "nt":
+        return env / "Lib" / "site-packages"
+    return env / "lib" / f"python{sys.version_info.major}.{sys.version_info.minor}" / "site-packages"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Resolution
+
+def _wheelhouse_token() -> List[List[Any]]:
+    return sorted([p.name, st.st_size, st.st_mtime_ns]
+                  for p in WHEELHOUSE.iterdir() if p.is_file() for st in [p.stat()])
+
+
+def resolve(reqs: List[str]) -> List[Dict[str, str]]:
+    """Pin a requirement set to wheels in the wheelhouse: [{name, version, wheel, sha256}]."""
+    if not WHEELHOUSE.is_dir():
+        raise EnvError(f"no wheelhouse at {WHEELHOUSE} (set BILLY_WHEELHOUSE)")
+    token = json.dumps([_python_tag(), reqs, _wheelhouse_token()])
+    cached = RESOLVED_DIR / f"{hashlib.sha256(token.encode()).hexdigest()[:24]}.json"
+    if cached.exists():
+        return json.loads(cached.read_text(encoding="utf-8"))
+
+    with tempfile.TemporaryDirectory(prefix="billy-resolve-") as tmp:
+        report = Path(tmp) / "report.json"
+        result = subprocess.run(
+            [sys.executable, "-m", "pip", "install", "--dry-run", "--ignore-installed", "--no-index",
+             "--only-binary", ":all:", "--find-links", str(WHEELHOUSE), "--report", str(report),
+             "--quiet", "--disable-pip-version-check", *reqs],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0 or not report.exists():
+            raise EnvError(f"cannot resolve {' '.join(reqs)} from {WHEELHOUSE}:\n"
+                           f"{(result.stderr or result.stdout).strip()}")
+        install = json.loads(report.read_text(encoding="utf-8")).get("install", [])
+    pinned = []
+    for item in install:
+        wheel = Path(unquote(urlparse(item["download_info"]["url"]).path))
+        pinned.append({"name": item["metadata"]["name"], "version": item["metadata"]["version"],
+                       "wheel": str(wheel), "sha256": _sha256(wheel)})
+    pinned.sort(key=lambda w: w["name"].lower())
+    RESOLVED_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached.with_name(f".{cached.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(pinned, indent=1), encoding="utf-8")
+    os.replace(tmp_path, cached)
+    return pinned
+
+
+def env_key(pinned: List[Dict[str, str]]) -> str:
+    return hashlib.sha256(json.dumps([_python_tag(), sorted(w["sha256"] for w in pinned)]).encode()).hexdigest()[:16]
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Building
+
+def _unpack(wheel: Path, sha: str) -> Path:
+    """Unpack a wheel once into WHEELS_DIR/<sha>/{site,bin}; returns that directory."""
+    dest = WHEELS_DIR / sha[:24]
+    if dest.exists():
+        return dest
+    WHEELS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{sha[:24]}.", dir=WHEELS_DIR))
+    try:
+        with zipfile.ZipFile(wheel) as zf:
+            for info in zf.infolist():
+                parts = info.filename.split("/")
+                if parts[0].endswith(".data") and len(parts) > 2:
+                    if parts[1] in ("purelib", "platlib"):
+                        target = tmp.joinpath("site", *parts[2:])
+                    elif parts[1] == "scripts":
+                        target = tmp.joinpath("bin", *parts[2:])
+                    else:  # headers/data are not needed to import the package
+                        continue
+                else:
+                    target = tmp.joinpath("site", *parts)
+                if ".." in parts or not target.resolve().is_relative_to(tmp.resolve()):
+                    raise EnvError(f"unsafe path in {wheel.name}: {info.filename}")
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with zf.open(info) as src, target.open("wb") as out:
+                    shutil.copyfileobj(src, out)
+                if (info.external_attr >> 16) & 0o111:
+                    os.chmod(target, 0o755)
+        try:
+            os.rename(tmp, dest)
+        except OSError:  # unpacked concurrently by another run
+            shutil.rmtree(tmp, ignore_errors=True)
+    except (zipfile.BadZipFile, OSError) as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise EnvError(f"cannot unpack {wheel}: {e}")
+    return dest
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Hardlink every file under src into dst (copy across filesystems)."""
+    for dirpath, _, files in os.walk(src):
+        out = dst / Path(dirpath).relative_to(src)
+        out.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            try:
+                os.link(Path(dirpath) / name, out / name)
+            except FileExistsError:
+                continue
+            except OSError:
+                shutil.copy2(Path(dirpath) / name, out / name)
+
+
+def _build(key: str, reqs: List[str], pinned: List[Dict[str, str]]) -> Path:
+    ENVS_DIR.mkdir(parents=True, exist_ok=True)
+    dest = ENVS_DIR / key
+    tmp = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=ENVS_DIR))
+    try:
+        made = subprocess.run([sys.executable, "-m", "venv", "--without-pip", "--clear", str(tmp)],
+                              capture_output=True, text=True)
+        if made.returncode != 0:
+            raise EnvError(f"python -m venv failed:\n{made.stderr.strip()}")
+        for w in pinned:
+            unpacked = _unpack(Path(w["wheel"]), w["sha256"])
+            if (unpacked / "site").exists():
+                _link_tree(unpacked / "site", _site_packages(tmp))
+            if (unpacked / "bin").exists():
+                _link_tree(unpacked / "bin", _bin_dir(tmp))
+        (tmp / MANIFEST).write_text(json.dumps({
+            "requirements": reqs,
+            "wheels": [{k: w[k] for k in ("name", "version", "sha256")} for w in pinned],
+            "python": _python_tag(),
+            "created_at": now_iso(),
+        }, indent=2), encoding="utf-8")
+        try:
+            os.rename(tmp, dest)
+        except OSError:  # built concurrently; use theirs
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return dest
+
+
+def interpreter(meta: Dict[str, Any], verbose: bool = True) -> str:
+    """Python to run a version with: its dependency env (built on first use), else Billy's own."""
+    reqs = requirements(meta)
+    if not reqs:
+        return sys.executable
+    pinned = resolve(reqs)
+    key = env_key(pinned)
+    env = ENVS_DIR / key
+    if not env.exists():
+        start = time.perf_counter()
+        env = _build(key, reqs, pinned)
+        if verbose:
+            print(f"🧰 Built env {key} for {', '.join(reqs)} ({len(pinned)} wheels, "
+                  f"{time.perf_counter() - start:.2f}s)")
+        evict(keep=MAX_ENVS, protect=key)
+    os.utime(env / MANIFEST)  # LRU clock
+    return str(_bin_dir(env) / ("python.exe" if os.name == "nt" else "python"))
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Eviction
+
+def _envs() -> List[Path]:
+    if not ENVS_DIR.exists():
+        return []
+    return [p for p in ENVS_DIR.iterdir() if (p / MANIFEST).exists()]
+
+
+def _manifest(env: Path) -> Dict[str, Any]:
+    return json.loads((env / MANIFEST).read_text(encoding="utf-8"))
+
+
+def evict(keep: int = MAX_ENVS, protect: Optional[str] = None) -> List[str]:
+    """Remove the least recently used envs beyond `keep`, then unpacked wheels no env links to."""
+    envs = sorted(_envs(), key=lambda p: (p / MANIFEST).stat().st_mtime, reverse=True)
+    removed = []
+    for env in envs[keep:]:
+        if env.name != protect:
+            shutil.rmtree(env, ignore_errors=True)
+            removed.append(env.name)
+    if WHEELS_DIR.exists():
+        live = {w["sha256"][:24] for env in _envs() for w in _manifest(env)["wheels"]}
+        for unpacked in WHEELS_DIR.iterdir():
+            if unpacked.name not in live and not unpacked.name.startswith("."):
+                shutil.rmtree(unpacked, ignore_errors=True)
+    return removed
+
+
+def _disk_usage(path: Path, seen: set) -> int:
+    """Bytes under `path`, counting each inode once across calls sharing `seen`."""
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            st = os.lstat(os.path.join(dirpath, name))
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `envs` and `deps`
+
+def manage(action: str = "list", project: Optional[str] = None, version: Optional[str] = None,
+           keep: Optional[int] = None) -> int:
+    if action == "build":
+        from .store import get_store
+        meta = get_store().get_version(project, version) if project and version else None
+        if meta is None:
+            print("❌ envs build needs an existing <project> <version>.")
+            return 1
+        if not requirements(meta):
+            print(f"ℹ️ {project}/{version} declares no distribution dependencies.")
+            return 0
+        try:
+            python = interpreter(meta)
+        except EnvError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"✅ {project}/{version} → {python}")
+        return 0
+
+    if action == "gc":
+        removed = evict(keep=MAX_ENVS if keep is None else keep)
+        print(f"🧹 Removed {len(removed)} env(s){': ' + ', '.join(removed) if removed else ''}.")
+        return 0
+
+    envs = sorted(_envs(), key=lambda p: (p / MANIFEST).stat().st_mtime, reverse=True)
+    if not envs:
+        print(f"ℹ️ No dependency envs yet (wheelhouse: {WHEELHOUSE}).")
+        return 0
+    seen: set = set()
+    shared = _disk_usage(WHEELS_DIR, seen) if WHEELS_DIR.exists() else 0
+    print(f"🧰 {len(envs)} env(s) (max {MAX_ENVS}, most recently used first; wheelhouse: {WHEELHOUSE}):")
+    for env in envs:
+        m = _manifest(env)
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime((env / MANIFEST).stat().st_mtime))
+        own = _disk_usage(env, seen)
+        wheels = ", ".join(f"{w['name']}=={w['version']}" for w in m["wheels"]) or "-"
+        print(f" - {env.name}  used {used}  +{own / 1024:.0f} KiB  [{', '.join(m['requirements'])}] → {wheels}")
+    print(f"   unpacked wheels shared by all envs: {shared / 1024:.0f} KiB")
+    return 0
+
+
+def set_dependencies(project: str, version: str, deps: List[str], clear: bool = False) -> int:
+    from .store import get_store
+
+    store = get_store()
+    meta = store.get_version(project, version)
+    if meta is None:
+        print(f"❌ Cannot find project='{project}' version='{version}'")
+        return 1
+    if deps or clear:
+        current = [] if clear else list(meta.get("dependencies") or [])
+        meta["dependencies"] = current + [d for d in deps if d not in current]
+        store.update_version(project, version, dependencies=meta["dependencies"])
+    deps = meta.get("dependencies") or []
+    print(f"📦 {project}/{version} dependencies: {', '.join(deps) if deps else '(none)'}")
+    return 0
@@ -1,37 +1,345 @@
 from __future__ import annotations
+import os
 import subprocess
+import time
+from pathlib import Path
+from typing import Optional, Iterable
+
 from .utils import WORKSPACE
+from . import metrics
 
-def run_git(args: list[str]) -> str | None:
+def run_git(args: list[str], quiet: bool = False, cwd: Optional[Path] = None) -> str | None:
     try:
-        result = subprocess.run(
-            ["git"] + args,
-            cwd=str(WORKSPACE),
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        with metrics.span("git"):
+            result = subprocess.run(
+                ["git"] + args,
+                cwd=str(cwd or WORKSPACE),
+                capture_output=True,
+                text=True,
+                check=True
+            )
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
-        print(f"⚠️ git {' '.join(args)} failed:\n{e.stderr}")
+        if not quiet:
+            print(f"⚠️ git {' '.join(args)} failed:\n{e.stderr}")
         return None
 
-def workspace_git_ready() -> bool:
-    return (WORKSPACE / ".git").exists()
+def workspace_git_ready(root: Optional[Path] = None) -> bool:
+    return ((root or WORKSPACE) / ".git").exists()
+
+# Runtime files Billy writes into the workspace that must never be committed.
+WORKSPACE_IGNORES = ("/.billy/", "memory.json.lock", ".memory.json.*.tmp", "memory.db-wal", "memory.db-shm")
+_ignores_checked: set = set()
+
+
+def _ensure_ignores(root: Path) -> None:
+    """Append any missing WORKSPACE_IGNORES line to the workspace .gitignore (once per process)."""
+    if root in _ignores_checked:
+        return
+    _ignores_checked.add(root)
+    path = root / ".gitignore"
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        text = ""
+    have = {line.strip() for line in text.splitlines()}
+    missing = [line for line in WORKSPACE_IGNORES if line not in have]
+    if missing:
+        sep = "\n" if text and not text.endswith("\n") else ""
+        with path.open("a", encoding="utf-8") as f:
+            f.write(sep + "".join(f"{line}\n" for line in missing))
+
 
-def ensure_workspace_git(verbose: bool = True) -> bool:
-    if not workspace_git_ready():
-        out = run_git(["init"])
+def ensure_workspace_git(verbose: bool = True, root: Optional[Path] = None) -> bool:
+    """Make sure the workspace repo (or a sharded project's own repo at `root`) exists."""
+    if not workspace_git_ready(root):
+        if root:
+            root.mkdir(parents=True, exist_ok=True)
+        out = run_git(["init"], cwd=root)
         if verbose and out is not None:
-            print("✅ Initialized git repository at workspace root.")
-        return out is not None
+            where = "workspace root" if root in (None, WORKSPACE) else root.relative_to(WORKSPACE).as_posix()
+            print(f"✅ Initialized git repository at {where}.")
+        if out is None:
+            return False
+    if root in (None, WORKSPACE):  # shard repos get their own .gitignore from create_project
+        _ensure_ignores(WORKSPACE)
     return True
 
+def repo_path(rel: str, root: Optional[Path] = None) -> str:
+    """A workspace-relative path as seen from the repo at `root` (the workspace by default)."""
+    if root is None or root == WORKSPACE:
+        return Path(rel).as_posix()
+    return (WORKSPACE / rel).relative_to(root).as_posix()
+
 def git_passthrough(args: list[str]) -> int:
     """Run a raw git command inside the workspace repo (used by CLI `git` subcommand)."""
     if not ensure_workspace_git(verbose=False):
         print("❌ No git repo in workspace.")
         return 1
     # passthrough: we don't capture output so interactive commands work
-    result = subprocess.run(["git"] + args, cwd=str(WORKSPACE), text=True)
+    with metrics.span("git"):
+        result = subprocess.run(["git"] + args, cwd=str(WORKSPACE), text=True)
     return result.returncode
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pure-Python ref reading (no fork)
+
+GIT_DIR = WORKSPACE / ".git"
+
+def _packed_refs(git_dir: Path = GIT_DIR) -> dict[str, str]:
+    refs = {}
+    packed = git_dir / "packed-refs"
+    if packed.exists():
+        for line in packed.read_text(encoding="utf-8").splitlines():
+            if line and line[0] not in "#^":
+                sha, ref = line.split(" ", 1)
+                refs[ref] = sha
+    return refs
+
+def resolve_ref(ref: str, git_dir: Path = GIT_DIR) -> Optional[str]:
+    """Resolve a full ref name (e.g. refs/heads/main) to a sha, or None."""
+    loose = git_dir / ref
+    if loose.is_file():
+        return loose.read_text(encoding="utf-8").strip()
+    return _packed_refs(git_dir).get(ref)
+
+def head_ref(git_dir: Path = GIT_DIR) -> tuple[Optional[str], Optional[str]]:
+    """Return (symbolic ref, sha) for HEAD; sha is None on an unborn branch."""
+    head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    if head.startswith("ref: "):
+        ref = head[5:]
+        return ref, resolve_ref(ref, git_dir)
+    return None, head
+
+def list_tags() -> list[str]:
+    """Tag names, sorted like `git tag`."""
+    tags = {r[len("refs/tags/"):] for r in _packed_refs() if r.startswith("refs/tags/")}
+    tag_dir = GIT_DIR / "refs" / "tags"
+    if tag_dir.exists():
+        tags.update(p.relative_to(tag_dir).as_posix() for p in tag_dir.rglob("*") if p.is_file())
+    return sorted(tags)
+
+def _config_identity() -> tuple[Optional[str], Optional[str]]:
+    """Read user.name / user.email from repo and global git config files."""
+    name = email = None
+    xdg = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / "git" / "config"
+    for cfg in (Path.home() / ".gitconfig", xdg, GIT_DIR / "config"):  # later files win
+        if not cfg.is_file():
+            continue
+        section = None
+        for raw in cfg.read_text(encoding="utf-8", errors="replace").splitlines():
+            line = raw.strip()
+            if line.startswith("["):
+                section = line.strip("[]").strip().lower()
+            elif section == "user" and "=" in line:
+                key, value = (part.strip() for part in line.split("=", 1))
+                if key.lower() == "name":
+                    name = value.strip('"')
+                elif key.lower() == "email":
+                    email = value.strip('"')
+    return name, email
+
+def _ident(kind: str) -> Optional[str]:
+    """`Name <email> <epoch> <tz>` for fast-import, honouring GIT_* env overrides."""
+    cfg_name, cfg_email = _config_identity()
+    name = os.environ.get(f"GIT_{kind}_NAME") or cfg_name
+    email = os.environ.get(f"GIT_{kind}_EMAIL") or cfg_email
+    if not name or not email:
+        return run_git(["var", f"GIT_{kind}_IDENT"])
+    offset = time.localtime().tm_gmtoff
+    tz = f"{'+' if offset >= 0 else '-'}{abs(offset) // 3600:02d}{abs(offset) % 3600 // 60:02d}"
+    return f"{name} <{email}> {int(time.time())} {tz}"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Commit backends
+#
+# Both take a set of workspace-relative paths, a message and tags to point at
+# the new commit, and return the commit sha (or None on failure). A backend
+# built with `root` commits into the repo there (a sharded project's own
+# repo); paths are still given relative to the workspace.
+
+def _expand_paths(paths: Iterable[str], root: Path = WORKSPACE) -> list[str]:
+    """Root-relative files under `paths` (directories expanded, missing paths dropped)."""
+    files = []
+    for rel in paths:
+        p = WORKSPACE / rel
+        if p.is_dir():
+            files.extend(sorted(f.relative_to(root).as_posix() for f in p.rglob("*")
+                                if f.is_file() and ".git" not in f.relative_to(p).parts))
+        elif p.exists():
+            files.append(p.relative_to(root).as_posix())
+    return files
+
+
+class SubprocessBackend:
+    """Porcelain commands, one process each (add, commit, rev-parse, tag)."""
+
+    name = "subprocess"
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or WORKSPACE
+
+    def commit(self, paths: list[str], message: str, tags: Iterable[str] = ()) -> Optional[str]:
+        if run_git(["add", *(repo_path(p, self.root) for p in paths)], cwd=self.root) is None:
+            return None
+        if run_git(["commit", "-m", message], cwd=self.root) is None:
+            return None
+        commit = run_git(["rev-parse", "HEAD"], cwd=self.root)
+        tags = list(tags)
+        if commit and len(tags) == 1:
+            run_git(["tag", tags[0], commit], cwd=self.root)
+        elif commit and tags:
+            # many tags (bulk import): create them all in one update-ref transaction
+            updates = "".join(f"create refs/tags/{tag} {commit}\n" for tag in tags)
+            with metrics.span("git"):
+                result = subprocess.run(["git", "update-ref", "--stdin"], cwd=str(self.root),
+                                        input=updates, capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"⚠️ git update-ref failed:\n{result.stderr}")
+        return commit
+
+
+class FastImportBackend:
+    """
+    Writes blobs, the commit and its tags in a single `git fast-import` stream,
+    then refreshes the index entries for the committed paths. Two processes per
+    save regardless of how many files or tags are involved; hooks do not run.
+    """
+
+    name = "fast-import"
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or WORKSPACE
+
+    def commit(self, paths: list[str], message: str, tags: Iterable[str] = ()) -> Optional[str]:
+        files = _expand_paths(paths, self.root)
+        # directories or vanished paths may hide deletions of tracked files
+        deleted = []
+        if any(not (WORKSPACE / rel).is_file() for rel in paths):
+            rel_paths = [repo_path(p, self.root) for p in paths]
+            deleted = (run_git(["ls-files", "--deleted", "--", *rel_paths], quiet=True, cwd=self.root)
+                       or "").splitlines()
+        ref, parent = head_ref(self.root / ".git")
+        if ref is None:
+            print("⚠️ fast-import backend needs a branch checked out (HEAD is detached).")
+            return None
+
+        author, committer = _ident("AUTHOR"), _ident("COMMITTER")
+        if not author or not committer:
+            return None
+
+        msg = message.encode("utf-8")
+        stream = [
+            f"commit {ref}\nmark :1\n".encode(),
+            f"author {author}\ncommitter {committer}\n".encode("utf-8"),
+            b"data %d\n" % len(msg), msg, b"\n",
+        ]
+        if parent:
+            stream.append(f"from {parent}\n".encode())
+        for rel in files:
+            src = self.root / rel
+            data = src.read_bytes()
+            mode = "100755" if os.access(src, os.X_OK) else "100644"
+            stream.append(f"M {mode} inline {rel}\n".encode("utf-8"))
+            stream.append(b"data %d\n" % len(data))
+            stream.append(data)
+            stream.append(b"\n")
+        for rel in deleted:
+            stream.append(f"D {rel}\n".encode("utf-8"))
+        stream.append(b"\n")
+        for tag in tags:
+            stream.append(f"reset refs/tags/{tag}\nfrom :1\n\n".encode("utf-8"))
+        stream.append(b"get-mark :1\n")
+
+        with metrics.span("git"):
+            result = subprocess.run(
+                ["git", "fast-import", "--quiet"],
+                cwd=str(self.root), input=b"".join(stream), capture_output=True,
+            )
+        if result.returncode != 0:
+            print(f"⚠️ git fast-import failed:\n{result.stderr.decode(errors='replace')}")
+            return None
+        commit = result.stdout.decode().strip().splitlines()[-1]
+        # keep the index in step with the new HEAD for the paths we committed
+        if files or deleted:
+            run_git(["update-index", "--add", "--remove", "--", *files, *deleted], cwd=self.root)
+        return commit
+
+
+BACKENDS = {"subprocess": SubprocessBackend, "fast-import": FastImportBackend}
+_BACKEND_NAME = None
+
+def set_backend(name: Optional[str]) -> None:
+    """Pin the commit backend for this process; None falls back to BILLY_GIT_BACKEND."""
+    global _BACKEND_NAME
+    if name is not None and name not in BACKENDS:
+        raise ValueError(f"Unknown git backend: {name}")
+    _BACKEND_NAME = name
+
+def get_backend(root: Optional[Path] = None):
+    # resolved per call so a long-lived process (daemon) follows each request's env
+    name = _BACKEND_NAME or os.environ.get("BILLY_GIT_BACKEND") or "subprocess"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown git backend: {name}")
+    return BACKENDS[name](root)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Persistent object reader
+
+class CatFileSession:
+    """
+    One long-lived `git cat-file --batch` process for object and rev lookups,
+    so repeated reads do not pay a fork + repository open each time.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        with metrics.span("git"):
+            self.proc = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=str(root or WORKSPACE), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            )
+
+    def read(self, rev: str) -> Optional[tuple[str, str, bytes]]:
+        """Return (sha, type, content) for any rev expression (e.g. `tag:path`), or None."""
+        with metrics.span("git.read"):
+            self.proc.stdin.write(rev.encode("utf-8") + b"\n")
+            self.proc.stdin.flush()
+            header = self.proc.stdout.readline().decode().split()
+            if len(header) != 3:  # "<rev> missing" / "ambiguous"
+                return None
+            sha, obj_type, size = header
+            data = self.proc.stdout.read(int(size))
+            self.proc.stdout.read(1)  # trailing LF
+        metrics.add("bytes_read", len(data))
+        return sha, obj_type, data
+
+    def rev_parse(self, rev: str) -> Optional[str]:
+        obj = self.read(f"{rev}^{{commit}}")
+        return obj[0] if obj else None
+
+    def log(self, rev: str = "HEAD", limit: int = 5) -> list[str]:
+        """`git log --oneline` equivalent (first-parent) served from the batch process."""
+        out = []
+        obj = self.read(f"{rev}^{{commit}}")
+        while obj and len(out) < limit:
+            sha, _, body = obj
+            text = body.decode("utf-8", errors="replace")
+            headers, _, message = text.partition("\n\n")
+            out.append(f"{sha[:7]} {message.splitlines()[0] if message else ''}")
+            parents = [ln[7:] for ln in headers.splitlines() if ln.startswith("parent ")]
+            obj = self.read(parents[0]) if parents else None
+        return out
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,390 @@
+from __future__ import annotations
+import difflib
+import json
+import sqlite3
+from collections import deque
+from typing import Optional, List, Dict, Any, Tuple
+
+from .utils import STATE_DIR, version_key
+from .store import get_store
+
+INDEX_DB = STATE_DIR / "lineage.db"
+
+# Lineage index over `copied_from`.
+#
+# One row per version with its parent, depth and binary-lifting jump table
+# (jumps[k] is the 2^k-th ancestor), so depth/LCA queries take O(log depth)
+# point lookups and descendants come straight off the (project, parent)
+# index. The index is derived data: it is extended incrementally when
+# versions are added, and rebuilt from the metadata store whenever its row
+# count no longer matches (e.g. versions added before it existed).
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Index
+
+class LineageIndex:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS nodes (
+        project TEXT NOT NULL,
+        version TEXT NOT NULL,
+        parent  TEXT,
+        depth   INTEGER NOT NULL,
+        jumps   TEXT NOT NULL,
+        PRIMARY KEY (project, version)
+    );
+    CREATE INDEX IF NOT EXISTS nodes_by_parent ON nodes(project, parent);
+    """
+
+    def __init__(self, path=INDEX_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def _node(self, project: str, version: str) -> Optional[Tuple[Optional[str], int, List[str]]]:
+        row = self.conn.execute(
+            "SELECT parent, depth, jumps FROM nodes WHERE project = ? AND version = ?", (project, version)
+        ).fetchone()
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def count(self, project: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM nodes WHERE project = ?", (project,)).fetchone()[0]
+
+    def add(self, project: str, parents: Dict[str, Optional[str]]) -> bool:
+        """
+        Index new versions ({version: parent}, parents before children).
+        Returns False (and indexes nothing) if a parent is not indexed yet;
+        the next query then rebuilds the project from the store.
+        """
+        cache: Dict[str, Tuple[Optional[str], int, List[str]]] = {}
+
+        def node(v):
+            if v not in cache:
+                found = self._node(project, v)
+                if found is None:
+                    return None
+                cache[v] = found
+            return cache[v]
+
+        rows = []
+        for version, parent in parents.items():
+            if parent is None:
+                cache[version] = (None, 0, [])
+            else:
+                pnode = node(parent)
+                if pnode is None:
+                    return False
+                jumps = [parent]
+                while True:
+                    anc = node(jumps[-1])
+                    k = len(jumps) - 1
+                    if anc is None or k >= len(anc[2]):
+                        break
+                    jumps.append(anc[2][k])
+                cache[version] = (parent, pnode[1] + 1, jumps)
+            p, depth, jumps = cache[version]
+            rows.append((project, version, p, depth, json.dumps(jumps)))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO nodes (project, version, parent, depth, jumps) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return True
+
+    def rebuild(self, project: str, versions: Dict[str, Dict[str, Any]]) -> None:
+        """Re-index a whole project, parents first (unknown parents count as roots)."""
+        children: Dict[Optional[str], List[str]] = {}
+        for v, meta in versions.items():
+            parent = meta.get("copied_from")
+            children.setdefault(parent if parent in versions and parent != v else None, []).append(v)
+        order: Dict[str, Optional[str]] = {}
+        queue = deque((root, None) for root in children.get(None, []))
+        while queue:
+            v, parent = queue.popleft()
+            order[v] = parent
+            queue.extend((c, v) for c in children.get(v, []))
+        with self.conn:
+            self.conn.execute("DELETE FROM nodes WHERE project = ?", (project,))
+        self.add(project, order)
+
+    def ensure(self, project: str) -> None:
+        store = get_store()
+        if self.count(project) != store.version_count(project):
+            self.rebuild(project, store.versions(project))
+
+    # Queries
+    def depth(self, project: str, version: str) -> Optional[int]:
+        node = self._node(project, version)
+        return node[1] if node else None
+
+    def ancestors(self, project: str, version: str) -> List[str]:
+        """Parent, grandparent, ... up to the root."""
+        out = []
+        node = self._node(project, version)
+        while node and node[0]:
+            out.append(node[0])
+            node = self._node(project, node[0])
+        return out
+
+    def children(self, project: str, version: str) -> List[str]:
+        rows = self.conn.execute("SELECT version FROM nodes WHERE project = ? AND parent = ?", (project, version))
+        return sorted((r[0] for r in rows), key=version_key)
+
+    def roots(self, project: str) -> List[str]:
+        rows = self.conn.execute("SELECT version FROM nodes WHERE project = ? AND parent IS NULL", (project,))
+        return sorted((r[0] for r in rows), key=version_key)
+
+    def descendants(self, project: str, version: str) -> List[str]:
+        """Everything copied (transitively) from `version`, breadth-first."""
+        out, queue = [], deque([version])
+        while queue:
+            kids = self.children(project, queue.popleft())
+            out.extend(kids)
+            queue.extend(kids)
+        return out
+
+    def _lift(self, project: str, version: str, steps: int) -> str:
+        k = 0
+        while steps:
+            if steps & 1:
+                version = self._node(project, version)[2][k]
+            steps >>= 1
+            k += 1
+        return version
+
+    def lca(self, project: str, a: str, b: str) -> Optional[str]:
+        """Lowest common ancestor of two versions (None if they share no root)."""
+        na, nb = self._node(project, a), self._node(project, b)
+        if na is None or nb is None:
+            return None
+        if na[1] < nb[1]:
+            a, b, na, nb = b, a, nb, na
+        a = self._lift(project, a, na[1] - nb[1])
+        if a == b:
+            return a
+        for k in range(len(self._node(project, a)[2]) - 1, -1, -1):
+            ja, jb = self._node(project, a)[2], self._node(project, b)[2]
+            if k < len(ja) and ja[k] != jb[k]:
+                a, b = ja[k], jb[k]
+        pa, pb = self._node(project, a)[0], self._node(project, b)[0]
+        return pa if pa is not None and pa == pb else None
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def record(project: str, parents: Dict[str, Optional[str]]) -> None:
+    """Hook for add_version(s): extend the index with newly created versions."""
+    index = LineageIndex()
+    try:
+        index.add(project, parents)
+    finally:
+        index.close()
+
+
+def _open(project: str) -> Optional[LineageIndex]:
+    if get_store().get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return None
+    index = LineageIndex()
+    index.ensure(project)
+    return index
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Three-way merge
+
+def merge3(base: List[str], ours: List[str], theirs: List[str],
+           labels: Tuple[str, str, str] = ("ours", "base", "theirs")) -> Tuple[List[str], int]:
+    """
+    Line-based three-way merge. Non-overlapping changes from both sides are
+    applied; overlapping, different changes become diff3-style conflict
+    blocks. Returns (merged lines, number of conflicts).
+    """
+    hunks = []  # (base_lo, base_hi, side, replacement)
+    for side, other in ((0, ours), (1, theirs)):
+        matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                hunks.append((i1, i2, side, other[j1:j2]))
+    hunks.sort(key=lambda h: (h[0], h[1]))
+
+    out: List[str] = []
+    conflicts, pos, i = 0, 0, 0
+    while i < len(hunks):
+        lo, hi = hunks[i][0], hunks[i][1]
+        cluster = [hunks[i]]
+        i += 1
+        while i < len(hunks) and hunks[i][0] <= hi:
+            hi = max(hi, hunks[i][1])
+            cluster.append(hunks[i])
+            i += 1
+        out.extend(base[pos:lo])
+        pos = hi
+
+        def apply(side):
+            text, at = [], lo
+            for h_lo, h_hi, s, repl in cluster:
+                if s == side:
+                    text.extend(base[at:h_lo])
+                    text.extend(repl)
+                    at = h_hi
+            return text + base[at:hi]
+
+        sides = {h[2] for h in cluster}
+        if len(sides) == 1:
+            out.extend(apply(sides.pop()))
+            continue
+        mine, yours = apply(0), apply(1)
+        if mine == yours:
+            out.extend(mine)
+            continue
+        conflicts += 1
+        out.append(f"<<<<<<< {labels[0]}")
+        out.extend(mine)
+        out.append(f"||||||| {labels[1]}")
+        out.extend(base[lo:hi])
+        out.append("=======")
+        out.extend(yours)
+        out.append(f">>>>>>> {labels[2]}")
+    out.extend(base[pos:])
+    return out, conflicts
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI commands
+
+def _describe(meta: Dict[str, Any]) -> str:
+    desc = (meta.get("description") or "").strip().splitlines()
+    merged = f" [merged {meta['merged_from']}]" if meta.get("merged_from") else ""
+    return (f"  — {desc[0][:60]}" if desc else "") + merged
+
+
+def show_tree(project: str, version: Optional[str] = None, max_depth: Optional[int] = None) -> int:
+    """
+    Render the lineage as a tree. Single-child runs stay on the same indent
+    level so long linear histories do not march off the screen.
+    """
+    index = _open(project)
+    if index is None:
+        return 1
+    try:
+        versions = get_store().versions(project)
+        if version and version not in versions:
+            print(f"❌ Version '{version}' not found in '{project}'.")
+            return 1
+        starts = [version] if version else index.roots(project)
+        print(f"🌳 {project}" + (f" from {version}" if version else "") + f" ({len(versions)} versions)")
+        # stack of (version, prefix for this line, prefix for its children, levels below start)
+        stack = [(v, "", "", 0) for v in reversed(starts)]
+        while stack:
+            v, line_prefix, child_prefix, level = stack.pop()
+            if v in starts and v != starts[0]:
+                print()  # blank line between root trees
+            print(f"{line_prefix}{v}{_describe(versions.get(v, {}))}")
+            kids = index.children(project, v)
+            if not kids:
+                continue
+            if max_depth is not None and level >= max_depth:
+                print(f"{child_prefix}… {len(index.descendants(project, v))} more")
+                continue
+            if len(kids) == 1:
+                stack.append((kids[0], child_prefix, child_prefix, level + 1))
+                continue
+            for n, kid in enumerate(reversed(kids)):
+                last = n == 0
+                stack.append((kid, child_prefix + ("└── " if last else "├── "),
+                              child_prefix + ("    " if last else "│   "), level + 1))
+    finally:
+        index.close()
+    return 0
+
+
+def show_lineage(project: str, version: str, descendants: bool = False, lca_with: Optional[str] = None) -> int:
+    index = _open(project)
+    if index is None:
+        return 1
+    try:
+        for v in [version] + ([lca_with] if lca_with else []):
+            if index.depth(project, v) is None:
+                print(f"❌ Version '{v}' not found in '{project}'.")
+                return 1
+        if lca_with:
+            common = index.lca(project, version, lca_with)
+            if common:
+                print(f"🧬 Common ancestor of {version} and {lca_with}: {common}")
+            else:
+                print(f"ℹ️ {version} and {lca_with} have no common ancestor.")
+            return 0
+        if descendants:
+            found = index.descendants(project, version)
+            print(f"🧬 {len(found)} descendants of {version}: {', '.join(found) if found else '-'}")
+        else:
+            found = index.ancestors(project, version)
+            print(f"🧬 {version} (depth {index.depth(project, version)}) ← {' ← '.join(found) if found else 'root'}")
+    finally:
+        index.close()
+    return 0
+
+
+def merge_versions(project: str, ours: str, theirs: str, save_as: Optional[str] = None,
+                   description: str = "") -> int:
+    """
+    Three-way merge of two versions using their lowest common ancestor as
+    the base. Prints the result, or saves it as a new version copied from
+    `ours` with `merged_from` = `theirs`. Returns 1 if conflicts remain.
+    """
+    from .diffing import VersionReader
+
+    index = _open(project)
+    if index is None:
+        return 1
+    try:
+        for v in (ours, theirs):
+            if index.depth(project, v) is None:
+                print(f"❌ Version '{v}' not found in '{project}'.")
+                return 1
+        base_v = index.lca(project, ours, theirs)
+    finally:
+        index.close()
+
+    store = get_store()
+    with VersionReader(store.git_root(project)) as reader:
+        contents = {v: reader.read(store.get_version(project, v)) for v in filter(None, (base_v, ours, theirs))}
+    missing = [v for v, data in contents.items() if data is None]
+    if missing:
+        print(f"❌ Content not available for: {', '.join(missing)}")
+        return 1
+
+    def lines(v):
+        return contents[v].decode("utf-8", errors="replace").splitlines() if v else []
+
+    # the Version/Created header lines differ in every version; take ours so they never conflict
+    ours_lines = lines(ours)
+    header = {ln.split(":", 1)[0]: ln for ln in ours_lines[:6] if ln.startswith(("# Version:", "# Created:"))}
+
+    def aligned(v):
+        out = lines(v)
+        for i, ln in enumerate(out[:6]):
+            out[i] = header.get(ln.split(":", 1)[0], ln)
+        return out
+
+    merged, conflicts = merge3(aligned(base_v), ours_lines, aligned(theirs),
+                               labels=(ours, base_v or "(no common ancestor)", theirs))
+    text = "\n".join(merged) + "\n"
+    summary = (f"🔀 Merged {theirs} into {ours} (base {base_v or 'none'}): "
+               + (f"{conflicts} conflict(s)." if conflicts else "clean."))
+
+    if not save_as:
+        print(summary + "\n")
+        print(text, end="")
+        return 1 if conflicts else 0
+
+    from .core import add_version
+    msg = description or f"Merge {theirs} into {ours}"
+    code = add_version(project, save_as, msg, from_version=ours, inline_content=text, merged_from=theirs)
+    print(summary)
+    if conflicts:
+        print(f"⚠️ {save_as} contains conflict markers; resolve them before running it.")
+    return code or (1 if conflicts else 0)
+
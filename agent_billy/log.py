@@ -1,49 +1,369 @@
 from __future__ import annotations
+import bisect
+import gzip
+import json
 import os
+import re
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator
 
-from .utils import WORKSPACE, load_memory, save_memory
-from .git_ops import run_git, ensure_workspace_git
+from .utils import WORKSPACE, STATE_DIR, memory_lock, _atomic_write_json
+from .git_ops import ensure_workspace_git
+from . import commitq
+from .store import get_store
 
+LOGS_DIR = WORKSPACE / "logs"
+SEGMENT_BYTES = int(os.environ.get("BILLY_LOG_SEGMENT_BYTES", 256 * 1024))
+COMMIT_EVERY = int(os.environ.get("BILLY_LOG_COMMIT_EVERY", 10))        # entries per batched commit
+COMMIT_SECONDS = float(os.environ.get("BILLY_LOG_COMMIT_SECONDS", 300))  # max age of an uncommitted entry
 
-def _logfile_for_project(project: str) -> Path:
-    """Return the path to the project log file (docs/PROJECT_LOG.md)."""
-    docs_dir = WORKSPACE / "docs"
-    docs_dir.mkdir(exist_ok=True)
-    return docs_dir / f"{project.upper()}_LOG.md"
+# Project logs are stored as JSONL segments under logs/<project>/:
+#   <first-timestamp>.jsonl      the active segment (appended to)
+#   <first-timestamp>.jsonl.gz   rotated, compressed segments (immutable)
+#   index.json                   time index: per segment first/last timestamp,
+#                                entry count, plus the pending-commit batch
+# Entries are {"ts", "message"} in append order, so queries bisect the index
+# to the first segment that can match and, inside the active segment, bisect
+# the file by byte offset; nothing before --since is read.
+# docs/<PROJECT>_LOG.md is no longer written; `log <project> --markdown`
+# renders it on demand (a legacy file is imported into segments once).
 
 
+def _legacy_logfile(project: str) -> Path:
+    return WORKSPACE / "docs" / f"{project.upper()}_LOG.md"
+
+
+def _project_dir(project: str) -> Path:
+    """logs/<project>, or logs/ inside a sharded project's directory."""
+    shard = get_store().shard_dir(project)
+    return shard / "logs" if shard else LOGS_DIR / project
+
+
+def log_index_path(project: str) -> Path:
+    return _project_dir(project) / "index.json"
+
+
+def _lock(project: str):
+    # kept outside logs/ so directory commits never pick the lock file up
+    lock_dir = STATE_DIR / "logs"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    return memory_lock(lock_dir / project)
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Index
+
+def _load_index(project: str) -> Dict[str, Any]:
+    path = _project_dir(project) / "index.json"
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"segments": [], "pending": {"count": 0, "since": None, "first": None, "last": None}}
+
+
+def _save_index(project: str, index: Dict[str, Any]) -> None:
+    _atomic_write_json(_project_dir(project) / "index.json", index)
+
+
+def _rotate(project: str, index: Dict[str, Any]) -> None:
+    """Compress the active segment; the next append starts a new one."""
+    seg = index["segments"][-1]
+    src = _project_dir(project) / seg["file"]
+    dst = src.with_name(src.name + ".gz")
+    with src.open("rb") as f_in, gzip.open(dst, "wb") as f_out:
+        f_out.writelines(f_in)
+    src.unlink()
+    seg["file"] = dst.name
+
+
+def _append(project: str, entries: List[Dict[str, Any]], index: Dict[str, Any]) -> None:
+    """Append entries (caller holds the lock), rotating at SEGMENT_BYTES."""
+    pdir = _project_dir(project)
+    for entry in entries:
+        segs = index["segments"]
+        if not segs or segs[-1]["file"].endswith(".gz"):
+            stamp, n = entry["ts"].replace(":", ""), 0
+            taken = {seg["file"].removesuffix(".gz") for seg in segs}
+            while (name := f"{stamp}{f'-{n}' if n else ''}.jsonl") in taken:
+                n += 1  # several segments started within the same second
+            segs.append({"file": name, "first": entry["ts"], "last": entry["ts"], "count": 0, "bytes": 0})
+        seg = segs[-1]
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with (pdir / seg["file"]).open("ab") as f:
+            f.write(line)
+        seg["last"] = max(seg["last"], entry["ts"])
+        seg["count"] += 1
+        seg["bytes"] += len(line)
+        if seg["bytes"] >= SEGMENT_BYTES:
+            _rotate(project, index)
+
+
+def _import_legacy(project: str) -> Dict[str, Any]:
+    """First use: move docs/<PROJECT>_LOG.md entries into segments (the markdown file is left as is)."""
+    index = _load_index(project)
+    legacy = _legacy_logfile(project)
+    if index["segments"] or index.get("legacy_imported") or not legacy.exists():
+        return index
+    entries = []
+    for line in legacy.read_text(encoding="utf-8").splitlines():
+        m = re.match(r"- \[(\S+)\] (.*)", line)
+        if m:
+            entries.append({"ts": m.group(1), "message": m.group(2)})
+        elif entries and line.strip():
+            entries[-1]["message"] += "\n" + line  # multi-line entry continuation
+    _append(project, entries, index)
+    index["legacy_imported"] = legacy.relative_to(WORKSPACE).as_posix()
+    _save_index(project, index)
+    return index
+
+
+def _open_index(project: str) -> Dict[str, Any]:
+    _project_dir(project).mkdir(parents=True, exist_ok=True)
+    with _lock(project):
+        return _import_legacy(project)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Writing
+
 def append_log(project: str, message: str, commit: bool = False) -> int:
     """
     Append a log entry for a project.
-    
-    If commit=True, also git-add and git-commit the log file.
+
+    With commit=True the entry joins the pending batch, which is committed
+    once it holds BILLY_LOG_COMMIT_EVERY entries or its oldest entry is
+    BILLY_LOG_COMMIT_SECONDS old; the age is checked on every later append
+    or query of the log (`log <project> --flush` commits it now).
     """
-    memory = load_memory()
-    if project not in memory["projects"]:
+    proj_meta = get_store().get_project(project)
+    if proj_meta is None:
         print(f"❌ Project '{project}' not found in memory.json.")
         return 1
 
-    log_path = _logfile_for_project(project)
-    timestamp = datetime.now().isoformat(timespec="seconds")
-    entry = f"- [{timestamp}] {message}\n"
-
-    if not log_path.exists():
-        header = f"# {project} Log\n\n"
-        log_path.write_text(header + entry, encoding="utf-8")
-    else:
-        with log_path.open("a", encoding="utf-8") as f:
-            f.write(entry)
-
-    print(f"📝 Log updated: {log_path}")
-    if commit:
-        proj_meta = memory["projects"][project]
-        if proj_meta.get("git_enabled") and ensure_workspace_git(verbose=False):
-            run_git(["add", str(log_path)])
-            run_git(["commit", "-m", f"{project} log: {message}"])
-            print("✅ Log committed to Git.")
-        else:
+    root = get_store().git_root(project)
+    can_commit = commit and proj_meta.get("git_enabled") and ensure_workspace_git(verbose=False, root=root)
+    _open_index(project)
+    entry = {"ts": _now(), "message": message}
+    with _lock(project):
+        index = _load_index(project)
+        _append(project, [entry], index)
+        pending = index["pending"]
+        if can_commit:
+            pending["count"] += 1
+            pending["since"] = pending["since"] or time.time()
+            pending["first"] = pending["first"] or message
+            pending["last"] = message
+        _save_index(project, index)
+
+    print(f"📝 Log updated: {_project_dir(project).relative_to(WORKSPACE)} ({entry['ts']})")
+    if commit and not can_commit:
+        print("⚠️ Git not enabled for this project, skipping commit.")
+    if _due(pending):
+        return flush_commits(project)
+    if can_commit:
+        print(f"🕒 Commit batched ({pending['count']}/{COMMIT_EVERY} entries pending).")
+    return 0
+
+
+def _due(pending: Dict[str, Any]) -> bool:
+    return bool(pending["count"]) and (
+        pending["count"] >= COMMIT_EVERY or time.time() - pending["since"] >= COMMIT_SECONDS)
+
+
+def flush_due(project: str) -> int:
+    """Commit the pending batch if it is full or old enough; a no-op otherwise."""
+    path = log_index_path(project)
+    if not path.exists() or not _due(_load_index(project)["pending"]):
+        return 0
+    return flush_commits(project)
+
+
+def flush_commits(project: str) -> int:
+    """Commit the pending log batch in one commit."""
+    proj_meta = get_store().get_project(project)
+    if proj_meta is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    with _lock(project):
+        index = _load_index(project)
+        pending = index["pending"]
+        if not pending["count"]:
+            print("ℹ️ No pending log entries to commit.")
+            return 0
+        root = get_store().git_root(project)
+        if not (proj_meta.get("git_enabled") and ensure_workspace_git(verbose=False, root=root)):
             print("⚠️ Git not enabled for this project, skipping commit.")
+            return 0
+        n, first, last = pending["count"], pending["first"], pending["last"]
+        # the committed index.json must not list the batch as pending, so reset it first
+        index["pending"] = {"count": 0, "since": None, "first": None, "last": None}
+        _save_index(project, index)
+        # the whole directory, so rotated-away segments are committed as deletions
+        paths = [_project_dir(project).relative_to(WORKSPACE).as_posix()]
+        msg = f"{project} log: {first}" if n == 1 else f"{project} log: {n} entries ({first} … {last})"
+        commit, queued = commitq.submit(root, paths, msg)
+        if not commit and not queued:
+            index["pending"] = pending  # keep the batch for the next flush
+            _save_index(project, index)
+            print("⚠️ Log commit failed; the batch stays pending.")
+            return 1
+    print(f"✅ Log {'commit queued' if queued else 'committed to Git'} ({n} {'entry' if n == 1 else 'entries'}).")
+    return 0
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Reading
+
+def _ts(line: bytes) -> str:
+    return json.loads(line)["ts"]
+
+
+def _seek_plain(path: Path, since: Optional[str]) -> Iterator[Dict[str, Any]]:
+    """Entries of an uncompressed segment from the first one at/after `since` (byte-offset bisection)."""
+    with path.open("rb") as f:
+        def line_start(pos: int) -> int:
+            if pos == 0:
+                return 0
+            f.seek(pos - 1)
+            f.readline()
+            return f.tell()
+
+        if since:
+            lo, hi = 0, os.fstat(f.fileno()).st_size
+            while lo < hi:  # smallest offset whose next line is at/after `since`
+                mid = (lo + hi) // 2
+                f.seek(line_start(mid))
+                line = f.readline()
+                if not line or _ts(line) >= since:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            f.seek(line_start(lo))
+        for line in f:
+            yield json.loads(line)
+
+
+def _after(ts: str, until: Optional[str]) -> bool:
+    """`until` is an inclusive prefix, as in `list --until`: 2025-06 covers all of June."""
+    return bool(until) and ts[:len(until)] > until
+
+
+def iter_entries(project: str, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Log entries with since <= ts and ts up to the `until` prefix, oldest first."""
+    index = _open_index(project)
+    segs = index["segments"]
+    start = bisect.bisect_left([s["last"] for s in segs], since) if since else 0
+    for seg in segs[start:]:
+        if _after(seg["first"], until):
+            break
+        path = _project_dir(project) / seg["file"]
+        if seg["file"].endswith(".gz"):
+            with gzip.open(path, "rb") as f:
+                entries = (json.loads(line) for line in f)
+                entries = (e for e in entries if not since or e["ts"] >= since)
+                yield from _until(entries, until)
+        else:
+            yield from _until(_seek_plain(path, since), until)
+
+
+def _until(entries: Iterator[Dict[str, Any]], until: Optional[str]) -> Iterator[Dict[str, Any]]:
+    for e in entries:
+        if _after(e["ts"], until):
+            return
+        yield e
+
+
+_ISO_PREFIX = re.compile(r"\d{4}(-\d{2}(-\d{2}([T ]\d{2}(:\d{2}(:\d{2})?)?)?)?)?")
+
+
+def parse_when(value: Optional[str]) -> Optional[str]:
+    """
+    A relative age like 30m, 2h, 7d (returned as an ISO timestamp), or an
+    ISO date/time prefix such as 2025-06 or 2025-06-01T10, kept as a prefix
+    so that `--until 2025-06-01` includes the whole day, as `list` does.
+    """
+    if not value:
+        return None
+    m = re.fullmatch(r"(\d+)([smhdw])", value)
+    if m:
+        unit = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}[m.group(2)]
+        return (datetime.now() - timedelta(**{unit: int(m.group(1))})).isoformat(timespec="seconds")
+    if _ISO_PREFIX.fullmatch(value):
+        return value.replace(" ", "T")
+    return datetime.fromisoformat(value).isoformat(timespec="seconds")
+
+
+def format_entry(entry: Dict[str, Any]) -> str:
+    return f"- [{entry['ts']}] {entry['message']}"
+
+
+def render_markdown(project: str, since: Optional[str] = None, until: Optional[str] = None,
+                    tail: Optional[int] = None, grep: Optional[re.Pattern] = None) -> Iterator[str]:
+    """The classic `# <project> Log` markdown view, rendered from the segments."""
+    yield f"# {project} Log"
+    yield ""
+    entries = iter_entries(project, since, until)
+    if grep:
+        entries = (e for e in entries if grep.search(e["message"]))
+    if tail:
+        from collections import deque
+        entries = deque(entries, maxlen=tail)
+    yield from (format_entry(e) for e in entries)
+
+
+def log_stats(project: str) -> Dict[str, Any]:
+    index = _open_index(project)
+    segs = index["segments"]
+    return {
+        "entries": sum(s["count"] for s in segs),
+        "segments": len(segs),
+        "first": segs[0]["first"] if segs else None,
+        "last": segs[-1]["last"] if segs else None,
+        "pending": index["pending"]["count"],
+    }
+
+
+def query_log(project: str, since: Optional[str] = None, until: Optional[str] = None,
+              grep: Optional[str] = None, markdown: bool = False, output: Optional[str] = None) -> int:
+    """CLI `log <project>` without a message: print (or render) the matching entries."""
+    if get_store().get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    try:
+        since, until = parse_when(since), parse_when(until)
+    except ValueError:
+        print("❌ Cannot parse --since/--until (use an ISO date/time like 2025-06-01T10:00 or an age like 2h, 7d).")
+        return 1
+    try:
+        pattern = re.compile(grep) if grep else None
+    except re.error as e:
+        print(f"❌ Invalid --grep pattern {grep!r}: {e}")
+        return 1
+    flush_due(project)
+    if markdown or output:
+        lines = render_markdown(project, since, until, grep=pattern)
+        if output:
+            path = Path(output)
+            with path.open("w", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(line + "\n")
+            print(f"📄 Log rendered to {path}")
+        else:
+            for line in lines:
+                print(line)
+        return 0
 
+    shown = 0
+    for entry in iter_entries(project, since, until):
+        if pattern and not pattern.search(entry["message"]):
+            continue
+        print(format_entry(entry))
+        shown += 1
+    if not shown:
+        print("ℹ️ No matching log entries.")
     return 0
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from .utils import STATE_DIR, now_iso, version_key, latest_version
+from .store import get_store
+from .runlog import run_logged, log_replay, RUNS_DIR
+from .blobstore import materialize
+from . import runcache, envs
+from .sandbox import resolve_limits, cold_launcher, describe_exit, WarmPool, warm_pool_available
+
+DEFAULT_REPORT = STATE_DIR / "test_matrix.json"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Selection
+
+def select_runs(projects: Optional[List[str]], versions: Optional[List[str]],
+                latest_only: bool) -> List[Dict[str, Any]]:
+    """Expand project/version selectors into (project, version, filename) jobs in natural order."""
+    store = get_store()
+    names = projects or store.project_names()
+    jobs = []
+    for name in names:
+        if store.get_project(name) is None:
+            print(f"⚠️ Project '{name}' not found, skipping.")
+            continue
+        vers = store.versions(name)
+        if latest_only:
+            chosen = [latest_version(vers)] if vers else []
+        elif versions:
+            chosen = [v for v in versions if v in vers]
+        else:
+            chosen = sorted(vers, key=version_key)
+        for v in chosen:
+            jobs.append({"project": name, "version": v, "filename": vers[v]["filename"], "meta": vers[v]})
+    return jobs
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Execution
+
+def _run_one(job: Dict[str, Any], limits: Dict[str, Any], launcher, use_cache: bool) -> Dict[str, Any]:
+    file_abs = materialize(job["meta"])
+    if not file_abs.exists() or job.get("env_error"):
+        result = {
+            "project": job["project"],
+            "version": job["version"],
+            "filename": job["filename"],
+            "started_at": now_iso(),
+            "status": "missing",
+            "exit_code": None,
+            "wall_s": 0.0,
+        }
+        if file_abs.exists():
+            result["status"] = "fail"
+            result["output_tail"] = f"dependency env: {job['env_error']}"
+        return result
+
+    key = runcache.cache_key(job["meta"], file_abs, limits, job["python"]) if use_cache else None
+    cached = runcache.lookup(key) if key else None
+    if cached:
+        replay_start = time.perf_counter()
+        rec = {**log_replay(job["project"], job["version"], cached), "start_ms": 0.0, "tail": []}
+        saved_s = runcache.saved(cached, time.perf_counter() - replay_start)
+    else:
+        rec = run_logged(job["project"], job["version"], [job["python"], str(file_abs)],
+                         echo=False, timeout=limits["timeout"], launcher=launcher)
+        if key:
+            runcache.save(key, rec, RUNS_DIR / job["project"] / rec["log"])
+    if rec["timed_out"]:
+        status = "timeout"
+    else:
+        status = "ok" if rec["exit_code"] == 0 else "fail"
+    result = {
+        **{k: v for k, v in job.items() if k not in ("meta", "python")},
+        "started_at": rec["started_at"],
+        "status": status,
+        "exit_code": None if rec["timed_out"] else rec["exit_code"],
+        "wall_s": rec["duration_s"],
+        "cpu_s": rec["cpu_s"],
+        "peak_rss_kb": rec["peak_rss_kb"],
+        "start_ms": rec["start_ms"],
+        "log": rec["log"],
+    }
+    if key:
+        result["cached"] = bool(cached)
+        result["saved_s"] = saved_s if cached else 0.0
+    if rec["exit_code"] is not None and rec["exit_code"] < 0 and not rec["timed_out"]:
+        result["signal"] = describe_exit(rec["exit_code"])
+    if status != "ok" and not cached:
+        result["output_tail"] = "\n".join(rec["tail"])
+    return result
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    icons = {"ok": "✅", "fail": "❌", "timeout": "⏱️", "missing": "⚠️"}
+    w_proj = max([len("project")] + [len(r["project"]) for r in results])
+    w_ver = max([len("version")] + [len(r["version"]) for r in results])
+    print(f"   {'project':<{w_proj}}  {'version':<{w_ver}}  {'status':<8} {'exit':>4}  {'wall_s':>8}")
+    for r in results:
+        code = "" if r["exit_code"] is None else str(r["exit_code"])
+        print(f"{icons.get(r['status'], '?')} {r['project']:<{w_proj}}  {r['version']:<{w_ver}}  "
+              f"{r['status']:<8} {code:>4}  {r['wall_s']:>8.3f}")
+
+
+def run_matrix(
+    projects: Optional[List[str]] = None,
+    versions: Optional[List[str]] = None,
+    latest_only: bool = False,
+    jobs: Optional[int] = None,
+    timeout: Optional[float] = 60.0,
+    report: Optional[str] = None,
+    cpu_s: Optional[int] = None,
+    memory_mb: Optional[int] = None,
+    warm: bool = False,
+    no_cache: bool = False,
+) -> int:
+    """
+    Run every selected version of every selected project in a bounded worker
+    pool (one child interpreter per run, at most `jobs` at once, each logged
+    like `run`), then stamp `last_run` for all of them in one metadata write
+    per project. Runs are sandboxed (process group, rlimits, timeout);
+    with `warm` they are forked from a pre-started interpreter instead.
+    """
+    selected = select_runs(projects, versions, latest_only)
+    if not selected:
+        print("ℹ️ Nothing to run.")
+        return 0
+
+    workers = jobs or os.cpu_count() or 1
+    limits = resolve_limits(timeout, cpu_s, memory_mb)
+    warm_pool = WarmPool() if warm and warm_pool_available() else None
+    launcher = warm_pool.launcher(limits) if warm_pool else cold_launcher(limits)
+    print(f"🧪 Test matrix: {len(selected)} runs, {workers} workers, timeout={limits['timeout']}s"
+          f"{', warm pool' if warm_pool else ''}")
+    # dependency envs are resolved (and built) up front, not by racing workers
+    for job in selected:
+        try:
+            job["python"] = envs.interpreter(job["meta"])
+        except envs.EnvError as e:
+            job["env_error"] = str(e)
+    store = get_store()
+    cached_projects = {j["project"] for j in selected if runcache.enabled(store.get_project(j["project"]), no_cache)}
+    start = time.perf_counter()
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_one, job, limits, launcher, job["project"] in cached_projects)
+                       for job in selected]
+            for fut in as_completed(futures):
+                results.append(fut.result())
+    finally:
+        if warm_pool:
+            warm_pool.close()
+    wall = time.perf_counter() - start
+
+    results.sort(key=lambda r: (r["project"], version_key(r["version"])))
+
+    # batch the last_run stamps: one write per project instead of one per run; cache
+    # counters are bumped on the stored values inside that write, not on the job's copy
+    stamps: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    bumps: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        if r["status"] == "missing":
+            continue
+        if "cached" in r:
+            bumps.setdefault(r["project"], {})[r["version"]] = (
+                lambda m, r=r: runcache.record_outcome(m, r["started_at"], hit=r["cached"], saved_s=r["saved_s"]))
+        else:
+            stamps.setdefault(r["project"], {})[r["version"]] = {"last_run": r["started_at"]}
+    for project, updates in stamps.items():
+        store.update_versions(project, updates)
+    for project, mutators in bumps.items():
+        store.modify_versions(project, mutators)
+
+    _print_table(results)
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("ok", "fail", "timeout", "missing")}
+    serial = sum(r["wall_s"] for r in results)
+    print(f"📊 {counts['ok']} ok, {counts['fail']} failed, {counts['timeout']} timed out, "
+          f"{counts['missing']} missing — wall {wall:.2f}s (serial {serial:.2f}s)")
+    if warm_pool:
+        print(warm_pool.summary())
+    hits = [r for r in results if r.get("cached")]
+    if hits:
+        print(f"🗃️ Run cache: {len(hits)}/{sum(1 for r in results if 'cached' in r)} replayed, "
+              f"~{sum(r['saved_s'] for r in hits):.2f}s saved")
+
+    out_path = Path(report) if report else DEFAULT_REPORT
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps({
+        "generated_at": now_iso(),
+        "workers": workers,
+        "limits": limits,
+        "warm_start_saved_s": round(warm_pool.saved_s(), 3) if warm_pool else None,
+        "wall_s": round(wall, 3),
+        "serial_s": round(serial, 3),
+        "counts": counts,
+        "runs": results,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"📄 Report written to {out_path}")
+    return 0 if counts["ok"] == len(results) else 1
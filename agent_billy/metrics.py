@@ -0,0 +1,280 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any
+
+# Lightweight tracing for CLI commands.
+#
+# Code marks phases with `span("git")`, `span("store.load")`, ... and
+# bumps counters with `add("bytes_read", n)`. Both are no-ops apart from a
+# clock read and a dict update. cli.dispatch wraps each command in
+# begin()/finish(), which records the invocation in two places:
+#
+#   .billy/metrics.prom    Prometheus text exposition, cumulative across
+#                          invocations (point node_exporter's textfile
+#                          collector at .billy/, or just cat it):
+#       billy_command_seconds_bucket{command="list",le="0.01"} 17
+#       billy_phase_seconds_bucket{command="list",phase="git",le="0.005"} 9
+#       billy_commands_total{command="list",exit="0"} 20
+#       billy_git_calls_total{command="list"} 31
+#       billy_bytes_read_total{command="list"} 409600
+#   .billy/metrics.jsonl   one raw event per invocation, the source of the
+#                          p50/p95 percentiles `stats` prints:
+#       {"ts": 1760770000123, "command": "list", "exit": 0, "seconds": 0.004213,
+#        "phases": {"store.load": [0.00102, 1], "git": [0.0031, 2]},
+#        "counters": {"bytes_read": 20480, "bytes_written": 0}}
+#
+# The running totals behind metrics.prom live in metrics.state.json and are
+# updated under a lock, so concurrent commands never lose an increment. The
+# JSONL log rolls over to metrics.jsonl.1 at BILLY_METRICS_MAX_BYTES.
+# BILLY_METRICS=0 turns recording off (benchmarks do). BILLY_PROFILE=1 (or
+# a comma list of command names) also dumps a cProfile of the command to
+# .billy/profiles/.
+
+ENABLED = os.environ.get("BILLY_METRICS", "1") != "0"
+MAX_BYTES = int(os.environ.get("BILLY_METRICS_MAX_BYTES", 2 * 1024 * 1024))
+COUNTERS = ("bytes_read", "bytes_written")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_phases: Dict[str, List[float]] = {}   # phase -> [seconds, calls]
+_counters: Dict[str, int] = {}
+_started: Optional[float] = None
+
+
+def metrics_path():
+    from .utils import STATE_DIR
+    return STATE_DIR / "metrics.jsonl"
+
+
+def exposition_path():
+    from .utils import STATE_DIR
+    return STATE_DIR / "metrics.prom"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Recording
+
+@contextmanager
+def span(phase: str):
+    """Time a phase of the current command (nesting is allowed; each level is counted)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            slot = _phases.setdefault(phase, [0.0, 0])
+            slot[0] += elapsed
+            slot[1] += 1
+
+
+def add(counter: str, n: int = 1) -> None:
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0) + n
+
+
+def begin() -> None:
+    global _started
+    with _lock:
+        _phases.clear()
+        _counters.clear()
+    _started = time.perf_counter()
+
+
+def finish(command: str, exit_code: int) -> None:
+    """Record this invocation: append its raw event and fold it into the exposition file."""
+    if not ENABLED or _started is None:
+        return
+    total = time.perf_counter() - _started
+    with _lock:
+        phases = {k: [round(v[0], 6), v[1]] for k, v in sorted(_phases.items())}
+        counters = {name: _counters.get(name, 0) for name in COUNTERS}
+    event = {"ts": int(time.time() * 1000), "command": command, "exit": exit_code,
+             "seconds": round(total, 6), "phases": phases, "counters": counters}
+
+    path = metrics_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size > MAX_BYTES:
+            os.replace(path, path.with_name(path.name + ".1"))
+        # one short O_APPEND write per event, so concurrent commands never interleave lines
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(event, separators=(",", ":")) + "\n")
+        _accumulate(event)
+    except (OSError, ValueError, TimeoutError):
+        pass  # metrics must never fail a command
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Prometheus exposition
+
+def _observe(hist: Dict[str, Any], seconds: float) -> None:
+    counts = hist.setdefault("buckets", [0] * len(BUCKETS))
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            counts[i] += 1
+    hist["sum"] = hist.get("sum", 0.0) + seconds
+    hist["count"] = hist.get("count", 0) + 1
+
+
+def _accumulate(event: Dict[str, Any]) -> None:
+    """Add one event to the running totals (locked read-modify-write) and re-render metrics.prom."""
+    from .utils import memory_lock
+
+    state_path = exposition_path().with_name("metrics.state.json")
+    with memory_lock(state_path, timeout=2.0):
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            state = {}
+        cmd = state.setdefault("commands", {}).setdefault(event["command"], {})
+        _observe(cmd.setdefault("seconds", {}), event["seconds"])
+        exits = cmd.setdefault("exits", {})
+        exits[str(event["exit"])] = exits.get(str(event["exit"]), 0) + 1
+        for phase, (seconds, calls) in event["phases"].items():
+            slot = cmd.setdefault("phases", {}).setdefault(phase, {"calls": 0})
+            _observe(slot, seconds)
+            slot["calls"] += calls
+        totals = cmd.setdefault("counters", {})
+        for name, n in event["counters"].items():
+            totals[name] = totals.get(name, 0) + n
+        _replace(state_path, json.dumps(state, separators=(",", ":")))
+        _replace(exposition_path(), "\n".join(render_exposition(state)) + "\n")
+
+
+def _replace(path, text: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _histogram(name: str, labels: str, hist: Dict[str, Any]) -> List[str]:
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {n}' for bound, n in zip(BUCKETS, hist["buckets"])]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+    lines.append(f"{name}_sum{{{labels}}} {hist['sum']:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist['count']}")
+    return lines
+
+
+def render_exposition(state: Dict[str, Any]) -> List[str]:
+    """Prometheus text format (version 0.0.4) lines for the accumulated state."""
+    commands = sorted(state.get("commands", {}).items())
+    lines = ["# HELP billy_command_seconds Wall-clock duration of billy CLI commands.",
+             "# TYPE billy_command_seconds histogram"]
+    for command, cmd in commands:
+        lines += _histogram("billy_command_seconds", f'command="{command}"', cmd["seconds"])
+    lines += ["# HELP billy_phase_seconds Time spent in each traced phase, per command invocation.",
+              "# TYPE billy_phase_seconds histogram"]
+    for command, cmd in commands:
+        for phase, hist in sorted(cmd.get("phases", {}).items()):
+            lines += _histogram("billy_phase_seconds", f'command="{command}",phase="{phase}"', hist)
+    lines += ["# HELP billy_commands_total Invocations by command and exit code.",
+              "# TYPE billy_commands_total counter"]
+    for command, cmd in commands:
+        lines += [f'billy_commands_total{{command="{command}",exit="{code}"}} {n}'
+                  for code, n in sorted(cmd["exits"].items())]
+    lines += ["# HELP billy_git_calls_total git subprocess calls.", "# TYPE billy_git_calls_total counter"]
+    for command, cmd in commands:
+        lines.append(f'billy_git_calls_total{{command="{command}"}} '
+                     f'{cmd.get("phases", {}).get("git", {}).get("calls", 0)}')
+    for name in COUNTERS:
+        lines += [f"# HELP billy_{name}_total Metadata and file {name.replace('_', ' ')}.",
+                  f"# TYPE billy_{name}_total counter"]
+        for command, cmd in commands:
+            lines.append(f'billy_{name}_total{{command="{command}"}} {cmd.get("counters", {}).get(name, 0)}')
+    return lines
+
+
+def profile_wanted(command: str) -> bool:
+    value = os.environ.get("BILLY_PROFILE", "")
+    if value in ("", "0"):
+        return False
+    return value in ("1", "all") or command in value.split(",")
+
+
+def run_profiled(command: str, func, *args):
+    """Run func(*args) under cProfile and dump the stats to .billy/profiles/."""
+    import cProfile
+    import sys
+    from .utils import STATE_DIR
+
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func, *args)
+    finally:
+        out = STATE_DIR / "profiles" / f"{command}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        prof.dump_stats(str(out))
+        print(f"🧪 Profile written to {out} (python -m pstats {out})", file=sys.stderr)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `stats`
+
+def read_samples() -> List[Dict[str, Any]]:
+    """Invocations from the metrics log, oldest first: {command, exit, ts, seconds, phases, counters}."""
+    path = metrics_path()
+    runs: List[Dict[str, Any]] = []
+    for p in (path.with_name(path.name + ".1"), path):
+        if not p.exists():
+            continue
+        with p.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+    return sorted(runs, key=lambda r: r["ts"])
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def show_stats(command: Optional[str] = None, last: int = 500, phases: bool = False) -> int:
+    samples = [s for s in read_samples() if not command or s["command"] == command][-last:]
+    if not samples:
+        print("ℹ️ No metrics recorded yet" + ("" if not command else f" for '{command}'")
+              + ("." if ENABLED else " (recording is off: BILLY_METRICS=0)."))
+        return 0
+
+    by_cmd: Dict[str, List[Dict[str, Any]]] = {}
+    for s in samples:
+        by_cmd.setdefault(s["command"], []).append(s)
+    print(f"📊 Command latency over the last {len(samples)} invocations ({metrics_path()}):")
+    print(f"   {'command':<16} {'runs':>5} {'p50':>9} {'p95':>9} {'max':>9} {'git':>5} {'read':>9} {'written':>9}")
+    for cmd, runs in sorted(by_cmd.items(), key=lambda kv: -len(kv[1])):
+        secs = [r["seconds"] for r in runs]
+        git = sum(r["phases"].get("git", [0, 0])[1] for r in runs) / len(runs)
+        read = sum(r["counters"].get("bytes_read", 0) for r in runs) / len(runs)
+        written = sum(r["counters"].get("bytes_written", 0) for r in runs) / len(runs)
+        print(f"   {cmd:<16} {len(runs):>5} {_ms(percentile(secs, 50))} {_ms(percentile(secs, 95))} "
+              f"{_ms(max(secs))} {git:>5.1f} {_size(read):>9} {_size(written):>9}")
+        if phases:
+            totals: Dict[str, float] = {}
+            for r in runs:
+                for phase, (seconds, _) in r["phases"].items():
+                    totals[phase] = totals.get(phase, 0.0) + seconds
+            wall = sum(secs) or 1.0
+            totals["other (imports, output)"] = max(0.0, wall - sum(totals.values()))
+            for phase, seconds in sorted(totals.items(), key=lambda kv: -kv[1]):
+                print(f"      {phase:<24} {_ms(seconds / len(runs))} avg  {100 * seconds / wall:5.1f}%")
+    print("   (git = subprocess calls per run; read/written = metadata and file bytes per run)")
+    print(f"   Cumulative Prometheus metrics: {exposition_path()}")
+    return 0
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:>7.1f}ms"
+
+
+def _size(n: float) -> str:
+    if n < 1024:
+        return f"{n:.0f}B"
+    return f"{n / 1024:.1f}KiB" if n < 1024 * 1024 else f"{n / 1024 / 1024:.1f}MiB"
@@ -0,0 +1,213 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from .utils import WORKSPACE, STATE_DIR
+
+CACHE_DIR = STATE_DIR / "runcache"
+MAX_BYTES = int(os.environ.get("BILLY_RUNCACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Opt-in result cache for `run` (per project: `run-cache <project> --enable`).
+#
+# A run is keyed on the version file's content hash, the interpreter, the
+# environment and the declared `dependencies`; a hit replays the recorded
+# exit code and output instead of executing. Entries are
+#   runcache/<2 hex>/<key>.json     exit code, timings, stats
+#   runcache/<2 hex>/<key>.log.gz   the captured output (same format as run logs)
+# and are evicted least-recently-used (file mtime, touched on every hit)
+# once the cache grows past BILLY_RUNCACHE_MAX_BYTES.
+
+# Variables that change between shells without changing what a script does
+VOLATILE_ENV = {
+    "_", "PWD", "OLDPWD", "SHLVL", "TERM", "TERM_PROGRAM", "TERM_PROGRAM_VERSION", "COLORTERM",
+    "COLUMNS", "LINES", "DISPLAY", "WINDOWID", "TMUX", "TMUX_PANE", "STY", "SSH_AUTH_SOCK",
+    "SSH_CLIENT", "SSH_CONNECTION", "SSH_TTY", "BILLY_DAEMON", "BILLY_GIT_BACKEND",
+}
+
+
+def enabled(project_meta: Optional[Dict[str, Any]], no_cache: bool = False) -> bool:
+    return bool(project_meta and project_meta.get("run_cache")) and not no_cache
+
+
+def _dependency_fingerprint(dep: str) -> str:
+    """Content hash for workspace files, installed version for distributions, else the name."""
+    path = WORKSPACE / dep
+    if path.is_file():
+        return "file:" + hashlib.sha256(path.read_bytes()).hexdigest()
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        try:
+            return f"dist:{version(dep)}"
+        except PackageNotFoundError:
+            pass
+    except ImportError:
+        pass
+    return f"name:{dep}"
+
+
+def cache_key(meta: Dict[str, Any], file_abs: Path, limits: Dict[str, Any],
+              python: Optional[str] = None) -> str:
+    env = {k: v for k, v in os.environ.items() if k not in VOLATILE_ENV}
+    parts = {
+        "content": hashlib.sha256(file_abs.read_bytes()).hexdigest(),
+        # a dependency env's path embeds the hash of its pinned wheels
+        "interpreter": [python or sys.executable, sys.version],
+        "env": sorted(env.items()),
+        "dependencies": [[d, _dependency_fingerprint(d)] for d in sorted(meta.get("dependencies") or [])],
+        # the wall-clock timeout is left out: runs that hit it are never cached
+        "limits": {k: v for k, v in limits.items() if k != "timeout"},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _paths(key: str):
+    base = CACHE_DIR / key[:2] / key
+    return base.with_suffix(".json"), base.with_suffix(".log.gz")
+
+
+def lookup(key: str) -> Optional[Dict[str, Any]]:
+    """Cached run record for `key` (marking it recently used), or None."""
+    meta_path, log_path = _paths(key)
+    try:
+        entry = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if not log_path.exists():
+        return None
+    now = time.time()
+    for p in (meta_path, log_path):
+        os.utime(p, (now, now))
+    return {**entry, "log_path": str(log_path)}
+
+
+def save(key: str, record: Dict[str, Any], run_log: Path) -> bool:
+    """Store a finished run. Timeouts, signal deaths and truncated logs are not cached."""
+    if record.get("timed_out") or record.get("truncated") or record["exit_code"] < 0 or not run_log.exists():
+        return False
+    meta_path, log_path = _paths(key)
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = log_path.with_suffix(f".{os.getpid()}.tmp")
+    shutil.copyfile(run_log, tmp)
+    os.replace(tmp, log_path)
+    entry = {k: record[k] for k in ("exit_code", "duration_s", "cpu_s", "peak_rss_kb", "log_bytes")}
+    entry["cached_at"] = record["started_at"]
+    tmp = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entry), encoding="utf-8")
+    os.replace(tmp, meta_path)
+    evict()
+    return True
+
+
+def _entries() -> List[Dict[str, Any]]:
+    out = []
+    for meta_path in CACHE_DIR.glob("??/*.json"):
+        log_path = meta_path.with_suffix(".log.gz")
+        try:
+            st = meta_path.stat()
+            size = st.st_size + (log_path.stat().st_size if log_path.exists() else 0)
+        except FileNotFoundError:  # evicted concurrently
+            continue
+        out.append({"meta": meta_path, "log": log_path, "size": size, "used": st.st_mtime})
+    return out
+
+
+def evict(max_bytes: int = MAX_BYTES) -> int:
+    """Drop least-recently-used entries until the cache fits in `max_bytes`; returns entries removed."""
+    entries = sorted(_entries(), key=lambda e: e["used"])
+    total = sum(e["size"] for e in entries)
+    removed = 0
+    for e in entries:
+        if total <= max_bytes:
+            break
+        e["meta"].unlink(missing_ok=True)
+        e["log"].unlink(missing_ok=True)
+        total -= e["size"]
+        removed += 1
+    return removed
+
+
+def replay(entry: Dict[str, Any]) -> None:
+    """Print a cached run's output the way it was produced (stderr lines back on stderr)."""
+    from .runlog import STDERR_PREFIX
+
+    prefix = STDERR_PREFIX.decode()
+    with gzip.open(entry["log_path"], "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith(prefix):
+                sys.stderr.write(line[len(prefix):])
+            else:
+                sys.stdout.write(line)
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+def count(stats: Optional[Dict[str, Any]], hit: bool, saved_s: float = 0.0) -> Dict[str, Any]:
+    """Updated per-version `run_cache` counters."""
+    stats = dict(stats or {"hits": 0, "misses": 0, "saved_s": 0.0})
+    stats["hits" if hit else "misses"] += 1
+    stats["saved_s"] = round(stats["saved_s"] + max(0.0, saved_s), 3)
+    return stats
+
+
+def saved(entry: Dict[str, Any], replay_s: float) -> float:
+    """Time a hit saved: the original run's duration minus what replaying it took."""
+    return max(0.0, entry["duration_s"] - replay_s)
+
+
+def record_outcome(meta: Dict[str, Any], last_run: str, hit: bool, saved_s: float = 0.0) -> Dict[str, Any]:
+    """
+    Stamp a run on version metadata and bump its counters in place. Pass it to
+    store.modify_versions so the increment happens on the stored counters inside
+    the write, not on a copy read before a (possibly long) run.
+    """
+    meta["last_run"] = last_run
+    meta["run_cache"] = count(meta.get("run_cache"), hit, saved_s)
+    return meta["run_cache"]
+
+
+def hit_rate(stats: Optional[Dict[str, Any]]) -> str:
+    if not stats:
+        return ""
+    total = stats["hits"] + stats["misses"]
+    return f"cache {stats['hits']}/{total} hits ({100 * stats['hits'] / total:.0f}%), saved {stats['saved_s']:.2f}s"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `run-cache`
+
+def manage(project: Optional[str] = None, enable: Optional[bool] = None, clear: bool = False) -> int:
+    from .store import get_store
+
+    store = get_store()
+    if project and store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    if enable is not None:
+        if not project:
+            print("❌ --enable/--disable need a project.")
+            return 1
+        store.update_project(project, run_cache=enable)
+        print(f"✅ Run cache {'enabled' if enable else 'disabled'} for '{project}'.")
+    if clear:
+        removed = evict(0)
+        print(f"🧹 Run cache cleared ({removed} entries).")
+
+    entries = _entries()
+    size = sum(e["size"] for e in entries)
+    print(f"🗃️ Run cache: {len(entries)} entries, {size / 1024:.1f} KiB of {MAX_BYTES / 1024 / 1024:.0f} MiB")
+    for name in ([project] if project else store.project_names()):
+        stats = [m["run_cache"] for m in store.versions(name).values() if m.get("run_cache")]
+        if not stats and not (store.get_project(name) or {}).get("run_cache"):
+            continue
+        total = {"hits": sum(s["hits"] for s in stats), "misses": sum(s["misses"] for s in stats),
+                 "saved_s": sum(s["saved_s"] for s in stats)}
+        state = "on" if (store.get_project(name) or {}).get("run_cache") else "off"
+        print(f" - {name} [{state}]: {hit_rate(total) if stats else 'no runs yet'}")
+    return 0
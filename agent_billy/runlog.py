@@ -0,0 +1,329 @@
+from __future__ import annotations
+import gzip
+import json
+import os
+import re
+import selectors
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Callable
+
+from .utils import WORKSPACE, STATE_DIR, now_iso, memory_lock
+from . import metrics
+
+RUNS_DIR = STATE_DIR / "runs"
+DEFAULT_MAX_BYTES = int(os.environ.get("BILLY_RUNLOG_MAX_BYTES", 1024 * 1024))  # per run, uncompressed
+DEFAULT_KEEP = int(os.environ.get("BILLY_RUNLOG_KEEP", 50))  # logs kept per project
+STDERR_PREFIX = b"[stderr] "
+
+# Layout:
+#   .billy/runs/<project>/<YYYYmmdd-HHMMSS-usec>-<version>-<pid>.log.gz   one gzip file per run
+#   .billy/runs/<project>/index.jsonl                                      one record per kept log
+# Each run is its own small gzip stream, so tailing or grepping recent runs
+# never decompresses anything but the runs asked for. Rotation drops the
+# index records of deleted logs too, so the index stays as small as the logs.
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Execution with tee-to-log
+
+def _echo(stream, chunk: bytes) -> None:
+    target = sys.stdout if stream == "out" else sys.stderr
+    buf = getattr(target, "buffer", None)
+    if buf is not None:
+        buf.write(chunk)
+    else:  # e.g. redirected to a StringIO
+        target.write(chunk.decode("utf-8", errors="replace"))
+    target.flush()
+
+
+def execute(
+    cmd: List[str],
+    log_path: Optional[Path],
+    echo: bool = True,
+    timeout: Optional[float] = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cwd: Path = WORKSPACE,
+    popen_kwargs: Optional[Dict[str, Any]] = None,
+    launcher: Optional[Callable[..., Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Run `cmd`, streaming stdout/stderr live (if `echo`) while writing them,
+    line by line, to a gzip log capped at `max_bytes`. Returns exit code,
+    duration, CPU time and peak RSS of the child.
+
+    The child runs in its own process group, which is killed as a whole on
+    timeout or interrupt. `launcher(cmd, cwd, popen_kwargs)` can replace the
+    default spawn (see sandbox.py); it returns a Popen-like object.
+    """
+    start = time.perf_counter()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    proc = (launcher or _popen)(cmd, cwd, popen_kwargs or {})
+    start_latency = time.perf_counter() - start
+
+    sel = selectors.DefaultSelector()
+    sel.register(proc.stdout, selectors.EVENT_READ, "out")
+    sel.register(proc.stderr, selectors.EVENT_READ, "err")
+    # when the main process exits, kill whatever it left running in its group;
+    # stragglers would otherwise hold the pipes open until they finish
+    pidfd = _open_pidfd(proc.pid)
+    if pidfd is not None:
+        sel.register(pidfd, selectors.EVENT_READ, "exit")
+    partial = {"out": b"", "err": b""}
+    tail: deque = deque(maxlen=20)
+    written = 0
+    truncated = timed_out = False
+
+    log = gzip.open(log_path, "wb") if log_path else None
+
+    def record_line(stream: str, line: bytes) -> None:
+        nonlocal written, truncated
+        line = (STDERR_PREFIX + line) if stream == "err" else line
+        tail.append(line.decode("utf-8", errors="replace").rstrip("\n"))
+        if log is None or truncated:
+            return
+        if written + len(line) > max_bytes:
+            log.write(b"[billy] log truncated at %d bytes\n" % written)
+            truncated = True
+            return
+        log.write(line)
+        written += len(line)
+
+    try:
+        while sel.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                _kill_group(proc)
+                break
+            for key, _ in sel.select(remaining):
+                stream = key.data
+                if stream == "exit":
+                    sel.unregister(pidfd)
+                    _kill_group(proc)
+                    continue
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    continue
+                if echo:
+                    _echo(stream, chunk)
+                data = partial[stream] + chunk
+                *lines, partial[stream] = data.split(b"\n")
+                for line in lines:
+                    record_line(stream, line + b"\n")
+        for stream, rest in partial.items():
+            if rest:
+                record_line(stream, rest + b"\n")
+        if timed_out and log is not None:
+            log.write(b"[billy] killed after %.1fs timeout\n" % timeout)
+    except BaseException:  # e.g. Ctrl-C: the child is in its own group and would not see it
+        _kill_group(proc)
+        raise
+    finally:
+        sel.close()
+        if pidfd is not None:
+            os.close(pidfd)
+        if log is not None:
+            log.close()
+
+    if hasattr(proc, "reap"):
+        status, usage = proc.reap()
+    else:
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    proc.stdout.close()
+    proc.stderr.close()
+
+    peak_rss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss  # → KiB
+    return {
+        "exit_code": proc.returncode,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        "peak_rss_kb": peak_rss,
+        "log_bytes": written,
+        "truncated": truncated,
+        "timed_out": timed_out,
+        "start_ms": round(start_latency * 1000, 2),
+        "tail": list(tail),
+    }
+
+
+def _popen(cmd: List[str], cwd: Path, popen_kwargs: Dict[str, Any]):
+    return subprocess.Popen(cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            **{"start_new_session": True, **popen_kwargs})
+
+
+def _open_pidfd(pid: int) -> Optional[int]:
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(pid)
+    except OSError:
+        return None
+
+
+def _kill_group(proc) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+def _new_log_path(project: str, version: str) -> Path:
+    run_dir = RUNS_DIR / project
+    run_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return run_dir / f"{stamp}-{version}-{os.getpid()}.log.gz"
+
+
+def _append_index(run_dir: Path, record: Dict[str, Any]) -> None:
+    index = run_dir / "index.jsonl"
+    with memory_lock(index, timeout=10):  # rotation rewrites the index; don't lose a concurrent append
+        with index.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        _rotate(run_dir)
+
+
+def run_logged(project: str, version: str, cmd: List[str], **kwargs: Any) -> Dict[str, Any]:
+    """execute() with a per-run log file, an index record and rotation of old logs."""
+    log_path = _new_log_path(project, version)
+    started_at = now_iso()
+    with metrics.span("run"):
+        result = execute(cmd, log_path, **kwargs)
+    record = {
+        "project": project,
+        "version": version,
+        "started_at": started_at,
+        **{k: v for k, v in result.items() if k != "tail"},
+        "log": log_path.name,
+    }
+    _append_index(log_path.parent, record)
+    return {**record, "tail": result["tail"]}
+
+
+def log_replay(project: str, version: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+    """Record a run served from the run cache (its log is copied so `runs --tail/--grep` see it)."""
+    log_path = _new_log_path(project, version)
+    shutil.copyfile(cached["log_path"], log_path)
+    record = {
+        "project": project,
+        "version": version,
+        "started_at": now_iso(),
+        **{k: cached[k] for k in ("exit_code", "duration_s", "cpu_s", "peak_rss_kb", "log_bytes")},
+        "truncated": False,
+        "timed_out": False,
+        "cached": True,
+        "log": log_path.name,
+    }
+    _append_index(log_path.parent, record)
+    return record
+
+
+def _rotate(run_dir: Path, keep: int = DEFAULT_KEEP) -> None:
+    """Delete all but the newest `keep` logs and the index records that point at them (caller holds the lock)."""
+    logs = sorted(run_dir.glob("*.log.gz"))
+    old = logs[:-keep] if keep > 0 else []
+    for path in old:
+        path.unlink(missing_ok=True)
+    if not old:
+        return
+    index = run_dir / "index.jsonl"
+    kept = {p.name for p in logs[-keep:]}
+    lines = [ln for ln in index.read_text(encoding="utf-8").splitlines()
+             if ln and json.loads(ln).get("log") in kept]
+    tmp = index.with_name(f".{index.name}.{os.getpid()}.tmp")
+    tmp.write_text("".join(ln + "\n" for ln in lines), encoding="utf-8")
+    os.replace(tmp, index)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Reading recent runs
+
+def _tail_lines(path: Path, n: int, block: int = 8192) -> List[str]:
+    """Last `n` lines of a text file, read backwards in blocks."""
+    if not path.exists() or n <= 0:
+        return []
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return [ln.decode("utf-8") for ln in data.splitlines()[-n:] if ln]
+
+
+def recent_runs(project: Optional[str], version: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Most recent run records (newest last), optionally filtered by version."""
+    dirs = [RUNS_DIR / project] if project else sorted(p for p in RUNS_DIR.glob("*") if p.is_dir())
+    records = []
+    for d in dirs:
+        # over-read when filtering so a version filter still finds `limit` runs
+        window = limit * 20 if version else limit
+        for line in _tail_lines(d / "index.jsonl", window):
+            rec = json.loads(line)
+            if version is None or rec["version"] == version:
+                records.append(rec)
+    records.sort(key=lambda r: (r["started_at"], r["log"]))
+    return records[-limit:]
+
+
+def _log_lines(project: str, record: Dict[str, Any]):
+    path = RUNS_DIR / project / record["log"]
+    if not path.exists():
+        return
+    with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+
+def show_runs(
+    project: Optional[str] = None,
+    version: Optional[str] = None,
+    limit: int = 10,
+    tail: Optional[int] = None,
+    grep: Optional[str] = None,
+) -> int:
+    """CLI `runs`: list recent runs, tail the latest log, or grep recent logs."""
+    records = recent_runs(project, version, limit)
+    if not records:
+        print("ℹ️ No recorded runs.")
+        return 0
+
+    if grep:
+        pattern = re.compile(grep)
+        hits = 0
+        for rec in records:
+            for n, line in enumerate(_log_lines(rec["project"], rec), start=1):
+                if pattern.search(line):
+                    hits += 1
+                    print(f"{rec['project']}/{rec['version']} {rec['started_at']}:{n}: {line}")
+        if not hits:
+            print(f"ℹ️ No matches for /{grep}/ in the last {len(records)} runs.")
+        return 0
+
+    if tail is not None:
+        rec = records[-1]
+        print(f"📜 {rec['project']} {rec['version']} — {rec['started_at']} (exit {rec['exit_code']})")
+        for line in deque(_log_lines(rec["project"], rec), maxlen=tail):
+            print(line)
+        return 0
+
+    print("🏃 Recent runs:")
+    for rec in records:
+        flags = " ⏱️ timeout" if rec.get("timed_out") else ""
+        flags += " 🗃️ cached" if rec.get("cached") else ""
+        flags += " ✂️ truncated" if rec.get("truncated") else ""
+        print(f" - {rec['started_at']} {rec['project']} {rec['version']}: exit {rec['exit_code']}, "
+              f"{rec['duration_s']:.3f}s wall, {rec['cpu_s']:.3f}s cpu, "
+              f"peak {rec['peak_rss_kb'] / 1024:.1f} MiB{flags}")
+    return 0
@@ -0,0 +1,339 @@
+from __future__ import annotations
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+try:
+    import resource
+except ImportError:  # non-POSIX: limits are not enforced, timeouts still are
+    resource = None
+
+# Sandboxed execution of version files.
+#
+# Every run gets its own session/process group (so a timeout kills the
+# whole tree). RLIMIT_CPU / RLIMIT_AS caps and a wall-clock timeout are
+# applied only when asked for, by flag or environment (0 disables one):
+#   BILLY_RUN_TIMEOUT (s, wall)   BILLY_RUN_CPU (s)   BILLY_RUN_MEMORY_MB
+#
+# WarmPool is the opt-in fast path: a zygote interpreter that has already
+# paid for startup and the common imports forks one child per run. The
+# zygote never executes user code, so each child starts from pristine
+# module state; the script itself runs as __main__ in a fresh namespace.
+
+DEFAULT_LIMITS = {  # unlimited unless set
+    "timeout": float(os.environ.get("BILLY_RUN_TIMEOUT") or 0) or None,
+    "cpu_s": int(os.environ.get("BILLY_RUN_CPU") or 0) or None,
+    "memory_mb": int(os.environ.get("BILLY_RUN_MEMORY_MB") or 0) or None,
+}
+DEFAULT_PRELOAD = (
+    "argparse,collections,dataclasses,datetime,functools,itertools,json,"
+    "math,pathlib,random,re,subprocess,textwrap,time,typing"
+)
+
+
+def resolve_limits(timeout: Optional[float] = None, cpu_s: Optional[int] = None,
+                   memory_mb: Optional[int] = None) -> Dict[str, Any]:
+    """Merge explicit limits over the defaults; 0 means "no limit" (stored as None)."""
+    given = {"timeout": timeout, "cpu_s": cpu_s, "memory_mb": memory_mb}
+    return {k: (v if v is not None else DEFAULT_LIMITS[k]) or None for k, v in given.items()}
+
+
+def _apply_rlimits(limits: Dict[str, Any], pid: int = 0) -> None:
+    """Set CPU/address-space caps on `pid` (0 = this process)."""
+    if resource is None:
+        return
+    caps = []
+    if limits.get("cpu_s"):
+        # soft limit delivers SIGXCPU, hard limit one second later SIGKILL
+        caps.append((resource.RLIMIT_CPU, (limits["cpu_s"], limits["cpu_s"] + 1)))
+    if limits.get("memory_mb"):
+        size = limits["memory_mb"] * 1024 * 1024
+        caps.append((resource.RLIMIT_AS, (size, size)))
+    for which, value in caps:
+        if pid and hasattr(resource, "prlimit"):
+            resource.prlimit(pid, which, value)
+        elif not pid:
+            resource.setrlimit(which, value)
+
+
+def describe_exit(code: Optional[int]) -> str:
+    """Human-readable reason for a negative (signal) exit code."""
+    if code is None or code >= 0:
+        return ""
+    try:
+        name = signal.Signals(-code).name
+    except ValueError:
+        return f"signal {-code}"
+    reasons = {"SIGXCPU": "CPU limit", "SIGKILL": "killed", "SIGSEGV": "crashed"}
+    return f"{name}, {reasons[name]}" if name in reasons else name
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Cold launcher (fresh interpreter per run)
+
+def cold_launcher(limits: Dict[str, Any]):
+    """Launcher for runlog.execute: new process group, rlimits applied right after spawn."""
+    def launch(cmd: List[str], cwd: Path, popen_kwargs: Dict[str, Any]):
+        kwargs = {"start_new_session": True, **popen_kwargs}
+        use_prlimit = resource is not None and hasattr(resource, "prlimit")
+        if not use_prlimit and (limits.get("cpu_s") or limits.get("memory_mb")):
+            # preexec_fn is not thread-safe, so it is only the fallback for platforms without prlimit
+            kwargs["preexec_fn"] = lambda: _apply_rlimits(limits)
+        proc = subprocess.Popen(cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        if use_prlimit:
+            try:
+                _apply_rlimits(limits, proc.pid)
+            except ProcessLookupError:  # already exited
+                pass
+        return proc
+    return launch
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Warm pool (zygote)
+
+class _Usage:
+    def __init__(self, utime: float, stime: float, maxrss: int):
+        self.ru_utime, self.ru_stime, self.ru_maxrss = utime, stime, maxrss
+
+
+class _WarmChild:
+    """Popen-like handle for a run forked by the zygote (reaped by the zygote, not by us)."""
+
+    def __init__(self, conn: socket.socket, pid: int, stdout, stderr):
+        self.conn, self.pid, self.stdout, self.stderr = conn, pid, stdout, stderr
+        self.returncode = None
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def reap(self):
+        """Block until the zygote reports the exit; returns (wait status, rusage-like)."""
+        with self.conn, self.conn.makefile("r", encoding="utf-8") as replies:
+            line = replies.readline()
+        if not line:
+            return 1 << 8, _Usage(0.0, 0.0, 0)
+        msg = json.loads(line)
+        return msg["status"], _Usage(msg["utime"], msg["stime"], msg["maxrss"])
+
+
+class WarmPool:
+    """
+    Pre-started zygote interpreter that forks a child per run. Use as a
+    context manager; `launcher(limits)` plugs into runlog.execute.
+    """
+
+    def __init__(self, preload: Optional[str] = None):
+        self.preload = preload or os.environ.get("BILLY_WARM_PRELOAD", DEFAULT_PRELOAD)
+        self.tmpdir = tempfile.mkdtemp(prefix="billy-warm-")
+        self.sock_path = os.path.join(self.tmpdir, "zygote.sock")
+        start = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "agent_billy.sandbox", self.sock_path, self.preload],
+            cwd=str(Path(__file__).resolve().parent.parent), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+        )
+        ready = self.proc.stdout.readline()
+        if not ready:
+            raise RuntimeError("warm interpreter pool failed to start")
+        # what a cold run pays before user code starts: interpreter + common imports
+        self.cold_start_s = time.perf_counter() - start
+        self.runs = 0
+        self.warm_start_s = 0.0
+        self._lock = threading.Lock()  # spawn() is called from matrix worker threads
+
+    def spawn(self, script: str, args: List[str], cwd: Path, limits: Dict[str, Any]) -> _WarmChild:
+        start = time.perf_counter()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.sock_path)
+            req = {"script": script, "args": args, "cwd": str(cwd), "env": dict(os.environ), "limits": limits}
+            socket.send_fds(conn, [(json.dumps(req) + "\n").encode("utf-8")], [out_w, err_w])
+        except BaseException:
+            conn.close()
+            for fd in (out_r, err_r):
+                os.close(fd)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        pid = b""
+        while not pid.endswith(b"\n"):
+            chunk = conn.recv(1)
+            if not chunk:
+                raise RuntimeError("warm interpreter pool closed the connection")
+            pid += chunk
+        with self._lock:
+            self.runs += 1
+            self.warm_start_s += time.perf_counter() - start
+        return _WarmChild(conn, int(pid), os.fdopen(out_r, "rb", buffering=0), os.fdopen(err_r, "rb", buffering=0))
+
+    def launcher(self, limits: Dict[str, Any]):
+        cold = cold_launcher(limits)
+
+        def launch(cmd: List[str], cwd: Path, popen_kwargs: Dict[str, Any]):
+            if len(cmd) < 2 or cmd[0] != sys.executable or cmd[1].startswith("-") or popen_kwargs:
+                return cold(cmd, cwd, popen_kwargs)  # only plain `python script.py ...` runs warm
+            return self.spawn(cmd[1], cmd[2:], cwd, limits)
+        return launch
+
+    def saved_s(self) -> float:
+        """
+        Net start latency saved so far versus cold interpreter starts. Starting
+        the zygote itself costs one cold start, so this is negative until the
+        pool has served enough runs to pay for it.
+        """
+        return (self.runs - 1) * self.cold_start_s - self.warm_start_s
+
+    def summary(self) -> str:
+        if not self.runs:
+            return "🔥 Warm pool: no runs."
+        per_run = self.warm_start_s / self.runs
+        saved = self.saved_s()
+        outcome = (f"~{saved:.2f}s start latency saved net of the pool's own start" if saved > 0 else
+                   f"no net saving yet (the pool's own {self.cold_start_s * 1000:.1f} ms start is not paid off)")
+        return (f"🔥 Warm pool: {self.runs} run{'s' if self.runs != 1 else ''}, {per_run * 1000:.1f} ms start each vs "
+                f"{self.cold_start_s * 1000:.1f} ms cold — {outcome}.")
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            self.proc.wait()
+        self.proc.stdout.close()
+        try:
+            os.unlink(self.sock_path)
+        except FileNotFoundError:
+            pass
+        os.rmdir(self.tmpdir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _zygote_child(req: Dict[str, Any], fds: List[int]) -> None:
+    """In the forked child: isolate, limit, wire up stdio and run the script as __main__."""
+    import runpy
+    import traceback
+
+    os.setsid()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    for fd in (devnull, *fds):
+        os.close(fd)
+    os.chdir(req["cwd"])
+    os.environ.clear()
+    os.environ.update(req["env"])
+    _apply_rlimits(req["limits"])
+
+    script = req["script"]
+    sys.argv = [script, *req["args"]]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # hide the zygote/runpy frames so tracebacks look like a plain `python script.py`
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code & 0xFF)
+
+
+def zygote(sock_path: str, preload: str) -> int:
+    """Zygote main loop: preload, then fork one child per request and report its exit."""
+    import importlib
+
+    for name in filter(None, (m.strip() for m in preload.split(","))):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(sock_path)
+    server.listen(64)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ, None)
+    try:
+        while True:
+            for key, _ in sel.select():
+                if key.data is None:
+                    conn, _ = server.accept()
+                    msg, fds, _, _ = socket.recv_fds(conn, 1 << 20, 2)
+                    req = json.loads(msg.decode("utf-8"))
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    pid = os.fork()
+                    if pid == 0:
+                        for other in list(sel.get_map().values()):
+                            if other.data is not None:  # other runs' pidfds and connections
+                                os.close(other.fd)
+                                other.data[1].close()
+                        sel.close()
+                        server.close()
+                        conn.close()
+                        _zygote_child(req, fds)
+                    for fd in fds:
+                        os.close(fd)
+                    conn.sendall(f"{pid}\n".encode())
+                    # pidfd becomes readable when the child exits
+                    sel.register(os.pidfd_open(pid), selectors.EVENT_READ, (pid, conn))
+                else:
+                    pid, conn = key.data
+                    sel.unregister(key.fileobj)
+                    os.close(key.fd)
+                    _, status, usage = os.wait4(pid, 0)
+                    try:
+                        conn.sendall((json.dumps({"status": status, "utime": usage.ru_utime,
+                                                  "stime": usage.ru_stime, "maxrss": usage.ru_maxrss}) + "\n").encode())
+                    except OSError:
+                        pass
+                    conn.close()
+    finally:
+        server.close()
+
+
+def warm_pool_available() -> bool:
+    return hasattr(os, "fork") and hasattr(os, "pidfd_open") and hasattr(socket, "send_fds")
+
+
+if __name__ == "__main__":
+    sys.exit(zygote(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PRELOAD))
@@ -0,0 +1,344 @@
+from __future__ import annotations
+import ast
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
+
+from .utils import STATE_DIR, WORKSPACE, version_sort_key
+from .store import get_store
+
+INDEX_DB = STATE_DIR / "search.db"
+
+# Full-text and symbol index over every version's content.
+#
+# Contents are stored once per distinct content hash (copies share a row),
+# with an FTS5 trigram index over them, so any substring of 3+ characters
+# is an index lookup instead of a scan of every file. `symbols` holds the
+# functions, classes (qualified, e.g. Parser.feed) and module-level names
+# of each content, extracted with `ast`. `versions` maps project/version
+# to its content, ordered by creation time.
+#
+# Like the lineage index this is derived data: add_version(s) index new
+# versions as they are saved, queries index any versions that are missing
+# (e.g. saved before the index existed), and `reindex` rebuilds in parallel.
+# It reflects contents as saved; `reindex` picks up later edits to working
+# files. Without FTS5 text queries fall back to scanning distinct contents.
+
+SymbolRow = Tuple[str, str, str, int]  # (name, qualname, kind, line)
+
+
+def extract_symbols(source: str) -> List[SymbolRow]:
+    """Functions, classes and module-level assignments defined in `source`."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    out: List[SymbolRow] = []
+
+    def visit(body: List[ast.stmt], prefix: str) -> None:
+        for child in body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else "def"
+                out.append((child.name, prefix + child.name, kind, child.lineno))
+                visit(child.body, f"{prefix}{child.name}.")
+                continue
+            if not prefix and isinstance(child, (ast.Assign, ast.AnnAssign)):
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                out.extend((t.id, t.id, "var", child.lineno) for t in targets if isinstance(t, ast.Name))
+            # only statement blocks (if/for/while/with/try) can hold more definitions
+            for field in ("body", "orelse", "finalbody"):
+                block = getattr(child, field, None)
+                if isinstance(block, list):
+                    visit(block, prefix)
+            for handler in getattr(child, "handlers", ()):
+                visit(handler.body, prefix)
+
+    visit(tree.body, "")
+    return out
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Index
+
+class SearchIndex:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS contents (
+        id   INTEGER PRIMARY KEY,
+        hash TEXT NOT NULL UNIQUE,
+        body TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS symbols (
+        content  INTEGER NOT NULL,
+        name     TEXT NOT NULL,
+        qualname TEXT NOT NULL,
+        kind     TEXT NOT NULL,
+        line     INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols(name);
+    CREATE INDEX IF NOT EXISTS symbols_by_qualname ON symbols(qualname);
+    CREATE INDEX IF NOT EXISTS symbols_by_content ON symbols(content);
+    CREATE TABLE IF NOT EXISTS versions (
+        project    TEXT NOT NULL,
+        version    TEXT NOT NULL,
+        content    INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        vkey       TEXT NOT NULL,
+        PRIMARY KEY (project, version)
+    );
+    CREATE INDEX IF NOT EXISTS versions_by_content ON versions(content);
+    """
+
+    def __init__(self, path=INDEX_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS contents_fts USING "
+                "fts5(body, content='contents', content_rowid='id', tokenize='trigram')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:  # SQLite built without FTS5 / older than 3.34
+            self.fts = False
+
+    def count(self, project: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM versions WHERE project = ?", (project,)).fetchone()[0]
+
+    def indexed(self, project: str) -> set:
+        return {r[0] for r in self.conn.execute("SELECT version FROM versions WHERE project = ?", (project,))}
+
+    def _content_id(self, h: str, body: Optional[str], symbols: Optional[List[SymbolRow]]) -> int:
+        row = self.conn.execute("SELECT id FROM contents WHERE hash = ?", (h,)).fetchone()
+        if row:
+            return row[0]
+        cid = self.conn.execute("INSERT INTO contents (hash, body) VALUES (?, ?)", (h, body)).lastrowid
+        if self.fts:
+            self.conn.execute("INSERT INTO contents_fts (rowid, body) VALUES (?, ?)", (cid, body))
+        if symbols is None:
+            symbols = extract_symbols(body)
+        self.conn.executemany("INSERT INTO symbols (content, name, qualname, kind, line) VALUES (?, ?, ?, ?, ?)",
+                              [(cid, *s) for s in symbols])
+        return cid
+
+    def add(self, rows: List[Tuple]) -> None:
+        """
+        Index (project, version, created_at, hash, body, symbols) rows in one
+        transaction. symbols=None parses the body; body may be None for a
+        content already indexed (or earlier in `rows`).
+        """
+        with self.conn:
+            for project, version, created_at, h, body, symbols in rows:
+                cid = self._content_id(h, body, symbols)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO versions (project, version, content, created_at, vkey) "
+                    "VALUES (?, ?, ?, ?, ?)", (project, version, cid, created_at, version_sort_key(version))
+                )
+
+    def drop(self, project: Optional[str] = None) -> None:
+        """Forget a project's versions (all of them by default) and any content left unreferenced."""
+        with self.conn:
+            if project is None:
+                self.conn.execute("DELETE FROM versions")
+            else:
+                self.conn.execute("DELETE FROM versions WHERE project = ?", (project,))
+            orphans = self.conn.execute(
+                "SELECT id, body FROM contents WHERE id NOT IN (SELECT content FROM versions)"
+            ).fetchall()
+            if self.fts:
+                self.conn.executemany("INSERT INTO contents_fts (contents_fts, rowid, body) VALUES ('delete', ?, ?)",
+                                      orphans)
+            self.conn.executemany("DELETE FROM symbols WHERE content = ?", [(cid,) for cid, _ in orphans])
+            self.conn.executemany("DELETE FROM contents WHERE id = ?", [(cid,) for cid, _ in orphans])
+
+    def ensure(self, projects: List[str]) -> int:
+        """Index versions the index has not seen yet; returns how many were added."""
+        store = get_store()
+        added = 0
+        for project in projects:
+            if self.count(project) == store.version_count(project):
+                continue
+            versions = store.versions(project)
+            known = self.indexed(project)
+            stale = known - set(versions)
+            if stale:
+                with self.conn:
+                    self.conn.executemany("DELETE FROM versions WHERE project = ? AND version = ?",
+                                          [(project, v) for v in stale])
+            missing = [(project, v, meta, str(store.git_root(project)))
+                       for v, meta in versions.items() if v not in known]
+            rows = _extract(missing)
+            self.add(rows)
+            added += len(rows)
+        return added
+
+    # Queries
+    def find_text(self, text: str, projects: List[str], ignore_case: bool = False) -> List[Tuple]:
+        """(project, version, created_at, content id) of versions containing `text`, oldest first."""
+        marks = ",".join("?" * len(projects))
+        if self.fts and len(text) >= 3:
+            phrase = '"' + text.replace('"', '""') + '"'
+            check = "" if ignore_case else " AND instr(c.body, ?)"
+            ids = (f"SELECT c.id FROM contents_fts f JOIN contents c ON c.id = f.rowid "
+                   f"WHERE contents_fts MATCH ?{check}")
+            params: List[Any] = [phrase] + ([] if ignore_case else [text])
+        else:
+            ids = "SELECT id FROM contents WHERE " + ("instr(lower(body), lower(?))" if ignore_case else "instr(body, ?)")
+            params = [text]
+        return self.conn.execute(
+            f"SELECT project, version, created_at, content FROM versions WHERE content IN ({ids}) "
+            f"AND +project IN ({marks}) ORDER BY project, created_at, vkey", params + projects
+        ).fetchall()
+
+    def find_symbol(self, name: str, projects: List[str]) -> List[Tuple]:
+        """(project, version, created_at, qualname, kind, line) of versions defining `name` (bare or qualified)."""
+        marks = ",".join("?" * len(projects))
+        return self.conn.execute(
+            f"SELECT v.project, v.version, v.created_at, s.qualname, s.kind, s.line "
+            f"FROM symbols s CROSS JOIN versions v ON v.content = s.content "  # symbols first: the name is selective
+            f"WHERE (s.name = ? OR s.qualname = ?) AND +v.project IN ({marks}) "
+            f"ORDER BY v.project, v.created_at, v.vkey, s.line", [name, name] + projects
+        ).fetchall()
+
+    def body(self, content: int) -> str:
+        return self.conn.execute("SELECT body FROM contents WHERE id = ?", (content,)).fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _extract(items: List[Tuple[str, str, Dict[str, Any], str]]) -> List[Tuple]:
+    """Read and parse versions: (project, version, created_at, hash, body, symbols) rows."""
+    from .diffing import VersionReader
+
+    rows, seen = [], set()
+    readers: Dict[str, VersionReader] = {}
+    try:
+        for project, version, meta, root in items:
+            reader = readers.setdefault(root, VersionReader(Path(root)))
+            data = reader.read(meta)
+            if data is None:
+                continue
+            h = hashlib.sha256(data).hexdigest()
+            if h in seen:  # same content as an earlier row: the index only needs the hash
+                rows.append((project, version, meta.get("created_at", ""), h, None, []))
+                continue
+            seen.add(h)
+            body = data.decode("utf-8", errors="replace")
+            rows.append((project, version, meta.get("created_at", ""), h, body, extract_symbols(body)))
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return rows
+
+
+def record(project: str, contents: Dict[str, Tuple[str, bytes]]) -> None:
+    """Hook for add_version(s): index newly saved versions ({version: (created_at, data)})."""
+    index = SearchIndex()
+    try:
+        index.add([(project, v, created_at, hashlib.sha256(data).hexdigest(),
+                     data.decode("utf-8", errors="replace"), None)
+                    for v, (created_at, data) in contents.items()])
+    finally:
+        index.close()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `search` and `reindex`
+
+def _projects(project: Optional[str]) -> Optional[List[str]]:
+    store = get_store()
+    if project is None:
+        return store.project_names()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return None
+    return [project]
+
+
+def search(query: str, project: Optional[str] = None, defines: bool = False, first: bool = False,
+           ignore_case: bool = False, limit: int = 20) -> int:
+    projects = _projects(project)
+    if projects is None:
+        return 1
+    index = SearchIndex()
+    try:
+        added = index.ensure(projects)
+        start = time.perf_counter()
+        rows = index.find_symbol(query, projects) if defines else index.find_text(query, projects, ignore_case)
+        elapsed = (time.perf_counter() - start) * 1000
+        if first:
+            firsts: Dict[str, Tuple] = {}
+            for row in rows:
+                firsts.setdefault(row[0], row)
+            rows = list(firsts.values())
+
+        what = f"definitions of '{query}'" if defines else f"'{query}'"
+        if not rows:
+            print(f"ℹ️ No versions contain {what} ({elapsed:.1f}ms).")
+            return 0
+        found = len({(r[0], r[1]) for r in rows})
+        note = f"; indexed {added} new versions first" if added else ""
+        label = "first version per project with" if first else f"version{'s' if found != 1 else ''} with"
+        print(f"🔎 {found} {label} {what} ({elapsed:.1f}ms{note}):")
+        bodies: Dict[int, str] = {}
+        for row in rows[:limit]:
+            if defines:
+                p, v, created, qualname, kind, line = row
+                print(f"   {p}/{v:<10} L{line:<5} {kind} {qualname}  ({created})")
+                continue
+            p, v, created, content = row
+            body = bodies.get(content) or bodies.setdefault(content, index.body(content))
+            pos = (body.lower().find(query.lower()) if ignore_case else body.find(query))
+            line = body.count("\n", 0, max(pos, 0)) + 1
+            text = body.splitlines()[line - 1].strip() if body else ""
+            print(f"   {p}/{v:<10} L{line:<5} {text[:100]}  ({created})")
+        if len(rows) > limit:
+            print(f"   … {len(rows) - limit} more (use -n to show more)")
+    finally:
+        index.close()
+    return 0
+
+
+def reindex(project: Optional[str] = None, jobs: Optional[int] = None) -> int:
+    """Rebuild the index from the metadata store, reading and parsing versions in parallel."""
+    projects = _projects(project)
+    if projects is None:
+        return 1
+    start = time.perf_counter()
+    store = get_store()
+    items = [(p, v, meta, str(store.git_root(p))) for p in projects for v, meta in store.versions(p).items()]
+    jobs = jobs or os.cpu_count() or 1
+    size = max(1, min(500, len(items) // (jobs * 4) or 1))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+
+    index = SearchIndex()
+    try:
+        index.drop(project)
+        indexed = 0
+        if len(chunks) > 1 and jobs > 1:
+            os.environ["BILLY_WORKSPACE"] = str(WORKSPACE)  # workers must resolve the same workspace
+            with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+                for rows in pool.map(_extract, chunks):
+                    index.add(rows)
+                    indexed += len(rows)
+        else:
+            for chunk in chunks:
+                rows = _extract(chunk)
+                index.add(rows)
+                indexed += len(rows)
+        distinct, symbols = index.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM contents), (SELECT COUNT(*) FROM symbols)"
+        ).fetchone()
+    finally:
+        index.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Indexed {indexed} versions ({distinct} distinct contents, {symbols} symbols) "
+          f"in {elapsed:.2f}s with {min(jobs, max(1, len(chunks)))} worker(s).")
+    return 0
+
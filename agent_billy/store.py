@@ -0,0 +1,541 @@
+from __future__ import annotations
+import copy
+import heapq
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from . import metrics
+from .utils import (WORKSPACE, MEMORY_FILE, MEMORY_DB, load_memory, save_memory, update_memory, _file_token,
+                    version_key, version_sort_key)
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Metadata backends
+#
+# Both backends expose the same record-level API. `memory.json` stays the
+# interchange format: the SQLite store can be migrated from it and exported
+# back to it at any time.
+
+VERSION_COLUMNS = ("created_at", "copied_from", "last_run", "git_commit")
+
+# Filters accepted by iter_versions (None = don't filter):
+#   since / until   created_at bounds; a prefix like "2025-06" covers the whole month
+#   copied_from     parent version ("" = roots only)
+#   ran             True: has a last_run, False: never run
+#   committed       True: has a git_commit, False: not committed
+VERSION_FILTERS = ("since", "until", "copied_from", "ran", "committed")
+
+
+def _version_matches(meta: Dict[str, Any], f: Dict[str, Any]) -> bool:
+    created = meta.get("created_at") or ""
+    if f.get("since") and created < f["since"]:
+        return False
+    if f.get("until") and created[:len(f["until"])] > f["until"]:
+        return False
+    if f.get("copied_from") is not None and (meta.get("copied_from") or "") != f["copied_from"]:
+        return False
+    if f.get("ran") is not None and bool(meta.get("last_run")) != f["ran"]:
+        return False
+    if f.get("committed") is not None and bool(meta.get("git_commit")) != f["committed"]:
+        return False
+    return True
+
+
+class JsonStore:
+    """Whole-file backend over memory.json (the historical default)."""
+
+    name = "json"
+
+    def __init__(self, path: Path = MEMORY_FILE):
+        self.path = path
+        self._cache = (None, None)  # (file token, parsed memory)
+
+    def _load(self) -> Dict[str, Any]:
+        """Parsed memory.json, re-read only when the file changed (keeps long-lived processes warm)."""
+        token = _file_token(self.path)
+        if token is None or token != self._cache[0]:
+            self._cache = (token, load_memory(self.path))
+        return self._cache[1]
+
+    def _save(self, memory: Dict[str, Any]) -> None:
+        save_memory(memory, self.path)
+
+    def _update(self, mutate) -> None:
+        update_memory(mutate, self.path)
+
+    # Projects
+    def project_names(self) -> List[str]:
+        return list(self._load().get("projects", {}))
+
+    def get_project(self, name: str) -> Optional[Dict[str, Any]]:
+        proj = self._load().get("projects", {}).get(name)
+        if proj is None:
+            return None
+        return {k: v for k, v in proj.items() if k != "versions"}
+
+    def put_project(self, name: str, fields: Dict[str, Any]) -> None:
+        def mutate(memory):
+            projects = memory.setdefault("projects", {})
+            versions = projects.get(name, {}).get("versions", {})
+            projects[name] = {**fields, "versions": versions}
+        self._update(mutate)
+
+    def update_project(self, name: str, **fields: Any) -> None:
+        self._update(lambda memory: memory["projects"][name].update(fields))
+
+    def modify_project(self, name: str, mutate) -> None:
+        """Run `mutate(project_fields)` and save the result as one transaction (may be retried)."""
+        self._update(lambda memory: mutate(memory["projects"][name]))
+
+    # Versions
+    # readers hand out copies so callers can't mutate the cached document
+    def versions(self, project: str) -> Dict[str, Dict[str, Any]]:
+        versions = self._load().get("projects", {}).get(project, {}).get("versions", {})
+        return {v: dict(meta) for v, meta in versions.items()}
+
+    def version_count(self, project: str) -> int:
+        return len(self._load().get("projects", {}).get(project, {}).get("versions", {}))
+
+    def iter_versions(self, project: str, after: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = None, **filters: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(version, meta) in natural order after the `after` cursor, filtered and paginated."""
+        versions = self._load().get("projects", {}).get(project, {}).get("versions", {})
+        cursor = version_sort_key(after) if after else None
+        keys = [v for v, meta in versions.items()
+                if (cursor is None or version_sort_key(v) > cursor) and _version_matches(meta, filters)]
+        if limit is not None:  # only the page needs sorting
+            keys = heapq.nsmallest(offset + limit, keys, key=version_key)[offset:]
+        else:
+            keys = sorted(keys, key=version_key)[offset:]
+        for v in keys:
+            yield v, dict(versions[v])
+
+    def get_version(self, project: str, version: str) -> Optional[Dict[str, Any]]:
+        meta = self._load().get("projects", {}).get(project, {}).get("versions", {}).get(version)
+        return dict(meta) if meta is not None else None
+
+    def put_version(self, project: str, version: str, meta: Dict[str, Any]) -> None:
+        def mutate(memory):
+            memory["projects"][project].setdefault("versions", {})[version] = meta
+        self._update(mutate)
+
+    def update_version(self, project: str, version: str, **fields: Any) -> None:
+        self._update(lambda memory: memory["projects"][project]["versions"][version].update(fields))
+
+    def put_versions(self, project: str, metas: Dict[str, Dict[str, Any]]) -> None:
+        self._update(lambda memory: memory["projects"][project].setdefault("versions", {}).update(metas))
+
+    def update_versions(self, project: str, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Apply {version: fields} updates in a single write."""
+        def mutate(memory):
+            versions = memory["projects"][project]["versions"]
+            for version, fields in updates.items():
+                versions[version].update(fields)
+        self._update(mutate)
+
+    def modify_versions(self, project: str, mutators: Dict[str, Any]) -> None:
+        """Run {version: mutate(meta)} on the current metadata and save it as one transaction (may be retried)."""
+        def mutate(memory):
+            versions = memory["projects"][project]["versions"]
+            for version, fn in mutators.items():
+                fn(versions[version])
+        self._update(mutate)
+
+    # Whole-document access
+    def export_memory(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._load())
+
+    def import_memory(self, memory: Dict[str, Any]) -> None:
+        self._save(memory)
+
+    def commit_paths(self) -> List[str]:
+        """Workspace-relative paths to stage when committing metadata."""
+        return [self.path.relative_to(WORKSPACE).as_posix()]
+
+
+class SqliteStore:
+    """
+    Indexed backend in memory.db (WAL mode).
+    Projects and versions are one row each, so a lookup or update touches a
+    single record instead of re-serializing the whole workspace.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS extras (
+        key   TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS projects (
+        name TEXT PRIMARY KEY,
+        seq  INTEGER NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS versions (
+        project     TEXT NOT NULL,
+        version     TEXT NOT NULL,
+        seq         INTEGER NOT NULL,
+        created_at  TEXT,
+        copied_from TEXT,
+        last_run    TEXT,
+        git_commit  TEXT,
+        data        TEXT NOT NULL,
+        vkey        TEXT,
+        PRIMARY KEY (project, version)
+    );
+    CREATE INDEX IF NOT EXISTS versions_by_seq ON versions(project, seq);
+    CREATE INDEX IF NOT EXISTS versions_by_parent ON versions(project, copied_from);
+    """
+
+    def __init__(self, path: Path = MEMORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(str(path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(versions)")}
+        if "vkey" not in columns:  # databases migrated before natural-order listing
+            with self.conn:
+                self.conn.execute("ALTER TABLE versions ADD COLUMN vkey TEXT")
+                rows = self.conn.execute("SELECT project, version FROM versions").fetchall()
+                self.conn.executemany("UPDATE versions SET vkey = ? WHERE project = ? AND version = ?",
+                                      [(version_sort_key(v), p, v) for p, v in rows])
+        self.conn.execute("CREATE INDEX IF NOT EXISTS versions_by_vkey ON versions(project, vkey)")
+
+    @contextmanager
+    def _txn(self):
+        """Write transaction that takes the database write lock up front (read-modify-write safe)."""
+        with metrics.span("store.save"):
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+
+    # Projects
+    def project_names(self) -> List[str]:
+        rows = self.conn.execute("SELECT name FROM projects ORDER BY seq")
+        return [r[0] for r in rows]
+
+    def get_project(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT data FROM projects WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_project(self, name: str, fields: Dict[str, Any]) -> None:
+        fields = {k: v for k, v in fields.items() if k != "versions"}
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO projects (name, seq, data) VALUES "
+                "(?, COALESCE((SELECT MAX(seq) FROM projects), 0) + 1, ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+                (name, json.dumps(fields, ensure_ascii=False)),
+            )
+
+    def update_project(self, name: str, **fields: Any) -> None:
+        with self._txn():
+            proj = self.get_project(name)
+            if proj is None:
+                raise KeyError(name)
+            proj.update(fields)
+            self.conn.execute(
+                "UPDATE projects SET data = ? WHERE name = ?",
+                (json.dumps(proj, ensure_ascii=False), name),
+            )
+
+    def modify_project(self, name: str, mutate) -> None:
+        """Run `mutate(project_fields)` and save the result as one transaction."""
+        with self._txn():
+            proj = self.get_project(name)
+            if proj is None:
+                raise KeyError(name)
+            mutate(proj)
+            self.conn.execute(
+                "UPDATE projects SET data = ? WHERE name = ?",
+                (json.dumps(proj, ensure_ascii=False), name),
+            )
+
+    # Versions
+    def versions(self, project: str) -> Dict[str, Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT version, data FROM versions WHERE project = ? ORDER BY seq", (project,)
+        )
+        return {v: json.loads(d) for v, d in rows}
+
+    def version_count(self, project: str) -> int:
+        row = self.conn.execute("SELECT COUNT(*) FROM versions WHERE project = ?", (project,)).fetchone()
+        return row[0]
+
+    def iter_versions(self, project: str, after: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = None, **filters: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(version, meta) in natural order, streamed off the (project, vkey) index."""
+        where, params = ["project = ?"], [project]
+        if after:
+            where.append("vkey > ?")
+            params.append(version_sort_key(after))
+        if filters.get("since"):
+            where.append("created_at >= ?")
+            params.append(filters["since"])
+        if filters.get("until"):
+            where.append("substr(created_at, 1, ?) <= ?")
+            params += [len(filters["until"]), filters["until"]]
+        if filters.get("copied_from") is not None:
+            where.append("COALESCE(copied_from, '') = ?")
+            params.append(filters["copied_from"])
+        for key, column in (("ran", "last_run"), ("committed", "git_commit")):
+            if filters.get(key) is not None:
+                where.append(f"COALESCE({column}, '') {'!=' if filters[key] else '='} ''")
+        rows = self.conn.execute(
+            f"SELECT version, data FROM versions WHERE {' AND '.join(where)} ORDER BY vkey LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset],
+        )
+        for v, d in rows:
+            yield v, json.loads(d)
+
+    def get_version(self, project: str, version: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT data FROM versions WHERE project = ? AND version = ?", (project, version)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write_version(self, project: str, version: str, meta: Dict[str, Any]) -> None:
+        cols = [meta.get(c) for c in VERSION_COLUMNS]
+        self.conn.execute(
+            "INSERT INTO versions (project, version, seq, created_at, copied_from, last_run, git_commit, data, vkey) "
+            "VALUES (?, ?, COALESCE((SELECT MAX(seq) FROM versions WHERE project = ?), 0) + 1, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(project, version) DO UPDATE SET "
+            "created_at = excluded.created_at, copied_from = excluded.copied_from, "
+            "last_run = excluded.last_run, git_commit = excluded.git_commit, data = excluded.data",
+            (project, version, project, *cols, json.dumps(meta, ensure_ascii=False), version_sort_key(version)),
+        )
+
+    def put_version(self, project: str, version: str, meta: Dict[str, Any]) -> None:
+        with self.conn:
+            self._write_version(project, version, meta)
+
+    def update_version(self, project: str, version: str, **fields: Any) -> None:
+        with self._txn():
+            meta = self.get_version(project, version)
+            if meta is None:
+                raise KeyError(f"{project}/{version}")
+            meta.update(fields)
+            self._write_version(project, version, meta)
+
+    def put_versions(self, project: str, metas: Dict[str, Dict[str, Any]]) -> None:
+        with self._txn():
+            for version, meta in metas.items():
+                self._write_version(project, version, meta)
+
+    def update_versions(self, project: str, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Apply {version: fields} updates in a single transaction."""
+        with self._txn():
+            for version, fields in updates.items():
+                meta = self.get_version(project, version)
+                if meta is None:
+                    raise KeyError(f"{project}/{version}")
+                meta.update(fields)
+                self._write_version(project, version, meta)
+
+    def modify_versions(self, project: str, mutators: Dict[str, Any]) -> None:
+        """Run {version: mutate(meta)} on the current rows inside one transaction."""
+        with self._txn():
+            for version, fn in mutators.items():
+                meta = self.get_version(project, version)
+                if meta is None:
+                    raise KeyError(f"{project}/{version}")
+                fn(meta)
+                self._write_version(project, version, meta)
+
+    # Whole-document access
+    def export_memory(self) -> Dict[str, Any]:
+        memory: Dict[str, Any] = {"projects": {}}
+        for name in self.project_names():
+            proj = self.get_project(name) or {}
+            memory["projects"][name] = {**proj, "versions": self.versions(name)}
+            # keep the historical key order: versions sit right after description
+            memory["projects"][name] = _ordered_project(memory["projects"][name])
+        for key, value in self.conn.execute("SELECT key, value FROM extras ORDER BY rowid"):
+            memory[key] = json.loads(value)
+        return memory
+
+    def import_memory(self, memory: Dict[str, Any]) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM versions")
+            self.conn.execute("DELETE FROM projects")
+            self.conn.execute("DELETE FROM extras")
+            for seq, (name, proj) in enumerate(memory.get("projects", {}).items(), start=1):
+                fields = {k: v for k, v in proj.items() if k != "versions"}
+                self.conn.execute(
+                    "INSERT INTO projects (name, seq, data) VALUES (?, ?, ?)",
+                    (name, seq, json.dumps(fields, ensure_ascii=False)),
+                )
+                for version, meta in proj.get("versions", {}).items():
+                    self._write_version(name, version, meta)
+            for key, value in memory.items():
+                if key != "projects":
+                    self.conn.execute(
+                        "INSERT INTO extras (key, value) VALUES (?, ?)",
+                        (key, json.dumps(value, ensure_ascii=False)),
+                    )
+
+    def commit_paths(self) -> List[str]:
+        """Checkpoint the WAL so the committed memory.db is self-contained."""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return [self.path.relative_to(WORKSPACE).as_posix()]
+
+
+def _ordered_project(proj: Dict[str, Any]) -> Dict[str, Any]:
+    head = ["created_at", "description", "versions"]
+    ordered = {k: proj[k] for k in head if k in proj}
+    ordered.update({k: v for k, v in proj.items() if k not in ordered})
+    return ordered
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Sharded projects
+#
+# A project created with --shard keeps its own metadata file and git repo
+# under projects/<name>/ (memory.json + .git). The workspace store only
+# holds a stub ({"shard": "projects/<name>", ...}); every per-project call
+# is routed to the shard, so a heavy project's metadata writes and commits
+# never touch the workspace-wide memory.json or repo.
+
+class ShardedStore:
+    """Routes per-project calls to the project's shard store when it has one."""
+
+    def __init__(self, base):
+        self.base = base
+        self._shards: Dict[str, JsonStore] = {}
+
+    def __getattr__(self, attr):  # name, conn, path, ... of the workspace store
+        return getattr(self.base, attr)
+
+    def shard_dir(self, project: str) -> Optional[Path]:
+        stub = self.base.get_project(project)
+        return WORKSPACE / stub["shard"] if stub and stub.get("shard") else None
+
+    def _for(self, project: str):
+        shard = self.shard_dir(project)
+        if shard is None:
+            return self.base
+        if project not in self._shards:
+            self._shards[project] = JsonStore(shard / "memory.json")
+        return self._shards[project]
+
+    def git_root(self, project: Optional[str] = None) -> Path:
+        """The repo a project's files are committed to."""
+        return (self.shard_dir(project) if project else None) or WORKSPACE
+
+    # Projects
+    def project_names(self) -> List[str]:
+        return self.base.project_names()
+
+    def get_project(self, name: str) -> Optional[Dict[str, Any]]:
+        stub = self.base.get_project(name)
+        return self._for(name).get_project(name) if stub and stub.get("shard") else stub
+
+    def put_project(self, name: str, fields: Dict[str, Any]) -> None:
+        if fields.get("shard"):
+            stub = {k: fields[k] for k in ("created_at", "description", "shard") if k in fields}
+            self.base.put_project(name, stub)
+        self._for(name).put_project(name, fields)
+
+    def update_project(self, name: str, **fields: Any) -> None:
+        self._for(name).update_project(name, **fields)
+
+    def modify_project(self, name: str, mutate) -> None:
+        self._for(name).modify_project(name, mutate)
+
+    # Versions
+    def versions(self, project: str) -> Dict[str, Dict[str, Any]]:
+        return self._for(project).versions(project)
+
+    def version_count(self, project: str) -> int:
+        return self._for(project).version_count(project)
+
+    def iter_versions(self, project: str, **kwargs: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return self._for(project).iter_versions(project, **kwargs)
+
+    def get_version(self, project: str, version: str) -> Optional[Dict[str, Any]]:
+        return self._for(project).get_version(project, version)
+
+    def put_version(self, project: str, version: str, meta: Dict[str, Any]) -> None:
+        self._for(project).put_version(project, version, meta)
+
+    def update_version(self, project: str, version: str, **fields: Any) -> None:
+        self._for(project).update_version(project, version, **fields)
+
+    def put_versions(self, project: str, metas: Dict[str, Dict[str, Any]]) -> None:
+        self._for(project).put_versions(project, metas)
+
+    def update_versions(self, project: str, updates: Dict[str, Dict[str, Any]]) -> None:
+        self._for(project).update_versions(project, updates)
+
+    def modify_versions(self, project: str, mutators: Dict[str, Any]) -> None:
+        self._for(project).modify_versions(project, mutators)
+
+    # Whole-document access (the workspace store; shards keep their own file)
+    def export_memory(self) -> Dict[str, Any]:
+        return self.base.export_memory()
+
+    def import_memory(self, memory: Dict[str, Any]) -> None:
+        self.base.import_memory(memory)
+
+    def commit_paths(self, project: Optional[str] = None) -> List[str]:
+        """Metadata paths to stage with a commit of `project` (the workspace store by default)."""
+        return (self._for(project) if project else self.base).commit_paths()
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Backend selection
+
+BACKENDS = {"json": JsonStore, "sqlite": SqliteStore}
+_STORE = None
+
+
+def get_store():
+    """
+    Return the active metadata store.
+    BILLY_STORE=json|sqlite forces a backend; otherwise memory.db wins if present.
+    """
+    global _STORE
+    if _STORE is None:
+        backend = os.environ.get("BILLY_STORE") or ("sqlite" if MEMORY_DB.exists() else "json")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown BILLY_STORE backend: {backend}")
+        _STORE = ShardedStore(BACKENDS[backend]())
+    return _STORE
+
+
+def migrate_store(force: bool = False) -> int:
+    """One-shot migration of memory.json into the indexed memory.db store."""
+    global _STORE
+    if MEMORY_DB.exists() and not force:
+        print(f"❌ {MEMORY_DB.name} already exists (use --force to rebuild it from {MEMORY_FILE.name}).")
+        return 1
+    memory = load_memory()
+    store = SqliteStore()
+    store.import_memory(memory)
+    _STORE = ShardedStore(store)
+    n_versions = sum(len(p.get("versions", {})) for p in memory.get("projects", {}).values())
+    print(f"✅ Migrated {len(memory.get('projects', {}))} projects / {n_versions} versions into {MEMORY_DB.name}.")
+    print(f"ℹ️ {MEMORY_DB.name} is now the active store; {MEMORY_FILE.name} is left as-is until `export-store`.")
+    return 0
+
+
+def export_store(output: Optional[str] = None) -> int:
+    """Write the active store back out in the memory.json schema."""
+    out_path = Path(output) if output else MEMORY_FILE
+    memory = get_store().export_memory()
+    if out_path.resolve() == MEMORY_FILE.resolve():  # e.g. `-o memory.json` from inside the workspace
+        save_memory(memory)
+    else:
+        with out_path.open("w", encoding="utf-8") as f:
+            json.dump(memory, f, indent=2, ensure_ascii=False)
+    print(f"✅ Exported metadata ({get_store().name} store) to {out_path}")
+    return 0
@@ -1,12 +1,27 @@
 import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from pathlib import Path
+
+from . import metrics
+from .workspaces import active_workspace
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to unlocked (but still atomic) writes
+    fcntl = None
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Workspace constants
-WORKSPACE = Path(__file__).resolve().parent.parent
+# --workspace / BILLY_WORKSPACE / the registry default, else the package's parent (see workspaces.py)
+WORKSPACE = active_workspace()
 PROJECTS_DIR = WORKSPACE / "projects"
 MEMORY_FILE = WORKSPACE / "memory.json"
+MEMORY_DB = WORKSPACE / "memory.db"
+STATE_DIR = WORKSPACE / ".billy"  # local caches, indexes and reports (not committed)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Helpers
@@ -15,14 +30,127 @@ def now_iso():
     """Return current time in ISO format (seconds precision)."""
     return datetime.now().isoformat(timespec="seconds")
 
-def load_memory():
+def version_key(version):
+    """Natural sort key so that v9 < v10 < v18 (digits compare numerically)."""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part.lower())
+            for part in re.split(r"(\d+)", version) if part]
+
+def version_sort_key(version):
+    """version_key as a plain string (digit runs zero-padded), for indexes and ORDER BY."""
+    return re.sub(r"\d+", lambda m: "\x01" + m.group().zfill(12), version.lower())
+
+def latest_version(versions):
+    """Highest version name in natural order, or None."""
+    return max(versions, key=version_key) if versions else None
+
+def load_memory(path=MEMORY_FILE):
     """Load memory.json (project metadata)."""
-    if not MEMORY_FILE.exists():
+    if not path.exists():
         return {"projects": {}}
-    with MEMORY_FILE.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    with metrics.span("store.load"):
+        data = path.read_bytes()
+        metrics.add("bytes_read", len(data))
+        return json.loads(data)
+
+def save_memory(memory, path=MEMORY_FILE):
+    """Save project metadata to memory.json (locked, atomic replace)."""
+    with memory_lock(path):
+        _atomic_write_json(path, memory)
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Transactional updates
+
+@contextmanager
+def memory_lock(path=MEMORY_FILE, timeout=30.0):
+    """Hold an exclusive advisory lock on <path>.lock for the duration of the block."""
+    if fcntl is None:
+        yield
+        return
+    lock_path = path.with_name(path.name + ".lock")
+    with lock_path.open("a") as lock:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for lock on {lock_path}")
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+def _atomic_write_json(path, memory):
+    """Write to a temp file in the same directory, fsync, then rename over `path`."""
+    with metrics.span("store.save"):
+        data = json.dumps(memory, indent=2, ensure_ascii=False).encode("utf-8")
+        metrics.add("bytes_written", len(data))
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        dir_fd = os.open(str(path.parent), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def _file_token(path):
+    """
+    Cheap change hint for read caches: (inode, mtime, ctime, size). An atomic
+    replace normally changes it, but a freed inode can be reused and a write
+    can land within one timestamp tick, so it must never decide whether a
+    write is safe (update_memory compares contents for that).
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size)
+
+def _read_bytes(path):
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+def update_memory(mutate, path=MEMORY_FILE, retries=5):
+    """
+    Read-modify-write memory.json as a compare-and-swap transaction.
 
-def save_memory(memory):
-    """Save project metadata to memory.json."""
-    with MEMORY_FILE.open("w", encoding="utf-8") as f:
-        json.dump(memory, f, indent=2, ensure_ascii=False)
+    `mutate(memory)` edits the dict in place (or returns a replacement). It runs
+    against an unlocked snapshot; the write only lands if, under the lock, the
+    file still holds exactly the bytes the snapshot was parsed from, otherwise
+    the closure is retried on fresh data. After `retries` conflicts the final
+    attempt runs entirely under the lock.
+    Returns the memory dict that was written.
+    """
+    for _ in range(retries):
+        with metrics.span("store.load"):
+            snapshot = _read_bytes(path)
+            metrics.add("bytes_read", len(snapshot or b""))
+            memory = json.loads(snapshot) if snapshot is not None else {"projects": {}}
+        memory = mutate(memory) or memory
+        with memory_lock(path):
+            if _read_bytes(path) == snapshot:
+                _atomic_write_json(path, memory)
+                return memory
+    with memory_lock(path):
+        memory = load_memory(path)
+        memory = mutate(memory) or memory
+        _atomic_write_json(path, memory)
+        return memory
+    with memory_lock(path):
+        memory = load_memory(path)
+        memory = mutate(memory) or memory
+        _atomic_write_json(path, memory)
+        return memory
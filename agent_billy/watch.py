@@ -0,0 +1,254 @@
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import shutil
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Callable
+
+from .utils import WORKSPACE, PROJECTS_DIR, now_iso, latest_version
+from .store import get_store
+from .git_ops import ensure_workspace_git
+from . import blobstore, commitq
+
+DEBOUNCE_S = float(os.environ.get("BILLY_WATCH_DEBOUNCE", 0.5))
+POLL_S = float(os.environ.get("BILLY_WATCH_POLL", 1.0))
+
+# `watch <project>` follows a version's working file and, once a burst of
+# edits has settled (no event for DEBOUNCE_S), takes a safepoint
+# (projects/<project>/safepoints/<project>_sp<N>.py) and/or reruns the version.
+#
+# Linux uses inotify on the file's directory (editors often save by
+# rename, which replaces the watched inode); the process sleeps in
+# select() between events, so an idle watch costs no CPU. Elsewhere, or
+# if inotify is unavailable, the file is stat()ed every POLL_S seconds.
+# Each settled burst produces at most one metadata write and one commit,
+# and only if the content actually changed.
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (name follows)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Change sources
+
+class InotifyWatcher:
+    """Blocks until the named file in `path`'s directory is written or replaced."""
+
+    def __init__(self, path: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify not available")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(path.parent), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path.parent}")
+        self.name = os.fsencode(path.name)
+
+    def _drain(self) -> bool:
+        """Consume queued events; True if any concerned the watched file."""
+        hit = False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return hit
+            pos = 0
+            while pos < len(buf):
+                _, _, _, length = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                hit = hit or buf[pos:pos + length].rstrip(b"\0") == self.name
+                pos += length
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once the file changed, False if `timeout` passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._drain():
+                return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """stat()-based fallback: checks (inode, mtime, size) every `interval` seconds."""
+
+    def __init__(self, path: Path, interval: float = POLL_S):
+        self.path, self.interval = path, interval
+        self._token = self._stat()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            token = self._stat()
+            if token != self._token:
+                self._token = token
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            step = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(step)
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(path: Path, poll: bool = False):
+    """inotify where possible, else polling. Returns (watcher, kind)."""
+    if not poll:
+        try:
+            return InotifyWatcher(path), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(path), "polling"
+
+
+def wait_for_burst(watcher, debounce: float = DEBOUNCE_S) -> int:
+    """Block until the file changes, then until it stays quiet for `debounce`; returns events seen."""
+    watcher.wait()
+    events = 1
+    while watcher.wait(debounce):
+        events += 1
+    return events
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Actions
+
+def take_safepoint(project: str, version: str, file_abs: Path, message: str = "") -> Optional[str]:
+    """
+    Copy the working file to projects/<project>/safepoints/<project>_sp<N>.py.
+    The file is committed on its own, then recorded (with the commit hash)
+    in a single metadata transaction that touches only this safepoint.
+    """
+    store = get_store()
+    proj_meta = store.get_project(project) or {}
+    safepoints = proj_meta.get("safepoints") or {}
+    n = max((int(k[2:]) for k in safepoints if k[2:].isdigit()), default=0) + 1
+    dest = PROJECTS_DIR / project / "safepoints" / f"{project}_sp{n}.py"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(file_abs, dest)
+    rel = dest.relative_to(WORKSPACE).as_posix()
+
+    record = {
+        "filename": rel,
+        "created_at": now_iso(),
+        "description": message or "Watch safepoint",
+        "copied_from": version,
+        "git_commit": None,
+    }
+    note = ""
+    root = store.git_root(project)
+    if proj_meta.get("git_enabled") and ensure_workspace_git(verbose=False, root=root):
+        msg = f"{project} sp{n}: {message or 'Watch safepoint'} (from {version})"
+        if commitq.async_enabled():
+            # record first: the queue worker fills in git_commit once the commit lands
+            _record_safepoint(store, project, f"sp{n}", record)
+            commitq.submit(root, [rel], msg, fill=[{"project": project, "safepoint": f"sp{n}"}])
+            print(f"💾 Safepoint sp{n} → {rel}, commit queued")
+            return rel
+        record["git_commit"] = commitq.submit(root, [rel], msg)[0]
+        note = f", committed {record['git_commit'][:8]}" if record["git_commit"] else " (git commit failed)"
+    _record_safepoint(store, project, f"sp{n}", record)
+    print(f"💾 Safepoint sp{n} → {rel}{note}")
+    return rel
+
+
+def _record_safepoint(store, project: str, name: str, record: Dict[str, Any]) -> None:
+    # edit the map as it is inside the transaction, so a git_commit the queue
+    # worker fills in concurrently for another safepoint is kept
+    def mutate(proj):
+        proj.setdefault("safepoints", {})[name] = record
+    store.modify_project(project, mutate)
+
+
+def watch(project: str, version: Optional[str] = None, safepoint: bool = True, run: bool = False,
+          debounce: float = DEBOUNCE_S, poll: bool = False, message: str = "",
+          run_kwargs: Optional[Dict[str, Any]] = None) -> int:
+    """CLI `watch`: safepoint and/or rerun a version whenever its file settles after edits."""
+    store = get_store()
+    if store.get_project(project) is None:
+        print(f"❌ Project '{project}' not found.")
+        return 1
+    version = version or latest_version(store.versions(project))
+    meta = store.get_version(project, version) if version else None
+    if meta is None:
+        print(f"❌ No version to watch in '{project}'." if not version
+              else f"❌ Version '{version}' not found in '{project}'.")
+        return 1
+    file_abs = blobstore.materialize(meta)
+    if not file_abs.exists():
+        print(f"❌ File missing on disk: {file_abs}")
+        return 1
+
+    actions: List[Callable[[], Any]] = []
+    if safepoint:
+        actions.append(lambda: take_safepoint(project, version, file_abs, message))
+    pool = None
+    if run:
+        from .core import run_version
+        from . import sandbox
+        run_kwargs = dict(run_kwargs or {})
+        if run_kwargs.pop("warm", False) and sandbox.warm_pool_available():
+            pool = sandbox.WarmPool()  # one zygote for every rerun of this watch
+        actions.append(lambda: run_version(project, version, pool=pool, **run_kwargs))
+    if not actions:
+        print("❌ Nothing to do: pass --run or drop --no-safepoint.")
+        return 1
+
+    watcher, kind = open_watcher(file_abs, poll)
+    what = " + ".join(w for w, on in (("safepoint", safepoint), ("run", run)) if on)
+    print(f"👀 Watching {meta['filename']} ({kind}, {debounce:g}s debounce, on change: {what}). Ctrl-C to stop.")
+    last_hash = hashlib.sha256(file_abs.read_bytes()).hexdigest()
+    bursts = 0
+    try:
+        while True:
+            events = wait_for_burst(watcher, debounce)
+            try:
+                current = hashlib.sha256(file_abs.read_bytes()).hexdigest()
+            except FileNotFoundError:  # mid-rename; the next event brings it back
+                continue
+            if current == last_hash:
+                continue
+            last_hash = current
+            bursts += 1
+            print(f"✏️  {meta['filename']} changed ({events} event{'s' if events != 1 else ''} coalesced)")
+            for action in actions:
+                action()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        watcher.close()
+        if pool:
+            print(pool.summary())
+            pool.close()
+    print(f"👋 Stopped watching ({bursts} change{'s' if bursts != 1 else ''} handled).")
+    return 0
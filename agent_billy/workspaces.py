@@ -0,0 +1,143 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Sequence
+
+# Workspace registry.
+#
+# One install can serve many workspaces. The active one is, in order:
+#   --workspace NAME|PATH   (global CLI flag)
+#   $BILLY_WORKSPACE        (name or path)
+#   the registry default    (`workspace use NAME`)
+#   the directory containing agent_billy/ (the historical layout)
+# The registry maps names to paths in $BILLY_REGISTRY, by default
+# ~/.config/billy/workspaces.json. This module is imported by utils while
+# WORKSPACE is being resolved, so it must not import anything from Billy.
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+REGISTRY = Path(os.environ.get("BILLY_REGISTRY")
+                or Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config") / "billy" / "workspaces.json")
+
+
+def load_registry() -> Dict[str, Any]:
+    try:
+        return json.loads(REGISTRY.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {"default": None, "workspaces": {}}
+
+
+def _save_registry(registry: Dict[str, Any]) -> None:
+    REGISTRY.parent.mkdir(parents=True, exist_ok=True)
+    tmp = REGISTRY.with_name(f".{REGISTRY.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(registry, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, REGISTRY)
+
+
+def resolve(spec: str) -> Path:
+    """A registered workspace name, or else a path."""
+    path = load_registry()["workspaces"].get(spec)
+    return Path(path if path else spec).expanduser().resolve()
+
+
+def active_workspace() -> Path:
+    spec = os.environ.get("BILLY_WORKSPACE")
+    if spec:
+        return resolve(spec)
+    registry = load_registry() if REGISTRY.exists() else None
+    default = registry and registry.get("default")
+    if default and default in registry["workspaces"]:
+        return Path(registry["workspaces"][default]).expanduser().resolve()
+    return PACKAGE_ROOT
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# CLI `workspace` and `list --all-workspaces`
+
+def manage(action: str = "list", name: Optional[str] = None, path: Optional[str] = None) -> int:
+    registry = load_registry()
+    spaces = registry["workspaces"]
+    if action in ("add", "remove", "use") and not name:
+        print(f"❌ workspace {action} needs a name.")
+        return 1
+
+    if action == "add":
+        target = Path(path or ".").expanduser().resolve()
+        target.mkdir(parents=True, exist_ok=True)
+        spaces[name] = str(target)
+        _save_registry(registry)
+        print(f"✅ Workspace '{name}' → {target}")
+        return 0
+    if action == "remove":
+        if spaces.pop(name, None) is None:
+            print(f"❌ Workspace '{name}' is not registered.")
+            return 1
+        if registry.get("default") == name:
+            registry["default"] = None
+        _save_registry(registry)
+        print(f"🗑️ Workspace '{name}' unregistered (files left in place).")
+        return 0
+    if action == "use":
+        if name != "-" and name not in spaces:
+            print(f"❌ Workspace '{name}' is not registered.")
+            return 1
+        registry["default"] = None if name == "-" else name
+        _save_registry(registry)
+        print(f"✅ Default workspace: {name if name != '-' else PACKAGE_ROOT}")
+        return 0
+
+    active = active_workspace()
+    print(f"🗂️ Workspaces ({REGISTRY}):")
+    if not spaces:
+        print("   (none registered)")
+    for n, p in sorted(spaces.items()):
+        marks = [m for m, on in (("default", registry.get("default") == n),
+                                 ("active", Path(p).resolve() == active)) if on]
+        tag = f" [{', '.join(marks)}]" if marks else ""
+        print(f" - {n} → {p}{tag}")
+    if active not in {Path(p).resolve() for p in spaces.values()}:
+        print(f"   active: {active} (unregistered)")
+    return 0
+
+
+def _list_in(path: Path, list_argv: List[str]) -> subprocess.CompletedProcess:
+    env = {k: v for k, v in os.environ.items() if k != "BILLY_DAEMON"}
+    env["BILLY_WORKSPACE"] = str(path)
+    return subprocess.run(
+        [sys.executable, "-c", "from agent_billy.cli import main; raise SystemExit(main())", "list", *list_argv],
+        cwd=str(PACKAGE_ROOT), env=env, capture_output=True, text=True,
+    )
+
+
+def list_all(jobs: Optional[int] = None, list_argv: Sequence[str] = (), fmt: str = "text") -> int:
+    """
+    `list` in every registered workspace (plus the active one), run in parallel.
+    `list_argv` (filters, paging, format) is applied in each workspace; JSON
+    output tags every project/version with its workspace name.
+    """
+    spaces = {n: Path(p).expanduser().resolve() for n, p in sorted(load_registry()["workspaces"].items())}
+    active = active_workspace()
+    if active not in spaces.values():
+        spaces = {"(active)": active, **spaces}
+    docs: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=jobs or min(8, len(spaces))) as pool:
+        results = pool.map(lambda p: _list_in(p, list(list_argv)) if p.is_dir() else None, spaces.values())
+        for (name, path), result in zip(spaces.items(), results):
+            if fmt == "text":
+                print(f"🗂️ {name} — {path}")
+                out = (result.stdout + result.stderr).rstrip() if result else ""
+                print("\n".join(f"   {line}" for line in out.splitlines()) if result else "   ❌ missing")
+            elif result is None or result.returncode:
+                reason = (result.stdout + result.stderr).strip() if result else "❌ missing"
+                print(f"{name} — {path}: {reason}", file=sys.stderr)
+            elif fmt == "jsonl":
+                for line in result.stdout.splitlines():
+                    sys.stdout.write(json.dumps({"workspace": name, **json.loads(line)}, ensure_ascii=False) + "\n")
+            else:
+                docs[name] = {"path": str(path), **json.loads(result.stdout)}
+    if fmt == "json":
+        print(json.dumps({"workspaces": docs}, indent=2, ensure_ascii=False))
+    return 0
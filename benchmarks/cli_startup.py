@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+CLI latency benchmark: eager imports vs lazy dispatch vs the warm daemon.
+
+Copies the workspace (billy.py, agent_billy/, memory.json, projects/) into a
+temp dir and times `list` and `run <project> <version>` there:
+
+- eager:  import every command module up front, as the CLI used to
+- and lists the agent_billy modules each command actually imports
+- lazy:   plain `billy.py` (cold interpreter, lazy subcommand imports)
+- daemon: `BILLY_DAEMON=1 billy.py` against a running `billy.py daemon start`
+
+    python3 benchmarks/cli_startup.py -n 20
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EAGER = (
+    "import sys; "
+    "import agent_billy.core, agent_billy.git_ops, agent_billy.log, agent_billy.chatlog, "
+    "agent_billy.matrix, agent_billy.runlog, agent_billy.blobstore, agent_billy.store, "
+    "agent_billy.lineage, agent_billy.sandbox, agent_billy.runcache, agent_billy.commitq, "
+    "agent_billy.search, agent_billy.envs; "
+    "from agent_billy.cli import main; raise SystemExit(main(sys.argv[1:]))"
+)
+
+
+def _copy_workspace(dest: Path) -> None:
+    shutil.copy2(ROOT / "billy.py", dest / "billy.py")
+    shutil.copytree(ROOT / "agent_billy", dest / "agent_billy",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    for name in ("memory.json", "memory.db"):
+        if (ROOT / name).exists():
+            shutil.copy2(ROOT / name, dest / name)
+    shutil.copytree(ROOT / "projects", dest / "projects")
+
+
+def _time(cmd, cwd: Path, env: dict, n: int) -> list:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=str(cwd), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _loaded_modules(argv, cwd: Path, env: dict) -> list:
+    """agent_billy modules a command imports (from -X importtime)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "billy.py", *argv], cwd=str(cwd), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    names = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if "agent_billy." in line}
+    return sorted(n.split(".", 1)[1] for n in names if n.startswith("agent_billy."))
+
+
+def _row(label: str, samples: list) -> str:
+    p95 = sorted(samples)[max(0, int(len(samples) * 0.95) - 1)]
+    return f"{label:<16} mean {statistics.mean(samples):7.1f} ms   p50 {statistics.median(samples):7.1f} ms   p95 {p95:7.1f} ms"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare cold/warm CLI latency")
+    parser.add_argument("-n", type=int, default=10, help="Invocations per measurement")
+    parser.add_argument("--project", default="agent_billy")
+    parser.add_argument("--version", default="v1")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = Path(tmp)
+        _copy_workspace(ws)
+        base_env = {k: v for k, v in os.environ.items() if k != "BILLY_DAEMON"}
+        commands = {"list": ["list"], "run": ["run", args.project, args.version]}
+
+        loaded = {name: _loaded_modules(argv, ws, base_env) for name, argv in commands.items()}
+        results = {}
+        for name, argv in commands.items():
+            results[(name, "eager")] = _time([sys.executable, "-c", EAGER, *argv], ws, base_env, args.n)
+            results[(name, "lazy")] = _time([sys.executable, "billy.py", *argv], ws, base_env, args.n)
+
+        subprocess.run([sys.executable, "billy.py", "daemon", "start"], cwd=str(ws), env=base_env,
+                       stdout=subprocess.DEVNULL, check=True)
+        try:
+            warm_env = {**base_env, "BILLY_DAEMON": "1"}
+            for name, argv in commands.items():
+                results[(name, "daemon")] = _time([sys.executable, "billy.py", *argv], ws, warm_env, args.n)
+        finally:
+            subprocess.run([sys.executable, "billy.py", "daemon", "stop"], cwd=str(ws), env=base_env,
+                           stdout=subprocess.DEVNULL, check=False)
+
+    print(f"📊 CLI latency over {args.n} invocations each")
+    for (name, mode), samples in results.items():
+        print(_row(f"{name} [{mode}]", samples))
+    for name, modules in loaded.items():
+        print(f"📦 {name} imports: {', '.join(modules)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Stress benchmark: N parallel writers hammering one memory.json.
+
+Each writer stamps `last_run`-style updates through `update_memory` and bumps a
+shared counter. At the end the counter must equal writers * updates, i.e. no
+update was lost. `--naive` runs the same load/modify/save loop without the
+transaction for comparison.
+
+    python3 benchmarks/memory_writers.py --writers 16 --updates 50
+"""
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent_billy.utils import load_memory, update_memory, _atomic_write_json, now_iso  # noqa: E402
+
+
+def _seed(path: Path, writers: int) -> None:
+    versions = {
+        f"v{i}": {"filename": f"projects/bench/bench_v{i}.py", "last_run": None, "runs": 0}
+        for i in range(writers)
+    }
+    memory = {"projects": {"bench": {"created_at": now_iso(), "versions": versions, "counter": 0}}}
+    _atomic_write_json(path, memory)
+
+
+def _writer(path: str, idx: int, updates: int, naive: bool) -> None:
+    path = Path(path)
+
+    def mutate(memory):
+        proj = memory["projects"]["bench"]
+        proj["counter"] += 1
+        v = proj["versions"][f"v{idx}"]
+        v["runs"] += 1
+        v["last_run"] = now_iso()
+
+    for _ in range(updates):
+        if naive:
+            memory = load_memory(path)
+            mutate(memory)
+            with path.open("w", encoding="utf-8") as f:
+                json.dump(memory, f, indent=2)
+        else:
+            update_memory(mutate, path)
+
+
+def run(writers: int, updates: int, naive: bool) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "memory.json"
+        _seed(path, writers)
+
+        start = time.perf_counter()
+        procs = [mp.Process(target=_writer, args=(str(path), i, updates, naive)) for i in range(writers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        expected = writers * updates
+        try:
+            proj = load_memory(path)["projects"]["bench"]
+            counter = proj["counter"]
+            per_writer = [proj["versions"][f"v{i}"]["runs"] for i in range(writers)]
+        except (ValueError, KeyError) as e:
+            print(f"❌ memory.json corrupted: {e}")
+            return 1
+
+    mode = "naive load/save" if naive else "update_memory"
+    print(f"📊 {mode}: {writers} writers × {updates} updates in {elapsed:.2f}s "
+          f"({expected / elapsed:.0f} updates/s)")
+    crashed = [p.exitcode for p in procs if p.exitcode != 0]
+    if crashed:
+        print(f"⚠️ {len(crashed)} writers crashed (exit codes {crashed})")
+    lost = expected - counter
+    if lost or any(n != updates for n in per_writer):
+        print(f"❌ Lost updates: counter={counter}, expected={expected}")
+        return 1
+    print(f"✅ No lost updates (counter={counter}).")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Parallel memory.json writer stress test")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=25)
+    parser.add_argument("--naive", action="store_true", help="Use unlocked load_memory/save for comparison")
+    args = parser.parse_args()
+    return run(args.writers, args.updates, args.naive)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark: synthetic workspaces of 10 / 1k / 100k versions.
+
+Each size tier is generated in a fresh temp workspace (BILLY_WORKSPACE) by a
+worker process: one project whose versions form deep `copied_from` chains
+(a new root every --chain versions) and a project log of --log-entries
+entries per version (capped at 200k). The worker then times the core
+operations against it, taking the median of --repeat runs (checkout_export
+materializes 8 versions spread across the project side by side):
+
+    create_project  add_version  list_projects  run_version
+    diff_versions   append_log   generate_chat_log   checkout_export
+
+Results are appended to benchmarks/history.json. The harness exits 1 when
+an operation is slower than the previous recorded run for the same tier by
+more than --threshold (relative) and --min-delta-ms (absolute). Offline;
+git is only used with --git.
+
+    python3 benchmarks/scale.py                      # 10 and 1k versions
+    python3 benchmarks/scale.py --sizes 10,1000,100000 --threshold 0.2
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY = ROOT / "benchmarks" / "history.json"
+OPS = ("create_project", "add_version", "list_projects", "run_version",
+       "diff_versions", "append_log", "generate_chat_log", "checkout_export")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Worker (runs inside the synthetic workspace)
+
+def _body(i: int) -> str:
+    # enough lines that diffs along the chain have real work to do
+    lines = [f"def step_{k}(x):\n    return x * {k} + {i % (k + 1)}\n" for k in range(40)]
+    return "".join(lines) + f"\nif __name__ == '__main__':\n    print(step_7({i}))\n"
+
+
+def _generate(size: int, chain: int, log_entries: int, git: bool) -> None:
+    from agent_billy import core, log
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        core.create_project("bench", "synthetic benchmark project", git)
+        entries = [{
+            "version": f"v{i}",
+            "content": _body(i),
+            "from_version": f"v{i - 1}" if (i - 1) % chain else None,
+            "description": f"synthetic {i}",
+        } for i in range(1, size + 1)]
+        for start in range(0, len(entries), 10000):  # bounded manifest batches
+            if core.add_versions("bench", entries[start:start + 10000]):
+                raise RuntimeError("synthetic import failed")
+
+    n = min(200_000, size * log_entries)
+    index = log._open_index("bench")
+    stamp = datetime(2020, 1, 1).timestamp()
+    batch = [{"ts": datetime.fromtimestamp(stamp + k).isoformat(timespec="seconds"),
+              "message": f"synthetic entry {k}"} for k in range(n)]
+    with log._lock("bench"):
+        log._append("bench", batch, index)
+        log._save_index("bench", index)
+
+
+def _measure(repeat: int, size: int, git: bool) -> dict:
+    from agent_billy import core, log, chatlog, checkout
+
+    counter = iter(range(10**9))
+    spread = sorted({f"v{1 + k * (size - 1) // 7}" for k in range(8)})
+    export_dir = os.path.join(os.environ["BILLY_WORKSPACE"], "export")
+    ops = {
+        "create_project": lambda: core.create_project(f"extra{next(counter)}", "", git),
+        "add_version": lambda: core.add_version("bench", f"new{next(counter)}", "bench"),
+        "list_projects": lambda: core.list_projects("bench"),
+        "run_version": lambda: core.run_version("bench", f"v{size}", warm=False, no_cache=True),
+        "diff_versions": lambda: core.diff_versions("bench", "v1", f"v{size}"),
+        "append_log": lambda: log.append_log("bench", "benchmark entry"),
+        "generate_chat_log": lambda: chatlog.generate_chat_log("bench", test_cycle="skip"),
+        "checkout_export": lambda: checkout.export("bench", spread, export_dir, force=True),
+    }
+    results = {}
+    for name in OPS:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()):
+                code = ops[name]()
+            samples.append((time.perf_counter() - start) * 1000)
+            if code:
+                raise RuntimeError(f"{name} failed ({code}):\n{out.getvalue()}")
+        results[name] = round(statistics.median(samples), 3)
+    return results
+
+
+def worker(size: int, args) -> int:
+    start = time.perf_counter()
+    _generate(size, args.chain, args.log_entries, args.git)
+    setup_s = time.perf_counter() - start
+    results = _measure(args.repeat, size, args.git)
+    print(json.dumps({"size": size, "setup_s": round(setup_s, 2), "ms": results}))
+    return 0
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Harness
+
+def _run_tier(size: int, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"billy-bench-{size}-") as ws:
+        env = {**os.environ, "BILLY_WORKSPACE": ws, "BILLY_METRICS": "0"}
+        env.pop("BILLY_DAEMON", None)
+        if args.git:
+            subprocess.run(["git", "init", "-q", ws], check=True)
+        cmd = [sys.executable, __file__, "--worker", str(size), "--repeat", str(args.repeat),
+               "--chain", str(args.chain), "--log-entries", str(args.log_entries)] + (["--git"] if args.git else [])
+        out = subprocess.run(cmd, cwd=str(ROOT), env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"tier {size} failed:\n{out.stderr}")
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _load_history() -> list:
+    if HISTORY.exists():
+        return json.loads(HISTORY.read_text(encoding="utf-8"))
+    return []
+
+
+def _git_head() -> str:
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                         capture_output=True, text=True)
+    return out.stdout.strip() if out.returncode == 0 else ""
+
+
+def _compare(tiers: dict, history: list, threshold: float, min_delta_ms: float) -> list:
+    """Regressions of this run against the latest earlier run of each tier."""
+    regressions = []
+    for size, tier in tiers.items():
+        previous = next((h["tiers"][size] for h in reversed(history) if size in h["tiers"]), None)
+        if previous is None:
+            continue
+        for op, ms in tier["ms"].items():
+            old = previous["ms"].get(op)
+            if old and ms > old * (1 + threshold) and ms - old > min_delta_ms:
+                regressions.append((size, op, old, ms))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time Billy's core operations on synthetic workspaces")
+    parser.add_argument("--sizes", default="10,1000", help="Comma-separated version counts (e.g. 10,1000,100000)")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Samples per operation (median is kept)")
+    parser.add_argument("--chain", type=int, default=1000, help="copied_from chain length before a new root")
+    parser.add_argument("--log-entries", type=int, default=20, help="Log entries per version (max 200k)")
+    parser.add_argument("--git", action="store_true", help="Enable git for the synthetic project")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--no-save", action="store_true", help="Compare only, don't append to the history")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        sys.path.insert(0, str(ROOT))
+        return worker(args.worker, args)
+
+    tiers = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"⏳ {size} versions…", flush=True)
+        tier = _run_tier(size, args)
+        tiers[str(size)] = tier
+        print(f"   generated in {tier['setup_s']:.1f}s")
+        for op in OPS:
+            print(f"   {op:<18} {tier['ms'][op]:9.2f} ms")
+
+    history = _load_history()
+    regressions = _compare(tiers, history, args.threshold, args.min_delta_ms)
+    if not args.no_save:
+        history.append({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_head(),
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "tiers": tiers,
+        })
+        HISTORY.write_text(json.dumps(history, indent=2) + "\n", encoding="utf-8")
+        print(f"📝 Recorded in {HISTORY.relative_to(ROOT)} ({len(history)} runs)")
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for size, op, old, new in regressions:
+            print(f"   {size:>7} versions  {op:<18} {old:9.2f} → {new:9.2f} ms ({new / old - 1:+.0%})")
+        return 1
+    print("✅ No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
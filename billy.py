@@ -2,4 +2,4 @@
 from agent_billy.cli import main
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
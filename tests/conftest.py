@@ -0,0 +1,60 @@
+from __future__ import annotations
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Billy resolves its workspace once, at import time (utils.WORKSPACE). Point
+# in-process imports at a throwaway workspace before any test module imports
+# agent_billy; CLI tests get a fresh workspace each through the `billy` fixture.
+_SESSION_WS = Path(tempfile.mkdtemp(prefix="billy-tests-"))
+os.environ["BILLY_WORKSPACE"] = str(_SESSION_WS)
+os.environ["BILLY_REGISTRY"] = str(_SESSION_WS / "registry.json")
+os.environ["BILLY_METRICS"] = "0"
+os.environ.pop("BILLY_GIT_ASYNC", None)
+os.environ.pop("BILLY_STORE", None)
+for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+    os.environ[var] = "Billy Tests"
+for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+    os.environ[var] = "billy-tests@example.com"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_SESSION_WS, ignore_errors=True)
+
+
+class Billy:
+    """Runs `billy.py` in a subprocess against its own workspace."""
+
+    def __init__(self, ws: Path):
+        self.ws = ws
+        self.env = {**os.environ, "BILLY_WORKSPACE": str(ws)}
+
+    def __call__(self, *args: str, ok: bool | None = True, env: dict | None = None) -> subprocess.CompletedProcess:
+        result = subprocess.run([sys.executable, str(ROOT / "billy.py"), *args], cwd=str(self.ws),
+                                env={**self.env, **(env or {})}, capture_output=True, text=True)
+        if ok is not None:
+            assert (result.returncode == 0) == ok, f"billy {' '.join(args)} → {result.returncode}\n" \
+                                                   f"{result.stdout}{result.stderr}"
+        return result
+
+    def git(self, *args: str) -> str:
+        return subprocess.run(["git", *args], cwd=str(self.ws), capture_output=True, text=True,
+                              check=True).stdout.strip()
+
+    def file(self, project: str, version: str) -> Path:
+        return self.ws / "projects" / project / f"{project}_{version}.py"
+
+
+@pytest.fixture
+def billy(tmp_path) -> Billy:
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    return Billy(ws)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+
+def _project(billy, *create_flags):
+    billy("create", "bs", "--blob-store", *create_flags)
+    billy("save-version", "bs", "v1", "-m", "first")
+    billy("save-version", "bs", "v2", "-m", "second")
+    return billy.file("bs", "v1"), billy.file("bs", "v2")
+
+
+def test_prune_working_removes_committed_files_and_rematerializes_them(billy):
+    v1, v2 = _project(billy, "--git")
+    assert "Working files to prune" in billy("gc", "--prune-working", "--dry-run").stdout
+    assert v1.exists() and v2.exists()
+
+    out = billy("gc", "--prune-working").stdout
+    assert "Working files pruned" in out and "Kept" not in out
+    assert not v1.exists() and not v2.exists()
+    assert billy.git("status", "--porcelain", "--", "projects") == ""  # pruned files stay tracked
+    assert "Hello from bs v1!" in billy("run", "bs", "v1").stdout
+
+
+def test_prune_working_keeps_files_git_does_not_have(billy):
+    v1, v2 = _project(billy)  # no git: the blob store would be the only copy
+    out = billy("gc", "--prune-working").stdout
+    assert "Kept 2 working files" in out and "--force" in out
+    assert v1.exists() and v2.exists()
+
+    billy("gc", "--prune-working", "--force")
+    assert not v1.exists() and not v2.exists()
+    assert "Hello from bs v1!" in billy("run", "bs", "v2").stdout  # v2 was auto-copied from v1
+    assert "# Version: v2" in v2.read_text()
+
+
+def test_prune_working_keeps_files_with_uncommitted_commits(billy):
+    v1, v2 = _project(billy, "--git")
+    billy.git("reset", "-q", "--soft", "HEAD~1")  # v2's content is no longer in HEAD
+    billy.git("reset", "-q")
+    assert "Kept 1 working files" in billy("gc", "--prune-working").stdout
+    assert not v1.exists() and v2.exists()
+
+
+def test_gc_removes_unreferenced_objects(billy):
+    _project(billy)
+    objects = billy.ws / ".billy" / "objects"
+    stray = objects / "ab" / ("0" * 62)
+    stray.parent.mkdir(parents=True, exist_ok=True)
+    stray.write_bytes(b"orphan")
+    assert "would remove 1 unreferenced objects" in billy("gc", "--dry-run").stdout
+    assert stray.exists()
+    assert "removed 1 unreferenced objects" in billy("gc").stdout
+    assert not stray.exists()
+    assert "Hello from bs v1!" in billy("run", "bs", "v1").stdout
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json
+
+
+def _versions(billy, project):
+    return json.loads((billy.ws / "memory.json").read_text())["projects"][project]["versions"]
+
+
+def test_manifest_import_lands_in_one_commit_with_a_tag_per_version(billy, tmp_path):
+    billy("create", "bk", "--git")
+    billy("save-version", "bk", "v1", "-m", "first")
+    (tmp_path / "two.py").write_text("print('two')\n")
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("\n".join(json.dumps(e) for e in [
+        {"version": "v2", "file": "two.py", "from_version": "v1", "description": "from a file"},
+        {"version": "bk_v3", "content": "print('three')\n", "from_version": "v2"},
+    ]) + "\n")
+    before = int(billy.git("rev-list", "--count", "HEAD"))
+
+    assert "Imported 2 versions into 'bk'" in billy("save-versions", "bk", str(manifest), "-m", "batch").stdout
+    assert int(billy.git("rev-list", "--count", "HEAD")) == before + 1
+    assert billy.git("log", "-1", "--format=%s") == "bk: import 2 versions (v2..v3): batch"
+    assert set(billy.git("tag", "--points-at", "HEAD").split()) == {"bk_v2", "bk_v3"}
+    versions = _versions(billy, "bk")
+    assert (versions["v2"]["copied_from"], versions["v3"]["copied_from"]) == ("v1", "v2")
+    assert versions["v2"]["description"] == "from a file" and versions["v3"]["description"] == "batch"
+    assert "print('three')" in billy.file("bk", "v3").read_text()
+    assert "three" in billy("run", "bk", "v3").stdout
+
+
+def test_bad_manifests_are_rejected_before_anything_is_written(billy, tmp_path):
+    billy("create", "bk")
+    manifest = tmp_path / "m.jsonl"
+    for entries, message in [
+        ([{"version": "v1"}, {"version": "v1"}], "appears twice"),
+        ([{"version": "v1", "from_version": "v2"}, {"version": "v2"}], "comes later in the manifest"),
+        ([{"version": "v1", "from_version": "nope"}], "unknown version 'nope'"),
+    ]:
+        manifest.write_text("\n".join(json.dumps(e) for e in entries) + "\n")
+        assert message in billy("save-versions", "bk", str(manifest), ok=False).stdout
+    manifest.write_text("{not json\n")
+    assert "line 1: invalid JSON" in billy("save-versions", "bk", str(manifest), ok=False).stdout
+    assert _versions(billy, "bk") == {}
+
+
+def test_directory_import_rewrites_existing_headers(billy, tmp_path):
+    billy("create", "src")
+    billy("save-version", "src", "v1", "-m", "first")
+    billy("create", "bk")
+    exported = tmp_path / "exported"
+    exported.mkdir()
+    (exported / "bk_v1.py").write_text(billy.file("src", "v1").read_text())
+    (exported / "v2.py").write_text("print('bare')\n")
+
+    assert "Imported 2 versions" in billy("save-versions", "bk", str(exported)).stdout
+    text = billy.file("bk", "v1").read_text()
+    assert text.count("# Version:") == 1 and text.count("# Project:") == 1
+    assert "# Project: bk\n# Version: v1\n" in text
+    bare = billy.file("bk", "v2").read_text()
+    assert "# Version: v2" in bare and bare.endswith("print('bare')\n")
+    assert "Hello from src v1!" in billy("run", "bk", "v1").stdout
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json
+import time
+
+import pytest
+
+
+@pytest.fixture
+def project(billy):
+    billy("create", "cl", "--git")
+    billy("save-version", "cl", "v1", "-m", "first cut")
+    billy("save-version", "cl", "v2", "-m", "second cut")
+    return billy
+
+
+def _notes(billy, *args):
+    return json.loads(billy("changelog", "cl", *args, "--json").stdout)
+
+
+def _comparable(notes):
+    return {k: v for k, v in notes.items() if k not in ("generated_at", "source")}
+
+
+def test_cache_is_reused_then_extended_when_head_moves(project):
+    billy = project
+    first = _notes(billy)
+    assert first["source"] == "git"
+    assert [v["version"] for v in first["versions"]] == ["v2", "v1"]
+    assert _notes(billy)["source"] == "cached"
+
+    time.sleep(1.1)  # timestamps have one-second resolution; keep the entry strictly between v2 and v3
+    billy("log", "cl", "tried a new approach")
+    time.sleep(1.1)
+    billy("save-version", "cl", "v3", "-m", "third cut")
+    extended = _notes(billy)
+    assert extended["source"] == "extended"
+    assert [v["version"] for v in extended["versions"]] == ["v3", "v2", "v1"]
+    assert extended["totals"]["versions"] == 3
+    assert _comparable(extended) == _comparable(_notes(billy, "--no-cache"))
+    assert [e["message"] for e in extended["versions"][0]["log"]] == ["tried a new approach"]
+
+
+def test_cache_is_not_extended_across_rewritten_history(project):
+    billy = project
+    _notes(billy)
+    billy.git("reset", "-q", "--hard", "HEAD~1")
+    billy.git("commit", "-q", "--allow-empty", "-m", "unrelated")
+    assert _notes(billy)["source"] == "git"
+
+
+def test_range_between_versions(project):
+    billy = project
+    billy("save-version", "cl", "v3", "-m", "third cut")
+    notes = _notes(billy, "v1", "cl_v3")
+    assert (notes["from"], notes["to"]) == ("v1", "v3")
+    assert [v["version"] for v in notes["versions"]] == ["v3", "v2"]
+    assert notes["versions"][0]["description"] == "third cut"
+    assert notes["versions"][0]["copied_from"] == "v2"
+
+
+def test_markdown_output_file_and_bad_input(project, tmp_path):
+    billy = project
+    out = tmp_path / "CHANGELOG.md"
+    assert "2 versions" in billy("changelog", "cl", "-o", str(out)).stdout
+    text = out.read_text()
+    assert "v2" in text and "second cut" in text
+    billy("changelog", "cl", "no-such-rev", ok=False)
+    billy("create", "plain")
+    assert "no git history" in billy("changelog", "plain", ok=False).stdout
+
+
+def test_extension_across_a_merge_keeps_excluding_the_start(project, tmp_path):
+    billy = project
+    # a side branch off v1, whose tip is the changelog's FROM
+    side = tmp_path / "side"
+    billy.git("worktree", "add", "-q", "-b", "side", str(side), "cl_v1")
+    (side / "projects" / "cl" / "side.txt").write_text("side work\n")
+    billy.git("-C", str(side), "add", "projects/cl/side.txt")
+    billy.git("-C", str(side), "commit", "-q", "-m", "side work")
+    start = billy.git("rev-parse", "side")
+    assert [v["version"] for v in _notes(billy, start)["versions"]] == ["v2"]
+
+    time.sleep(1.1)
+    billy.git("merge", "-q", "--no-ff", "-m", "merge side", "side")
+    time.sleep(1.1)
+    billy("save-version", "cl", "v3", "-m", "third cut")
+    extended = _notes(billy, start)
+    assert extended["source"] == "extended"
+    subjects = [c["subject"] for v in extended["versions"] for c in v["commits"]]
+    assert "side work" not in subjects and "merge side" in subjects
+    assert _comparable(extended) == _comparable(_notes(billy, start, "--no-cache"))
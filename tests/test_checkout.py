@@ -0,0 +1,80 @@
+from __future__ import annotations
+import os
+
+import pytest
+
+
+@pytest.fixture
+def project(billy):
+    billy("create", "co", "--git")
+    billy("save-version", "co", "v1", "-m", "first")
+    billy("save-version", "co", "v2", "-m", "second")
+    return billy
+
+
+def test_restore_missing_file_from_its_commit(project):
+    billy = project
+    path = billy.file("co", "v1")
+    original = path.read_bytes()
+    path.unlink()
+
+    out = billy("checkout", "co", "v1").stdout
+    assert "Restored v1 (1 file, 1 changed)" in out
+    assert path.read_bytes() == original
+    assert os.access(path, os.X_OK)
+    assert billy.git("status", "--porcelain", "--", str(path)) == ""
+
+
+def test_restore_refuses_to_overwrite_edits_without_force(project):
+    billy = project
+    path = billy.file("co", "v2")
+    original = path.read_bytes()
+    path.write_text("edited\n")
+
+    result = billy("checkout", "co", "v2", ok=False)
+    assert "would be overwritten (use --force)" in result.stdout
+    assert path.read_text() == "edited\n"
+    billy("checkout", "co", "v2", "--force")
+    assert path.read_bytes() == original
+
+
+def test_restore_by_tag_name_and_unknown_spec(project):
+    billy = project
+    billy.file("co", "v1").unlink()
+    assert "Restored v1" in billy("checkout", "co", "co_v1").stdout
+    billy("checkout", "co", "nonexistent", ok=False)
+
+
+def test_restore_from_blob_store_without_git(billy):
+    billy("create", "bl", "--blob-store")
+    billy("save-version", "bl", "v1", "-m", "first")
+    path = billy.file("bl", "v1")
+    original = path.read_bytes()
+    path.unlink()
+    billy("checkout", "bl", "v1")
+    assert path.read_bytes() == original
+
+
+def test_export_several_versions_side_by_side(project, tmp_path):
+    billy = project
+    dest = tmp_path / "out"
+    out = billy("checkout", "co", "v1", "v2", "--to", str(dest)).stdout
+    assert "Exported 2/2 versions" in out
+    for v in ("v1", "v2"):
+        assert (dest / v / f"co_{v}.py").read_bytes() == billy.file("co", v).read_bytes()
+
+    billy("checkout", "co", "v1", "--to", str(dest), ok=False)  # not empty
+    billy("checkout", "co", "v1", "--to", str(dest), "--force")
+
+
+def test_export_whole_tree_as_of_a_version(project, tmp_path):
+    billy = project
+    dest = tmp_path / "out"
+    billy("checkout", "co", "v1", "--all", "--to", str(dest))
+    assert sorted(p.name for p in (dest / "v1").iterdir()) == ["co_v1.py"]
+    billy("checkout", "co", "v2", "--all", "--to", str(dest))
+    assert sorted(p.name for p in (dest / "v2").iterdir()) == ["co_v1.py", "co_v2.py"]
+
+
+def test_restore_in_place_takes_one_version(project):
+    assert "takes one version" in project("checkout", "co", "v1", "v2", ok=False).stdout
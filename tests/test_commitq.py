@@ -0,0 +1,69 @@
+from __future__ import annotations
+import fcntl
+import json
+
+import pytest
+
+
+@pytest.fixture
+def queued(billy):
+    billy("create", "cq", "--git")
+    billy.env.update({"BILLY_GIT_ASYNC": "1", "BILLY_GIT_QUEUE_DELAY": "2", "BILLY_GIT_QUEUE_IDLE": "0.5"})
+    return billy
+
+
+def _versions(billy):
+    return json.loads((billy.ws / "memory.json").read_text())["projects"]["cq"]["versions"]
+
+
+def _commits(billy):
+    return int(billy.git("rev-list", "--count", "HEAD"))
+
+
+def test_burst_of_saves_is_coalesced_into_one_commit(queued):
+    billy = queued
+    before = _commits(billy)
+    for v in ("v1", "v2", "v3"):
+        assert f"commit + tag cq_{v} queued" in billy("save-version", "cq", v, "-m", f"cut {v}").stdout
+    assert _commits(billy) == before  # nothing has waited on git
+
+    billy("flush")
+    assert _commits(billy) == before + 1
+    assert set(billy.git("tag", "--points-at", "HEAD").split()) == {"cq_v1", "cq_v2", "cq_v3"}
+    assert billy.git("log", "-1", "--format=%s") == "3 queued changes"
+    head = billy.git("rev-parse", "HEAD")
+    assert {m["git_commit"] for m in _versions(billy).values()} == {head}
+
+
+def test_intents_survive_without_a_worker_and_flush_lands_them(queued):
+    billy = queued
+    queue = billy.ws / ".billy" / "commitq"
+    queue.mkdir(parents=True)
+    with (queue / "worker.lock").open("a+") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)  # as if a worker had died holding the queue
+        billy("save-version", "cq", "v1", "-m", "first")
+        billy("save-version", "cq", "v2", "-m", "second")
+        assert len(list(queue.glob("*.json"))) == 2
+        assert "2 pending" in billy("commit-queue").stdout
+    assert "Flushed 2 intent(s) in 1 commit(s)" in billy("flush").stdout
+    assert not list(queue.glob("*.json"))
+    assert all(m["git_commit"] for m in _versions(billy).values())
+    assert "Commit queue is empty" in billy("flush").stdout
+
+
+def test_failed_intents_are_kept_and_retried_by_flush(queued):
+    billy = queued
+    hook = billy.ws / ".git" / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    hook.chmod(0o755)
+    billy("save-version", "cq", "v1", "-m", "first")
+    billy("flush", ok=False)
+    queue = billy.ws / ".billy" / "commitq"
+    assert len(list(queue.glob("*.failed"))) == 1
+    assert "1 failed" in billy("commit-queue").stdout
+    assert _versions(billy)["v1"].get("git_commit") is None
+
+    hook.unlink()
+    billy("flush")  # the retry lands whether flush or a still-idling worker commits it
+    assert not list(queue.glob("*.failed"))
+    assert _versions(billy)["v1"]["git_commit"] == billy.git("rev-parse", "cq_v1")
@@ -0,0 +1,40 @@
+from __future__ import annotations
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def daemon(billy):
+    billy("create", "dm")
+    billy("save-version", "dm", "v1", "-m", "first")
+    billy("daemon", "start")
+    billy.env["BILLY_DAEMON"] = "1"
+    yield billy
+    billy("daemon", "stop")
+
+
+def test_long_run_does_not_block_other_commands(daemon):
+    billy = daemon
+    billy.file("dm", "v1").write_text("import time\ntime.sleep(2)\nprint('slept')\n")
+    done = {}
+    worker = threading.Thread(target=lambda: done.setdefault("run", billy("run", "dm", "v1")))
+    worker.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    assert "dm" in billy("list").stdout
+    assert time.perf_counter() - start < 1.5
+    worker.join()
+    assert "slept" in done["run"].stdout
+    assert "2 commands served" in billy("daemon", "status").stdout
+
+
+def test_requests_with_other_settings_run_outside_the_daemon(daemon):
+    billy = daemon
+    billy("run-cache", "dm", "--enable")
+    billy("run", "dm", "v1")
+    # BILLY_METRICS is read once at import; the daemon must not serve it with its own value
+    billy("list", env={"BILLY_METRICS": "1"})
+    assert (billy.ws / ".billy" / "metrics.prom").exists()
+    assert "2 commands served" in billy("daemon", "status").stdout
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import difflib
+
+import pytest
+
+from agent_billy import diffing
+
+OLD = b"a\nb\nc\nd\n"
+NEW = b"a\nB\nc\nd\ne\n"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(diffing, "CACHE_DIR", tmp_path / "diffcache")
+    return tmp_path / "diffcache"
+
+
+def test_unified_matches_difflib_and_stat_counts_lines():
+    expected = list(difflib.unified_diff(OLD.decode().splitlines(), NEW.decode().splitlines(), lineterm=""))[2:]
+    assert diffing.render(OLD, NEW) == expected
+    assert diffing.render(OLD, NEW, "stat") == ["2 1"]
+    assert diffing.render(OLD, OLD) == [] and diffing.render(OLD, OLD, "stat") == ["0 0"]
+
+
+def test_side_by_side_marks_changes():
+    body = diffing.render(OLD, NEW, "side", width=23)
+    assert body[0] == "@@ 1 | 1 @@"
+    assert "b          | B" in body and body[-1].endswith("> e")
+
+
+def test_rendered_pairs_are_cached_by_content(cache_dir):
+    first = diffing.render(OLD, NEW, context=1)
+    cached = list(cache_dir.rglob("*.gz"))
+    assert len(cached) == 1
+    assert diffing.render(OLD, NEW, context=1) == first
+    assert len(list(cache_dir.rglob("*.gz"))) == 1  # served from the cache, not re-rendered
+    diffing.render(OLD, NEW, context=2)  # other options → another entry
+    assert len(list(cache_dir.rglob("*.gz"))) == 2
+
+
+@pytest.fixture
+def chain(billy):
+    billy("create", "df")
+    billy("save-version", "df", "v1", "-m", "first")
+    billy("save-version", "df", "v2", "-m", "second")
+    path = billy.file("df", "v2")
+    path.write_text(path.read_text().replace("Hello from", "Howdy from"))
+    billy("save-version", "df", "v3", "-m", "third")
+    return billy
+
+
+def test_diff_any_pair_without_git(chain):
+    out = chain("diff", "df", "v1", "v2").stdout
+    assert "--- projects/df/df_v1.py" in out and "+++ projects/df/df_v2.py" in out
+    assert "-    print('Hello from df v1!')" in out and "+    print('Howdy from df v1!')" in out
+    assert "v1 → v2 |" in chain("diff", "df", "v1", "v2", "--stat").stdout
+    assert "One of the versions not found" in chain("diff", "df", "v1", "v9", ok=False).stdout
+
+
+def test_diff_chain_walks_the_lineage(chain):
+    out = chain("diff-chain", "df", "v3").stdout
+    assert "Lineage of df/v3: v1 → v2 → v3" in out
+    assert "── v1 → v2" in out and "── v2 → v3" in out
+    assert out.count("+    print('Howdy") == 1
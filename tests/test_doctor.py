@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+
+@pytest.fixture
+def project(billy):
+    billy("create", "dr", "--git")
+    billy("save-version", "dr", "v1", "-m", "first")
+    billy("save-version", "dr", "v2", "-m", "second")
+    assert "No problems found" in billy("doctor").stdout
+    return billy
+
+
+def _edit_memory(billy, mutate):
+    path = billy.ws / "memory.json"
+    memory = json.loads(path.read_text())
+    mutate(memory["projects"]["dr"]["versions"])
+    path.write_text(json.dumps(memory, indent=2))
+
+
+def _report(billy, *args, ok=None):
+    result = billy("doctor", "--json", *args, ok=ok)
+    return json.loads(result.stdout), result.returncode
+
+
+def _checks(report):
+    return sorted((i["check"], i["version"]) for i in report["issues"])
+
+
+def test_fix_restores_missing_file_and_tag(project):
+    billy = project
+    original = billy.file("dr", "v1").read_bytes()
+    billy.file("dr", "v1").unlink()
+    billy.git("tag", "-d", "dr_v2")
+
+    report, code = _report(billy)
+    assert code == 1
+    assert _checks(report) == [("missing_file", "v1"), ("tag_mismatch", "v2")]
+    assert all(i["fixable"] and not i["fixed"] for i in report["issues"])
+
+    report, code = _report(billy, "--fix")
+    assert code == 0 and report["fixed"] == 2
+    assert billy.file("dr", "v1").read_bytes() == original
+    commit = json.loads((billy.ws / "memory.json").read_text())["projects"]["dr"]["versions"]["v2"]["git_commit"]
+    assert billy.git("rev-parse", "dr_v2^{commit}") == commit
+    assert "No problems found" in billy("doctor").stdout
+
+
+def test_fix_repairs_headers_lineage_and_git_commit(project):
+    billy = project
+    path = billy.file("dr", "v2")
+    path.write_text(path.read_text().replace("# Version: v2", "# Version: v7"))
+    _edit_memory(billy, lambda versions: versions["v2"].update(copied_from="ghost"))
+    tagged = billy.git("rev-parse", "dr_v1^{commit}")
+    _edit_memory(billy, lambda versions: versions["v1"].pop("git_commit"))
+
+    report, _ = _report(billy)
+    assert _checks(report) == [("broken_lineage", "v2"), ("header_mismatch", "v2"), ("uncommitted", "v1")]
+
+    report, code = _report(billy, "--fix")
+    assert code == 0 and report["fixed"] == 3
+    assert "# Version: v2" in path.read_text()
+    versions = json.loads((billy.ws / "memory.json").read_text())["projects"]["dr"]["versions"]
+    assert versions["v2"]["copied_from"] is None
+    assert versions["v1"]["git_commit"] == tagged
+    assert "No problems found" in billy("doctor").stdout
+
+
+def test_commit_lost_after_a_previous_clean_run_is_reported(project):
+    billy = project
+    memory = (billy.ws / "memory.json").read_bytes()
+    billy.git("tag", "-d", "dr_v2")
+    billy.git("reset", "-q", "--hard", "HEAD~1")
+    (billy.ws / "memory.json").write_bytes(memory)  # metadata still points at the dropped commit
+    billy.git("reflog", "expire", "--expire=now", "--all")
+    billy.git("gc", "-q", "--prune=now")
+
+    report, code = _report(billy)
+    assert code == 1
+    assert ("missing_commit", "v2") in _checks(report)
+
+
+def test_orphan_files_are_warnings(project):
+    billy = project
+    (billy.ws / "projects" / "dr" / "stray.py").write_text("x = 1\n")
+    report, code = _report(billy)
+    assert code == 0
+    assert [(i["check"], i["severity"], i["path"]) for i in report["issues"]] == \
+        [("orphan_file", "warning", "projects/dr/stray.py")]
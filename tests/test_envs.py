@@ -0,0 +1,69 @@
+from __future__ import annotations
+import zipfile
+
+import pytest
+
+
+def _wheel(house, name, version, body, requires=()):
+    """A minimal pure-Python wheel `name` exposing module `name` with `body`."""
+    dist = f"{name}-{version}.dist-info"
+    meta = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n" + \
+        "".join(f"Requires-Dist: {r}\n" for r in requires)
+    files = {
+        f"{name}/__init__.py": body,
+        f"{dist}/METADATA": meta,
+        f"{dist}/WHEEL": "Wheel-Version: 1.0\nGenerator: billy-tests\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    files[f"{dist}/RECORD"] = "".join(f"{path},,\n" for path in files) + f"{dist}/RECORD,,\n"
+    with zipfile.ZipFile(house / f"{name}-{version}-py3-none-any.whl", "w") as zf:
+        for path, text in files.items():
+            zf.writestr(path, text)
+
+
+@pytest.fixture
+def env_project(billy, tmp_path):
+    house = tmp_path / "wheelhouse"
+    house.mkdir()
+    _wheel(house, "tinymod", "1.0", "VALUE = 42\n")
+    _wheel(house, "tinyapp", "2.0", "from tinymod import VALUE\nANSWER = VALUE\n", requires=["tinymod"])
+    billy.env["BILLY_WHEELHOUSE"] = str(house)
+    billy("create", "en")
+    script = "import tinyapp\nprint('answer', tinyapp.ANSWER)\n"
+    for v in ("v1", "v2"):
+        billy("save-version", "en", v, "-m", v, "--content", script)
+        billy("deps", "en", v, "tinyapp")
+    return billy
+
+
+def test_run_uses_a_pinned_env_shared_by_identical_dependency_sets(env_project):
+    billy = env_project
+    first = billy("run", "en", "v1").stdout
+    assert "Built env" in first and "answer 42" in first
+    second = billy("run", "en", "v2").stdout
+    assert "answer 42" in second and "Built env" not in second
+    listing = billy("envs").stdout
+    assert "1 env(s)" in listing and "tinyapp==2.0, tinymod==1.0" in listing
+
+    # the env hardlinks the wheel unpacked once under envs/wheels
+    module = next((billy.ws / ".billy" / "envs").glob("*/lib/python*/site-packages/tinymod/__init__.py"))
+    assert module.stat().st_nlink >= 2
+
+
+def test_unresolvable_dependencies_fail_the_run(env_project):
+    billy = env_project
+    billy("deps", "en", "v1", "nosuchdist>=1", "--clear")
+    out = billy("run", "en", "v1", ok=False).stdout
+    assert "Dependencies of en/v1" in out and "cannot resolve nosuchdist" in out
+
+
+def test_least_recently_used_envs_are_evicted(env_project):
+    billy = env_project
+    billy.env["BILLY_ENV_MAX"] = "1"
+    billy("deps", "en", "v2", "tinymod", "--clear")
+    billy.file("en", "v2").write_text("import tinymod\nprint('value', tinymod.VALUE)\n")
+    billy("run", "en", "v1")
+    assert "Built env" in billy("run", "en", "v2").stdout
+    assert "1 env(s) (max 1" in billy("envs").stdout
+    assert "Built env" in billy("run", "en", "v1").stdout  # v1's env was evicted
+    assert "Removed 1 env(s)" in billy("envs", "gc", "--keep", "0").stdout
+    assert not list((billy.ws / ".billy" / "envs" / "wheels").iterdir())
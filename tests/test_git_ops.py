@@ -0,0 +1,60 @@
+from __future__ import annotations
+import json
+import subprocess
+
+import pytest
+
+from agent_billy.git_ops import CatFileSession, head_ref, resolve_ref
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", *args], cwd=str(repo), capture_output=True, text=True, check=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q", "-b", "main")
+    for n in (1, 2):
+        (tmp_path / "f.txt").write_text(f"content {n}\n")
+        _git(tmp_path, "add", "f.txt")
+        _git(tmp_path, "commit", "-q", "-m", f"commit {n}")
+    _git(tmp_path, "tag", "first", "HEAD~1")
+    return tmp_path
+
+
+def test_refs_resolve_loose_and_packed(repo):
+    git_dir = repo / ".git"
+    head = _git(repo, "rev-parse", "HEAD")
+    assert head_ref(git_dir) == ("refs/heads/main", head)
+    _git(repo, "pack-refs", "--all")
+    assert not (git_dir / "refs" / "tags" / "first").exists()
+    assert resolve_ref("refs/tags/first", git_dir) == _git(repo, "rev-parse", "first")
+    assert resolve_ref("refs/tags/nope", git_dir) is None
+
+
+def test_cat_file_session_reads_objects_revs_and_history(repo):
+    with CatFileSession(repo) as git:
+        sha, kind, data = git.read("first:f.txt")
+        assert (kind, data) == ("blob", b"content 1\n")
+        assert sha == _git(repo, "rev-parse", "first:f.txt")
+        assert git.read("HEAD:missing.txt") is None
+        assert git.rev_parse("first") == _git(repo, "rev-parse", "first")
+        assert git.log("HEAD") == _git(repo, "log", "--oneline", "--abbrev=7", "--first-parent").splitlines()
+        assert git.read("HEAD:f.txt")[2] == b"content 2\n"  # the session stays usable after a miss
+
+
+@pytest.mark.parametrize("backend", ["subprocess", "fast-import"])
+def test_backends_commit_tag_and_leave_the_index_clean(billy, backend):
+    billy("--git-backend", backend, "create", "gb", "--git")
+    before = int(billy.git("rev-list", "--count", "HEAD"))
+    for v in ("v1", "v2"):
+        billy("--git-backend", backend, "save-version", "gb", v, "-m", f"cut {v}")
+    assert int(billy.git("rev-list", "--count", "HEAD")) == before + 2
+
+    versions = json.loads((billy.ws / "memory.json").read_text())["projects"]["gb"]["versions"]
+    for v in ("v1", "v2"):
+        tag = f"gb_{v}"
+        assert billy.git("rev-parse", f"{tag}^{{commit}}") == versions[v]["git_commit"]
+        assert billy.git("show", f"{tag}:projects/gb/gb_{v}.py") == billy.file("gb", v).read_text().rstrip("\n")
+    assert billy.git("log", "-1", "--format=%an <%ae>") == "Billy Tests <billy-tests@example.com>"
+    assert billy.git("status", "--porcelain", "--", "projects") == ""
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+from agent_billy.lineage import LineageIndex, merge3
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = LineageIndex(tmp_path / "lineage.db")
+    #        v1
+    #       /  \
+    #     v2    v3
+    #    /  \     \
+    #  v4    v5    v6 ─ v7
+    idx.add("p", {"v1": None, "v2": "v1", "v3": "v1", "v4": "v2", "v5": "v2", "v6": "v3", "v7": "v6"})
+    idx.add("other", {"r1": None, "r2": None})
+    yield idx
+    idx.close()
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("v4", "v5", "v2"),
+    ("v4", "v7", "v1"),
+    ("v7", "v3", "v3"),
+    ("v2", "v2", "v2"),
+    ("v1", "v6", "v1"),
+])
+def test_lca(index, a, b, expected):
+    assert index.lca("p", a, b) == expected
+    assert index.lca("p", b, a) == expected
+
+
+def test_lca_of_separate_roots_is_none(index):
+    assert index.lca("other", "r1", "r2") is None
+
+
+def test_ancestry_queries(index):
+    assert index.ancestors("p", "v7") == ["v6", "v3", "v1"]
+    assert sorted(index.descendants("p", "v2")) == ["v4", "v5"]
+    assert index.depth("p", "v7") == 3
+    assert index.depth("p", "missing") is None
+
+
+def test_add_refuses_unknown_parent(index):
+    assert index.add("p", {"v9": "v8"}) is False
+    assert index.depth("p", "v9") is None
+
+
+BASE = ["a", "b", "c", "d", "e"]
+
+
+def test_merge3_applies_non_overlapping_changes_from_both_sides():
+    ours = ["a", "B", "c", "d", "e"]
+    theirs = ["a", "b", "c", "d", "E", "f"]
+    merged, conflicts = merge3(BASE, ours, theirs)
+    assert (merged, conflicts) == (["a", "B", "c", "d", "E", "f"], 0)
+
+
+def test_merge3_identical_changes_do_not_conflict():
+    same = ["a", "b", "X", "d", "e"]
+    assert merge3(BASE, same, list(same)) == (same, 0)
+
+
+def test_merge3_overlapping_changes_conflict_diff3_style():
+    merged, conflicts = merge3(BASE, ["a", "b", "OURS", "d", "e"], ["a", "b", "THEIRS", "d", "e"],
+                               labels=("v2", "v1", "v3"))
+    assert conflicts == 1
+    assert merged == ["a", "b",
+                      "<<<<<<< v2", "OURS", "||||||| v1", "c", "=======", "THEIRS", ">>>>>>> v3",
+                      "d", "e"]
+
+
+def test_merge3_deletion_against_edit_conflicts():
+    merged, conflicts = merge3(BASE, ["a", "b", "d", "e"], ["a", "b", "C", "d", "e"])
+    assert conflicts == 1
+    assert "<<<<<<< ours" in merged and ">>>>>>> theirs" in merged
+
+
+def _import(billy, project, rows):
+    manifest = billy.ws / f"{project}.jsonl"
+    manifest.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    billy("save-versions", project, str(manifest))
+
+
+def test_merge_command_clean_and_conflicting(billy):
+    billy("create", "m")
+    body = "x = 1\ny = 2\nz = 3\n"
+    _import(billy, "m", [
+        {"version": "v1", "content": body},
+        {"version": "v2", "from_version": "v1", "content": body.replace("x = 1", "x = 10")},
+        {"version": "v3", "from_version": "v1", "content": body.replace("z = 3", "z = 30")},
+        {"version": "v4", "from_version": "v1", "content": body.replace("x = 1", "x = 99")},
+    ])
+
+    out = billy("merge", "m", "v2", "v3").stdout
+    assert "(base v1): clean." in out
+    assert "x = 10" in out and "z = 30" in out and "<<<<<<<" not in out
+
+    result = billy("merge", "m", "v2", "v4", ok=False)
+    assert "1 conflict(s)." in result.stdout
+    assert "<<<<<<< v2\nx = 10\n||||||| v1\nx = 1\n=======\nx = 99\n>>>>>>> v4" in result.stdout
+
+    billy("merge", "m", "v2", "v3", "--save", "v5")
+    merged = billy.file("m", "v5").read_text()
+    assert "x = 10" in merged and "z = 30" in merged
+    assert "# Version: v5" in merged
+    meta = json.loads(billy("list", "m", "--jsonl").stdout.splitlines()[-1])
+    assert (meta["version"], meta["copied_from"], meta["merged_from"]) == ("v5", "v2", "v3")
+    assert "v5 (depth 2) ← v2 ← v1" in billy("lineage", "m", "v5").stdout
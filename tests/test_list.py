@@ -0,0 +1,66 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+VERSIONS = [f"v{i}" for i in range(1, 13)]  # v1 … v12: lexical order would put v10 after v1
+
+
+@pytest.fixture
+def many(billy, tmp_path):
+    for name in ("beta", "alpha"):  # projects list in creation order
+        billy("create", name)
+    manifest = tmp_path / "m.jsonl"
+    manifest.write_text("".join(json.dumps({"version": v, "content": f"print('{v}')\n",
+                                            **({"from_version": "v1"} if v in ("v2", "v11") else {})}) + "\n"
+                                for v in VERSIONS))
+    billy("save-versions", "alpha", str(manifest))
+    billy("save-version", "beta", "v1", "-m", "only")
+    return billy
+
+
+def _jsonl(billy, *args):
+    return [json.loads(line) for line in billy("list", *args, "--jsonl").stdout.splitlines()]
+
+
+def test_versions_come_in_natural_order(many):
+    assert [r["version"] for r in _jsonl(many, "alpha")] == VERSIONS
+
+
+def test_cursor_pages_cover_every_version_once(many):
+    billy, seen, after = many, [], None
+    while True:
+        doc = json.loads(billy("list", "alpha", "--json", "--limit", "5",
+                               *(["--after", after] if after else [])).stdout)
+        seen += [r["version"] for r in doc["versions"]]
+        after = doc["next"]
+        if after is None:
+            break
+    assert seen == VERSIONS
+    assert [r["version"] for r in _jsonl(billy, "alpha", "--offset", "9", "--limit", "2")] == ["v10", "v11"]
+
+
+def test_text_output_prints_the_next_cursor(many):
+    out = many("list", "alpha", "--limit", "3").stdout
+    assert "- v3 →" in out and "- v4 →" not in out and "… more: --after v3" in out
+
+
+def test_filters_across_projects_use_project_version_cursors(many):
+    billy = many
+    rows = _jsonl(billy, "--copied-from", "v1")
+    assert [(r["project"], r["version"]) for r in rows] == [("alpha", "v2"), ("alpha", "v11")]
+    roots = json.loads(billy("list", "--copied-from", "", "--json", "--limit", "1").stdout)
+    assert roots["next"] == "beta/v1"
+    rest = _jsonl(billy, "--copied-from", "", "--after", roots["next"], "--limit", "20")
+    assert [(r["project"], r["version"]) for r in rest] == \
+        [("alpha", v) for v in VERSIONS if v not in ("v2", "v11")]
+
+    billy("run", "alpha", "v10")
+    assert [r["version"] for r in _jsonl(billy, "alpha", "--ran")] == ["v10"]
+    assert len(_jsonl(billy, "alpha", "--never-run")) == 11
+
+
+def test_project_listing_pages_too(many):
+    doc = json.loads(many("list", "--json", "--limit", "1").stdout)
+    assert [p["project"] for p in doc["projects"]] == ["beta"] and doc["next"] == "beta"
+    assert [p["project"] for p in _jsonl(many, "--after", "beta")] == ["alpha"]
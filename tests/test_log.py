@@ -0,0 +1,129 @@
+from __future__ import annotations
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+START = datetime(2025, 6, 1, 9, 0, 0)
+
+
+def _seed_legacy_log(billy, project, n):
+    """Entries every 6 hours from START, via the legacy markdown log the first query imports."""
+    stamps = [(START + timedelta(hours=6 * i)).isoformat(timespec="seconds") for i in range(n)]
+    docs = billy.ws / "docs"
+    docs.mkdir(exist_ok=True)
+    lines = [f"# {project} Log", ""] + [f"- [{ts}] entry {i}" for i, ts in enumerate(stamps)]
+    (docs / f"{project.upper()}_LOG.md").write_text("\n".join(lines) + "\n")
+    return stamps
+
+
+def _entries(output):
+    return re.findall(r"^- \[(\S+)\] (.*)$", output, flags=re.M)
+
+
+# one large active segment (byte-offset bisection) vs. many rotated .gz segments
+@pytest.fixture(params=[1_000_000, 300], ids=["plain", "rotated"])
+def seeded(request, billy):
+    billy.env["BILLY_LOG_SEGMENT_BYTES"] = str(request.param)
+    billy("create", "lg")
+    stamps = _seed_legacy_log(billy, "lg", 40)
+    return billy, stamps
+
+
+def test_query_returns_everything_in_order(seeded):
+    billy, stamps = seeded
+    entries = _entries(billy("log", "lg").stdout)
+    assert [ts for ts, _ in entries] == stamps
+    assert entries[-1][1] == "entry 39"
+
+
+def test_since_until_seek(seeded):
+    billy, stamps = seeded
+    out = billy("log", "lg", "--since", "2025-06-03T15:00:00", "--until", "2025-06-05T03:00:00").stdout
+    got = [ts for ts, _ in _entries(out)]
+    assert got == [ts for ts in stamps if "2025-06-03T15:00:00" <= ts <= "2025-06-05T03:00:00"]
+    assert got[0] == "2025-06-03T15:00:00" and got[-1] == "2025-06-05T03:00:00"
+
+
+def test_date_only_until_covers_the_whole_day(seeded):
+    billy, stamps = seeded
+    got = [ts for ts, _ in _entries(billy("log", "lg", "--since", "2025-06-04", "--until", "2025-06-04").stdout)]
+    assert got == [ts for ts in stamps if ts.startswith("2025-06-04")]
+    assert len(got) == 4
+
+
+def test_grep_and_empty_ranges(seeded):
+    billy, _ = seeded
+    assert [m for _, m in _entries(billy("log", "lg", "--grep", r"entry 3\d").stdout)] == \
+        [f"entry {i}" for i in range(30, 40)]
+    assert "No matching log entries" in billy("log", "lg", "--since", "2030-01-01").stdout
+    billy("log", "lg", "--until", "not-a-date", ok=False)
+
+
+def test_rotation_compresses_segments_and_indexes_them(billy):
+    billy.env["BILLY_LOG_SEGMENT_BYTES"] = "300"
+    billy("create", "lg")
+    stamps = _seed_legacy_log(billy, "lg", 40)
+    billy("log", "lg", "appended after import")
+
+    index = json.loads((billy.ws / "logs" / "lg" / "index.json").read_text())
+    segs = index["segments"]
+    assert len(segs) > 3
+    assert all(s["file"].endswith(".jsonl.gz") for s in segs[:-1])
+    assert sum(s["count"] for s in segs) == len(stamps) + 1
+    assert all(a["last"] <= b["first"] for a, b in zip(segs, segs[1:]))
+    on_disk = sorted(p.name for p in (billy.ws / "logs" / "lg").iterdir() if p.name != "index.json")
+    assert on_disk == sorted(s["file"] for s in segs)
+    assert _entries(billy("log", "lg").stdout)[-1][1] == "appended after import"
+
+
+def test_batched_commits_land_every_n_entries(billy):
+    billy.env["BILLY_LOG_COMMIT_EVERY"] = "3"
+    billy("create", "lg", "--git")
+    before = int(billy.git("rev-list", "--count", "HEAD"))
+    for i in range(2):
+        assert "Commit batched" in billy("log", "lg", f"note {i}", "--commit").stdout
+    assert int(billy.git("rev-list", "--count", "HEAD")) == before
+    assert "committed to Git (3 entries)" in billy("log", "lg", "note 2", "--commit").stdout
+    assert billy.git("log", "-1", "--format=%s") == "lg log: 3 entries (note 0 … note 2)"
+
+
+def test_due_batch_is_committed_on_the_next_query(billy):
+    billy.env["BILLY_LOG_COMMIT_SECONDS"] = "0"
+    billy.env["BILLY_LOG_COMMIT_EVERY"] = "100"
+    billy("create", "lg", "--git")
+    index = billy.ws / "logs" / "lg" / "index.json"
+    billy("log", "lg", "first", "--commit", env={"BILLY_LOG_COMMIT_SECONDS": "3600"})
+    assert json.loads(index.read_text())["pending"]["count"] == 1
+
+    out = billy("log", "lg").stdout
+    assert "committed to Git (1 entry)" in out
+    assert json.loads(index.read_text())["pending"]["count"] == 0
+    assert billy.git("log", "-1", "--format=%s") == "lg log: first"
+
+
+def test_failed_commit_keeps_the_batch_pending(billy):
+    billy.env["BILLY_LOG_COMMIT_EVERY"] = "100"
+    billy("create", "lg", "--git")
+    billy("log", "lg", "keep me", "--commit")
+    hook = billy.ws / ".git" / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    hook.chmod(0o755)
+
+    assert "stays pending" in billy("log", "lg", "--flush", ok=False).stdout
+    index = json.loads((billy.ws / "logs" / "lg" / "index.json").read_text())
+    assert index["pending"]["count"] == 1 and index["pending"]["first"] == "keep me"
+
+    hook.unlink()
+    assert "committed to Git (1 entry)" in billy("log", "lg", "--flush").stdout
+    assert billy.git("log", "-1", "--format=%s") == "lg log: keep me"
+
+
+def test_grep_applies_to_markdown_and_rejects_bad_patterns(seeded):
+    billy, _ = seeded
+    out = billy("log", "lg", "--markdown", "--grep", r"entry 3[45]$").stdout
+    assert out.startswith("# lg Log")
+    assert [m for _, m in _entries(out)] == ["entry 34", "entry 35"]
+    result = billy("log", "lg", "--grep", "(", ok=False)
+    assert "Invalid --grep pattern" in result.stdout and "Traceback" not in result.stderr
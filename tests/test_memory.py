@@ -0,0 +1,70 @@
+from __future__ import annotations
+import json
+import multiprocessing
+import os
+
+from agent_billy.utils import update_memory, load_memory, save_memory
+
+WRITERS = 6
+INCREMENTS = 25
+
+
+def _increment(args):
+    path, writer = args
+    for i in range(INCREMENTS):
+        def mutate(memory):
+            memory["counter"] = memory.get("counter", 0) + 1
+            memory.setdefault("seen", []).append(f"{writer}-{i}")
+        update_memory(mutate, path)
+
+
+def test_concurrent_updates_lose_nothing(tmp_path):
+    path = tmp_path / "memory.json"
+    save_memory({"projects": {}}, path)
+    with multiprocessing.get_context("fork").Pool(WRITERS) as pool:
+        pool.map(_increment, [(path, w) for w in range(WRITERS)])
+
+    memory = load_memory(path)
+    assert memory["counter"] == WRITERS * INCREMENTS
+    assert len(set(memory["seen"])) == WRITERS * INCREMENTS
+
+
+def test_conflicting_snapshot_is_retried_on_fresh_data(tmp_path):
+    path = tmp_path / "memory.json"
+    save_memory({"n": 0}, path)
+    calls = []
+
+    def mutate(memory):
+        calls.append(memory["n"])
+        if len(calls) == 1:  # another writer lands between our read and our write
+            save_memory({"n": 10}, path)
+        memory["n"] += 1
+
+    update_memory(mutate, path)
+    assert calls == [0, 10]
+    assert load_memory(path) == {"n": 11}
+
+
+def test_writes_are_atomic_and_leave_no_temp_files(tmp_path):
+    path = tmp_path / "memory.json"
+    update_memory(lambda memory: memory.update(projects={"p": {"versions": {}}}), path)
+    assert json.loads(path.read_text()) == {"projects": {"p": {"versions": {}}}}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_same_size_rewrite_with_unchanged_stat_is_still_detected(tmp_path):
+    path = tmp_path / "memory.json"
+    save_memory({"n": 1}, path)
+    st = path.stat()
+    calls = []
+
+    def mutate(memory):
+        calls.append(memory["n"])
+        if len(calls) == 1:  # same inode, same size, same mtime: only the bytes differ
+            path.write_bytes(path.read_bytes().replace(b"1", b"7"))
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        memory["n"] += 1
+
+    update_memory(mutate, path)
+    assert calls == [1, 7]
+    assert load_memory(path) == {"n": 8}
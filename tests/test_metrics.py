@@ -0,0 +1,61 @@
+from __future__ import annotations
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+
+
+def _samples(text):
+    """{(name, frozenset(labels)): value} for every sample line; asserts the line grammar."""
+    out = {}
+    for line in text.splitlines():
+        if line.startswith("# "):
+            assert re.match(r"# (HELP|TYPE) \w+ ", line), line
+            continue
+        m = SAMPLE.match(line)
+        assert m, f"not a Prometheus sample line: {line!r}"
+        name, labels, value = m.groups()
+        out[(name, frozenset(re.findall(r'(\w+)="([^"]*)"', labels)))] = float(value)
+    return out
+
+
+def test_commands_are_recorded_by_default_as_cumulative_prometheus(billy):
+    billy.env.pop("BILLY_METRICS")  # the suite turns recording off
+    billy("create", "mx")
+    for _ in range(3):
+        billy("list")
+    billy("list", "nope", ok=False)
+
+    text = (billy.ws / ".billy" / "metrics.prom").read_text()
+    assert "# TYPE billy_command_seconds histogram" in text
+    assert "# TYPE billy_git_calls_total counter" in text
+    samples = _samples(text)
+    list_cmd = frozenset({("command", "list")})
+    assert samples[("billy_command_seconds_count", list_cmd)] == 4
+    assert samples[("billy_commands_total", frozenset({("command", "list"), ("exit", "0")}))] == 3
+    assert samples[("billy_commands_total", frozenset({("command", "list"), ("exit", "1")}))] == 1
+    assert samples[("billy_bytes_read_total", list_cmd)] > 0
+
+    buckets = sorted((float(dict(labels)["le"]), value) for (name, labels), value in samples.items()
+                     if name == "billy_command_seconds_bucket" and dict(labels)["command"] == "list")
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts) and counts[-1] == 4  # cumulative, +Inf last
+
+    events = [json.loads(line) for line in (billy.ws / ".billy" / "metrics.jsonl").read_text().splitlines()]
+    assert [e["command"] for e in events] == ["create", "list", "list", "list", "list"]
+    assert "list" in billy("stats").stdout
+
+
+def test_concurrent_commands_lose_no_increments(billy):
+    billy.env["BILLY_METRICS"] = "1"
+    billy("create", "mx")
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: billy("list"), range(16)))
+    samples = _samples((billy.ws / ".billy" / "metrics.prom").read_text())
+    assert samples[("billy_command_seconds_count", frozenset({("command", "list")}))] == 16
+
+
+def test_metrics_can_be_turned_off(billy):
+    billy("create", "mx", env={"BILLY_METRICS": "0"})
+    assert not (billy.ws / ".billy" / "metrics.prom").exists()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agent_billy import runcache
+from agent_billy.utils import WORKSPACE
+
+LIMITS = {"timeout": None, "cpu_s": None, "memory_mb": None}
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "p_v1.py"
+    path.write_text("print('hi')\n")
+    return path
+
+
+def _key(script, meta=None, limits=LIMITS, python=None):
+    return runcache.cache_key(meta or {}, script, limits, python)
+
+
+def test_key_is_stable(script):
+    assert _key(script) == _key(script)
+
+
+def test_content_change_invalidates(script):
+    before = _key(script)
+    script.write_text("print('bye')\n")
+    assert _key(script) != before
+
+
+def test_interpreter_and_limits_invalidate_but_timeout_does_not(script):
+    base = _key(script)
+    assert _key(script, python="/opt/other/python3") != base
+    assert _key(script, limits={**LIMITS, "cpu_s": 5}) != base
+    assert _key(script, limits={**LIMITS, "memory_mb": 256}) != base
+    assert _key(script, limits={**LIMITS, "timeout": 30.0}) == base
+
+
+def test_environment_invalidates_except_volatile_vars(script, monkeypatch):
+    base = _key(script)
+    monkeypatch.setenv("PWD", "/somewhere/else")
+    monkeypatch.setenv("TERM", "dumb")
+    assert _key(script) == base
+    monkeypatch.setenv("BILLY_TEST_SETTING", "1")
+    assert _key(script) != base
+
+
+def test_dependency_file_content_invalidates(script):
+    dep = WORKSPACE / "helpers_for_runcache_test.py"
+    dep.write_text("VALUE = 1\n")
+    try:
+        meta = {"dependencies": [dep.name]}
+        base = _key(script, meta)
+        assert base != _key(script)
+        assert _key(script, meta) == base
+        dep.write_text("VALUE = 2\n")
+        assert _key(script, meta) != base
+    finally:
+        dep.unlink()
+
+
+def test_run_replays_until_the_file_changes(billy):
+    billy("create", "rc")
+    billy("save-version", "rc", "v1", "-m", "first")
+    billy("run-cache", "rc", "--enable")
+
+    first = billy("run", "rc", "v1").stdout
+    assert "Hello from rc v1!" in first and "Replayed" not in first
+    second = billy("run", "rc", "v1").stdout
+    assert "Hello from rc v1!" in second and "Replayed from the run cache" in second
+    assert "Replayed" not in billy("run", "rc", "v1", "--no-cache").stdout
+
+    path = billy.file("rc", "v1")
+    path.write_text(path.read_text().replace("Hello from", "Bye from"))
+    third = billy("run", "rc", "v1").stdout
+    assert "Bye from rc v1!" in third and "Replayed" not in third
+    assert "Replayed" in billy("run", "rc", "v1").stdout
+
+
+def test_failed_runs_replay_their_exit_code(billy):
+    billy("create", "rc")
+    billy("save-version", "rc", "v1", "-m", "first")
+    billy("run-cache", "rc", "--enable")
+    billy.file("rc", "v1").write_text("import sys\nprint('boom')\nsys.exit(3)\n")
+    billy("run", "rc", "v1", ok=False)
+    replay = billy("run", "rc", "v1", ok=False)
+    assert "Replayed" in replay.stdout and "boom" in replay.stdout
+
+
+def _counters(billy, project, version):
+    return json.loads((billy.ws / "memory.json").read_text())["projects"][project]["versions"][version]["run_cache"]
+
+
+def test_concurrent_runs_lose_no_counts(billy):
+    billy("create", "rc")
+    billy("save-version", "rc", "v1", "-m", "first")
+    billy("run-cache", "rc", "--enable")
+    billy.file("rc", "v1").write_text("import time\ntime.sleep(0.3)\nprint('slow')\n")
+    billy("run", "rc", "v1")
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(lambda _: billy("run", "rc", "v1"), range(6)))
+    stats = _counters(billy, "rc", "v1")
+    assert (stats["hits"], stats["misses"]) == (6, 1)
+
+
+def test_matrix_and_run_count_savings_the_same_way(billy):
+    billy("create", "rc")
+    billy("save-version", "rc", "v1", "-m", "first")
+    billy("run-cache", "rc", "--enable")
+    billy.file("rc", "v1").write_text("import time\ntime.sleep(0.4)\n")
+    billy("test-matrix", "rc")
+    assert _counters(billy, "rc", "v1") == {"hits": 0, "misses": 1, "saved_s": 0.0}
+    out = billy("test-matrix", "rc").stdout
+    assert "1/1 replayed" in out
+    billy("run", "rc", "v1")
+    stats = _counters(billy, "rc", "v1")
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    # each hit saves about the original ~0.4s run (minus its replay), from either entry point
+    assert 0.7 < stats["saved_s"] < 1.0
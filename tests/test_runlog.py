@@ -0,0 +1,19 @@
+from __future__ import annotations
+import json
+
+
+def test_rotation_trims_the_index_with_the_logs(billy):
+    billy.env["BILLY_RUNLOG_KEEP"] = "3"
+    billy("create", "rl")
+    billy("save-version", "rl", "v1", "-m", "first")
+    billy.file("rl", "v1").write_text("import sys\nprint('run', sys.argv)\n")
+    for _ in range(5):
+        billy("run", "rl", "v1")
+
+    run_dir = billy.ws / ".billy" / "runs" / "rl"
+    logs = sorted(p.name for p in run_dir.glob("*.log.gz"))
+    records = [json.loads(line) for line in (run_dir / "index.jsonl").read_text().splitlines()]
+    assert len(logs) == 3
+    assert [r["log"] for r in records] == logs
+    assert billy("runs", "rl").stdout.count("rl v1: exit 0") == 3
+    assert "run" in billy("runs", "rl", "--tail", "1").stdout
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import os
+import time
+
+import pytest
+
+from agent_billy import sandbox
+
+ORPHAN = """\
+import subprocess, sys, time
+child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+open("grandchild.pid", "w").write(str(child.pid))
+print("started", flush=True)
+time.sleep(60)
+"""
+
+
+def test_explicit_limits_override_defaults_and_zero_disables(monkeypatch):
+    monkeypatch.setitem(sandbox.DEFAULT_LIMITS, "timeout", 30.0)
+    monkeypatch.setitem(sandbox.DEFAULT_LIMITS, "cpu_s", 5)
+    assert sandbox.resolve_limits() == {"timeout": 30.0, "cpu_s": 5, "memory_mb": None}
+    assert sandbox.resolve_limits(timeout=0, memory_mb=64) == {"timeout": None, "cpu_s": 5, "memory_mb": 64}
+
+
+def test_describe_exit_names_limit_signals():
+    assert sandbox.describe_exit(-24) == "SIGXCPU, CPU limit"
+    assert sandbox.describe_exit(-9) == "SIGKILL, killed"
+    assert sandbox.describe_exit(0) == "" and sandbox.describe_exit(None) == ""
+
+
+@pytest.fixture
+def project(billy):
+    billy("create", "sb")
+    billy("save-version", "sb", "v1", "-m", "first")
+    return billy
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # a zombie still answers kill(0); it is dead for our purposes
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().split(")")[-1].split()[0] != "Z"
+
+
+@pytest.mark.parametrize("warm", [False, True], ids=["cold", "warm"])
+def test_timeout_kills_the_whole_process_group(project, warm):
+    billy = project
+    billy.file("sb", "v1").write_text(ORPHAN)
+    start = time.monotonic()
+    result = billy("run", "sb", "v1", "--timeout", "1", *(["--warm"] if warm else []), ok=False)
+    assert time.monotonic() - start < 10
+    assert "started" in result.stdout and "Run killed after the 1s timeout" in result.stdout
+    grandchild = int((billy.ws / "grandchild.pid").read_text())
+    time.sleep(0.2)
+    assert not _alive(grandchild)
+
+
+def test_timeout_default_comes_from_the_environment(project):
+    billy = project
+    billy.file("sb", "v1").write_text("import time\ntime.sleep(60)\n")
+    out = billy("run", "sb", "v1", ok=False, env={"BILLY_RUN_TIMEOUT": "0.5"}).stdout
+    assert "Run killed after the 0.5s timeout" in out
+
+
+def test_cpu_limit_stops_a_busy_loop(project):
+    billy = project
+    billy.file("sb", "v1").write_text("while True:\n    pass\n")
+    out = billy("run", "sb", "v1", "--cpu", "1", "--timeout", "30", ok=False).stdout
+    assert "CPU limit" in out or "SIGKILL" in out
+
+
+def test_memory_limit_fails_a_large_allocation(project):
+    billy = project
+    billy.file("sb", "v1").write_text("data = bytearray(1024 * 1024 * 1024)\nprint('allocated')\n")
+    result = billy("run", "sb", "v1", "--memory", "256", ok=False)
+    assert "allocated" not in result.stdout and "Run exited with code 1" in result.stdout
+    assert "MemoryError" in result.stderr
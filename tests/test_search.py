@@ -0,0 +1,74 @@
+from __future__ import annotations
+import re
+
+import pytest
+
+from agent_billy.search import extract_symbols
+
+PARSER = '''\
+import re
+
+PATTERN = re.compile("x")
+
+
+class Parser:
+    def feed(self, data):
+        return data
+
+    class State:
+        pass
+
+
+if True:
+    def fallback():
+        pass
+'''
+
+
+def test_extract_symbols_qualifies_nested_definitions():
+    assert extract_symbols(PARSER) == [
+        ("PATTERN", "PATTERN", "var", 3),
+        ("Parser", "Parser", "class", 6),
+        ("feed", "Parser.feed", "def", 7),
+        ("State", "Parser.State", "class", 10),
+        ("fallback", "fallback", "def", 15),
+    ]
+    assert extract_symbols("def broken(:\n") == []
+
+
+def _hits(output):
+    """project/version of every result row."""
+    return re.findall(r"^   (\S+/\S+)\s+L", output, flags=re.M)
+
+
+@pytest.fixture
+def indexed(billy):
+    billy("create", "se")
+    billy("save-version", "se", "v1", "-m", "parser", "--content", PARSER)
+    billy("save-version", "se", "v2", "-m", "adds a tokenizer",
+          "--content", PARSER + "\n\ndef tokenize_stream(text):\n    return text.split()\n")
+    billy("save-version", "se", "v3", "-m", "unrelated", "--content", "print('nothing here')\n")
+    return billy
+
+
+def test_substring_and_symbol_queries(indexed):
+    billy = indexed
+    assert _hits(billy("search", "tokenize_str").stdout) == ["se/v2"]
+    assert _hits(billy("search", "PARSER", "-i").stdout) == ["se/v1", "se/v2"]
+    assert _hits(billy("search", "Parser.feed", "--defines").stdout) == ["se/v1", "se/v2"]
+    assert _hits(billy("search", "feed", "--defines", "--first").stdout) == ["se/v1"]
+    assert "No versions contain" in billy("search", "zzz_not_there").stdout
+    billy("search", "x", "-p", "nope", ok=False)
+
+
+def test_reindex_picks_up_edits_and_rebuilds_a_lost_index(indexed):
+    billy = indexed
+    billy.file("se", "v3").write_text("def late_addition():\n    pass\n")
+    assert _hits(billy("search", "late_addition", "--defines").stdout) == []
+    assert "Indexed 3 versions" in billy("reindex", "-j", "2").stdout
+    assert _hits(billy("search", "late_addition", "--defines").stdout) == ["se/v3"]
+
+    for db in (billy.ws / ".billy").glob("search.db*"):
+        db.unlink()
+    out = billy("search", "late_addition").stdout
+    assert "indexed 3 new versions first" in out and _hits(out) == ["se/v3"]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import json
+import multiprocessing
+
+import pytest
+
+from agent_billy.store import JsonStore, SqliteStore
+
+BACKENDS = {
+    "json": lambda tmp_path: JsonStore(tmp_path / "memory.json"),
+    "sqlite": lambda tmp_path: SqliteStore(tmp_path / "memory.db"),
+}
+
+
+def _version(created_at, copied_from=None, **extra):
+    return {"filename": "projects/p/x.py", "created_at": created_at, "description": "", "copied_from": copied_from,
+            "dependencies": [], "last_run": None, "notes": "", **extra}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def store(request, tmp_path):
+    return BACKENDS[request.param](tmp_path)
+
+
+def test_project_and_version_round_trip(store):
+    store.put_project("p", {"description": "demo", "git_enabled": True})
+    store.put_version("p", "v1", _version("2025-06-01T10:00:00"))
+    store.put_versions("p", {"v2": _version("2025-06-02T10:00:00", "v1"),
+                             "v10": _version("2025-07-01T10:00:00", "v2", extra_field=[1, 2])})
+    store.update_version("p", "v1", last_run="2025-06-03T00:00:00")
+    store.update_versions("p", {"v2": {"git_commit": "abc"}, "v10": {"notes": "n"}})
+
+    assert store.get_project("p") == {"description": "demo", "git_enabled": True}
+    assert store.project_names() == ["p"]
+    assert store.version_count("p") == 3
+    assert store.get_version("p", "v1")["last_run"] == "2025-06-03T00:00:00"
+    assert store.get_version("p", "v2")["git_commit"] == "abc"
+    assert store.get_version("p", "v10")["extra_field"] == [1, 2]
+    assert store.get_version("p", "nope") is None
+    # natural order, cursor and filters
+    assert [v for v, _ in store.iter_versions("p")] == ["v1", "v2", "v10"]
+    assert [v for v, _ in store.iter_versions("p", after="v1", limit=1)] == ["v2"]
+    assert [v for v, _ in store.iter_versions("p", until="2025-06")] == ["v1", "v2"]
+    assert [v for v, _ in store.iter_versions("p", copied_from="")] == ["v1"]
+    assert [v for v, _ in store.iter_versions("p", ran=True)] == ["v1"]
+
+
+def test_readers_hand_out_copies(store):
+    store.put_project("p", {})
+    store.put_version("p", "v1", _version("2025-06-01T10:00:00"))
+    store.get_version("p", "v1")["notes"] = "mutated"
+    store.versions("p")["v1"]["notes"] = "mutated"
+    assert store.get_version("p", "v1")["notes"] == ""
+
+
+def _add_safepoints(args):
+    backend, tmp_path, writer = args
+    store = BACKENDS[backend](tmp_path)
+    for i in range(15):
+        def mutate(proj, name=f"sp{writer}-{i}"):
+            proj.setdefault("safepoints", {})[name] = {"git_commit": None}
+        store.modify_project("p", mutate)
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_concurrent_modify_project_keeps_every_entry(backend, tmp_path):
+    BACKENDS[backend](tmp_path).put_project("p", {"safepoints": {}})
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        pool.map(_add_safepoints, [(backend, tmp_path, w) for w in range(4)])
+    assert len(BACKENDS[backend](tmp_path).get_project("p")["safepoints"]) == 60
+
+
+def test_export_import_round_trip(tmp_path):
+    src = JsonStore(tmp_path / "memory.json")
+    src.put_project("p", {"description": "demo"})
+    src.put_versions("p", {"v1": _version("2025-06-01T10:00:00"), "v2": _version("2025-06-02T10:00:00", "v1")})
+    memory = src.export_memory()
+
+    db = SqliteStore(tmp_path / "memory.db")
+    db.import_memory(memory)
+    assert db.export_memory() == memory
+
+
+def test_migrate_store_keeps_listing_and_exports_back(billy):
+    billy("create", "p", "-d", "demo")
+    for v in ("v1", "v2", "v10"):
+        billy("save-version", "p", v, "-m", f"desc {v}")
+    before = billy("list", "p", "--jsonl").stdout
+    memory = json.loads((billy.ws / "memory.json").read_text())
+
+    out = billy("migrate-store").stdout
+    assert "Migrated 1 projects / 3 versions" in out
+    assert (billy.ws / "memory.db").exists()
+    assert billy("list", "p", "--jsonl").stdout == before
+    billy("migrate-store", ok=False)  # refuses to clobber without --force
+
+    billy("save-version", "p", "v11", "-m", "after migration")
+    assert "v11" not in json.loads((billy.ws / "memory.json").read_text())["projects"]["p"]["versions"]
+    billy("export-store")
+    exported = json.loads((billy.ws / "memory.json").read_text())
+    assert set(exported["projects"]["p"]["versions"]) == {"v1", "v2", "v10", "v11"}
+    assert exported["projects"]["p"]["versions"]["v2"] == memory["projects"]["p"]["versions"]["v2"]
+
+
+def test_export_to_memory_json_by_relative_path_is_locked_and_atomic(billy):
+    billy("create", "p")
+    billy("migrate-store")
+    billy("save-version", "p", "v1", "-m", "after migration")
+    target = billy.ws / "memory.json"
+    inode = target.stat().st_ino
+    billy("export-store", "-o", "memory.json")  # cwd is the workspace
+    assert target.stat().st_ino != inode  # replaced atomically, not truncated in place
+    assert "v1" in json.loads(target.read_text())["projects"]["p"]["versions"]
@@ -0,0 +1,60 @@
+from __future__ import annotations
+import json
+
+import pytest
+
+
+@pytest.fixture
+def spaces(billy, tmp_path):
+    """The fixture workspace plus one registered under the name `list`."""
+    billy.env["BILLY_REGISTRY"] = str(tmp_path / "registry.json")
+    other = tmp_path / "other"
+    billy("workspace", "add", "list", str(other))
+    billy("create", "home")
+    for v in ("v1", "v2", "v10"):
+        billy("save-version", "home", v, "-m", v)
+    billy("--workspace", "list", "create", "away")
+    billy("--workspace=list", "save-version", "away", "v1", "-m", "v1")
+    return billy, other
+
+
+def test_global_option_values_are_not_taken_for_the_command(spaces):
+    billy, other = spaces
+    assert (other / "projects" / "away" / "away_v1.py").exists()
+    out = billy("--workspace", "list", "list").stdout
+    assert "away" in out and "home" not in out
+    assert "away" in billy("--work", "list", "--git-backend", "subprocess", "list").stdout
+
+
+def test_all_workspaces_applies_filters_paging_and_format(spaces):
+    billy, _ = spaces
+    rows = [json.loads(line) for line in billy("list", "--all-workspaces", "--jsonl").stdout.splitlines()]
+    assert {(r["workspace"], r["project"]) for r in rows} == {("(active)", "home"), ("list", "away")}
+
+    page = billy("list", "home", "--all-workspaces", "--json", "--limit", "2", "--after", "v1").stdout
+    doc = json.loads(page)["workspaces"]
+    assert [v["version"] for v in doc["(active)"]["versions"]] == ["v2", "v10"]
+    assert "list" not in doc  # `home` is not a project there
+
+    text = billy("list", "home", "--all-workspaces", "--limit", "1").stdout
+    assert "v1 " in text and "v2 " not in text and "--after v1" in text
+
+
+def test_sharded_project_keeps_its_own_metadata_and_repo(billy):
+    billy("create", "plain", "--git")
+    billy("create", "sh", "--git", "--shard")
+    for v in ("v1", "v2"):
+        billy("save-version", "sh", v, "-m", f"cut {v}")
+
+    shard = billy.ws / "projects" / "sh"
+    workspace_meta = json.loads((billy.ws / "memory.json").read_text())["projects"]["sh"]
+    assert workspace_meta["shard"] == "projects/sh" and "v1" not in workspace_meta.get("versions", {})
+    own = json.loads((shard / "memory.json").read_text())["projects"]["sh"]["versions"]
+    assert set(own) == {"v1", "v2"}
+
+    shard_git = ("-C", str(shard))
+    assert own["v2"]["git_commit"] == billy.git(*shard_git, "rev-parse", "sh_v2^{commit}")
+    assert billy.git(*shard_git, "show", "sh_v1:sh_v1.py").startswith("#!/usr/bin/env python3")
+    assert "sh_v1" not in billy.git("tag").split()  # the workspace repo never sees the shard's history
+    assert "sharded" in billy("list").stdout
+    assert "Hello from sh v1!" in billy("run", "sh", "v2").stdout